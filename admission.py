@@ -0,0 +1,160 @@
+"""Admission control in front of the LLM.
+
+AdmissionController caps how many generations run against Ollama at once
+and queues the rest by priority (chat before RAG synthesis, then FIFO),
+rejecting new work once the queue is full. Callers poll their ticket so
+they can report queue position and wait time while they wait.
+
+Coalescer lets identical in-flight questions share one generation: the
+first caller (the leader) publishes its events and later callers replay
+them as they arrive.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+
+LLM_CONCURRENCY = int(os.environ.get("RAG_LLM_CONCURRENCY", "2"))
+MAX_QUEUE = int(os.environ.get("RAG_LLM_MAX_QUEUE", "32"))
+
+# Lower runs first
+PRIORITY_CHAT = 0
+PRIORITY_RAG = 1
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class Ticket:
+    def __init__(self, controller, priority, seq):
+        self.controller = controller
+        self.key = (priority, seq)
+        self.enqueued = time.perf_counter()
+        self.admitted = False
+
+    def wait(self, timeout=None):
+        """Block until admitted or timeout; returns whether the ticket was admitted"""
+        return self.controller._wait(self, timeout)
+
+    def position(self):
+        return self.controller._position(self)
+
+    def waited(self):
+        return time.perf_counter() - self.enqueued
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=LLM_CONCURRENCY, max_queue=MAX_QUEUE):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.active = 0
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def enqueue(self, priority):
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                raise QueueFullError("The assistant is busy right now, please try again in a moment.")
+            ticket = Ticket(self, priority, next(self._seq))
+            heapq.heappush(self._queue, (ticket.key, ticket))
+            self._admit_waiting()
+            return ticket
+
+    def _admit_waiting(self):
+        while self._queue and self.active < self.max_concurrent:
+            _, ticket = heapq.heappop(self._queue)
+            ticket.admitted = True
+            self.active += 1
+        self._cond.notify_all()
+
+    def _wait(self, ticket, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: ticket.admitted, timeout=timeout)
+            return ticket.admitted
+
+    def _position(self, ticket):
+        with self._cond:
+            if ticket.admitted:
+                return 0
+            return 1 + sum(1 for key, _ in self._queue if key < ticket.key)
+
+    def release(self, ticket):
+        """Give back an admitted slot, or drop the ticket from the queue if it never ran"""
+        with self._cond:
+            if ticket.admitted:
+                self.active -= 1
+            else:
+                self._queue = [(key, t) for key, t in self._queue if t is not ticket]
+                heapq.heapify(self._queue)
+            self._admit_waiting()
+
+    def queued(self):
+        with self._cond:
+            return len(self._queue)
+
+
+class InFlight:
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self._cond = threading.Condition()
+
+    def publish(self, event):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+        return event
+
+    def finish(self):
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+
+    def subscribe(self):
+        """Yield every event the leader has published or will publish"""
+        seen = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: seen < len(self.events) or self.done)
+                batch = self.events[seen:]
+                done = self.done
+            seen += len(batch)
+            yield from batch
+            if done and seen == len(self.events):
+                return
+
+
+class Coalescer:
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def join(self, key):
+        """Return (InFlight, is_leader) for key"""
+        with self._lock:
+            if key in self._inflight:
+                return self._inflight[key], False
+            inflight = self._inflight[key] = InFlight()
+            return inflight, True
+
+    def finish(self, key, inflight):
+        with self._lock:
+            if self._inflight.get(key) is inflight:
+                del self._inflight[key]
+        inflight.finish()
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """The process-wide controller, shared by every QueryService and session"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
@@ -0,0 +1,98 @@
+"""Process-wide answer cache for the Streamlit app.
+
+Questions are matched on normalized text first and then on cosine
+similarity of their query embeddings. Entries expire after a TTL, the
+least recently used are evicted beyond a size limit, and everything is
+dropped when the index version changes.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_ENTRIES = int(os.environ.get("RAG_ANSWER_CACHE_MAX_ENTRIES", "512"))
+TTL_SECONDS = float(os.environ.get("RAG_ANSWER_CACHE_TTL", "86400"))
+SIMILARITY_THRESHOLD = float(os.environ.get("RAG_ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_question(question):
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+class AnswerCache:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS,
+                 similarity_threshold=SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.index_version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, index_version):
+        if index_version != self.index_version:
+            self._entries.clear()
+            self.index_version = index_version
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        for key in [k for k, entry in self._entries.items() if entry["created"] < cutoff]:
+            del self._entries[key]
+
+    def lookup(self, question, mode, index_version, embed=None):
+        """Return (entry or None, query embedding or None).
+
+        embed is only called when there is no exact-text hit; the embedding
+        it returns should be passed back to store() on a miss.
+        """
+        key = (mode, normalize_question(question))
+        with self._lock:
+            self._check_version(index_version)
+            self._expire()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key], None
+            candidates = [(k, e) for k, e in self._entries.items()
+                          if k[0] == mode and e["embedding"] is not None]
+
+        if embed is None:
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        embedding = np.asarray(embed(), dtype=np.float32)
+        embedding /= np.linalg.norm(embedding) or 1.0
+        best_key, best_score = None, -1.0
+        if candidates:
+            matrix = np.stack([e["embedding"] for _, e in candidates])
+            scores = matrix @ embedding
+            best = int(np.argmax(scores))
+            best_key, best_score = candidates[best][0], float(scores[best])
+
+        with self._lock:
+            if best_key is not None and best_score >= self.similarity_threshold and best_key in self._entries:
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                return self._entries[best_key], embedding
+            self.misses += 1
+        return None, embedding
+
+    def store(self, question, mode, index_version, answer, sources, embedding=None):
+        key = (mode, normalize_question(question))
+        with self._lock:
+            self._check_version(index_version)
+            self._entries[key] = {
+                "answer": answer,
+                "sources": sources,
+                "embedding": embedding,
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,173 @@
+"""Headless batch question answering through the query service.
+
+Reads questions from JSONL, answers them with the same routing, cache
+and query engine as the app (in-process, or through a shared backend
+with --service-url), and writes one JSONL result per question:
+
+    python batch_qa.py questions.jsonl --out answers.jsonl --concurrency 4
+
+Input lines are {"question": ...} with optional "id", "mode" (auto, llm
+or rag) and "documents". Lines labeled with the expected "file" (and
+optionally "page"), as produced for the benchmarks, are also scored for
+retrieval hits. Typical uses: refill the answer cache after a re-index,
+regression-test retrieval, and measure throughput on a real question mix.
+"""
+# Disable telemetry and warnings FIRST
+import os
+import warnings
+os.environ['ANONYMIZED_TELEMETRY'] = 'False'
+os.environ['POSTHOG_DISABLED'] = 'True'
+warnings.filterwarnings('ignore')
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from query_service import QueryService, RemoteQueryService, SERVICE_URL
+from telemetry import percentile
+
+MODES = ("auto", "llm", "rag")
+
+
+def load_questions(path):
+    questions = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("question"):
+                raise ValueError(f"{path}:{line_number}: missing \"question\"")
+            item.setdefault("id", line_number)
+            questions.append(item)
+    return questions
+
+
+def is_hit(sources, item):
+    """Whether an expected file (and page, if given) is among the sources"""
+    return any(source["file"] == item["file"] and ("page" not in item or str(source["page"]) == str(item["page"]))
+               for source in sources)
+
+
+def answer_one(service, item, default_mode, stream):
+    """Run one question and collect its events into a result record"""
+    result = {"id": item["id"], "question": item["question"], "mode": None, "cached": False, "answer": None,
+              "sources": [], "scores": [], "error": None}
+    start = time.perf_counter()
+    first_token = None
+    try:
+        for event in service.answer(item["question"], item.get("mode", default_mode), stream=stream,
+                                    documents=item.get("documents"), timings=True):
+            if event["type"] == "meta":
+                result["mode"], result["cached"] = event["mode"], event["cached"]
+            elif event["type"] == "token" and first_token is None:
+                first_token = time.perf_counter() - start
+            elif event["type"] == "sources":
+                result["sources"] = event["sources"]
+                result["scores"] = [source["score"] for source in event["sources"]]
+            elif event["type"] == "done":
+                result["answer"] = event["answer"]
+            elif event["type"] == "error":
+                result["error"] = event["message"]
+            elif event["type"] == "timings":
+                result["stages_ms"] = event["stages_ms"]
+    except Exception as e:
+        result["error"] = str(e)
+    result["total_ms"] = round(1000 * (time.perf_counter() - start), 2)
+    result["first_token_ms"] = None if first_token is None else round(1000 * first_token, 2)
+    if "file" in item:
+        result["hit"] = is_hit(result["sources"], item)
+    return result
+
+
+def summarize(results, seconds):
+    answered = [r for r in results if not r["error"]]
+    totals = [r["total_ms"] for r in answered]
+    first_tokens = [r["first_token_ms"] for r in answered if r["first_token_ms"] is not None]
+    labeled = [r for r in results if "hit" in r]
+    modes = {}
+    for r in answered:
+        modes[r["mode"]] = modes.get(r["mode"], 0) + 1
+    return {
+        "questions": len(results),
+        "errors": len(results) - len(answered),
+        "cached": sum(r["cached"] for r in answered),
+        "modes": modes,
+        "seconds": round(seconds, 2),
+        "questions_per_s": round(len(results) / seconds, 3) if seconds else 0.0,
+        "p50_ms": percentile(totals, 50),
+        "p95_ms": percentile(totals, 95),
+        "first_token_p50_ms": percentile(first_tokens, 50),
+        "first_token_p95_ms": percentile(first_tokens, 95),
+        "hit_rate": sum(r["hit"] for r in labeled) / len(labeled) if labeled else None,
+    }
+
+
+def run(service, questions, out, concurrency, default_mode="auto", stream=True):
+    """Answer every question with up to `concurrency` in flight; results are written as they finish"""
+    results = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-qa") as executor:
+        futures = [executor.submit(answer_one, service, item, default_mode, stream) for item in questions]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            status = "❌" if result["error"] else "✅"
+            print(f"{status} [{len(results)}/{len(questions)}] {result['mode'] or '-'} "
+                  f"{result['total_ms'] / 1000:.1f}s  {result['question'][:70]}", file=sys.stderr)
+    return summarize(results, time.perf_counter() - start)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions without the UI")
+    parser.add_argument("questions", help="JSONL file of {\"question\": ...} lines")
+    parser.add_argument("--out", default=None, help="results JSONL (default: <questions>.answers.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=4, help="questions in flight at once (default: 4)")
+    parser.add_argument("--mode", choices=MODES, default="auto", help="mode for lines without one (default: auto)")
+    parser.add_argument("--no-stream", action="store_true", help="generate whole answers (no first-token times)")
+    parser.add_argument("--service-url", default=SERVICE_URL,
+                        help="answer through a running query service instead of in-process")
+    parser.add_argument("--warm-up", action="store_true", help="load the models before timing anything")
+    parser.add_argument("--summary", default=None, help="also write the run summary as JSON here")
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    questions = load_questions(args.questions)
+    out_path = args.out or os.path.splitext(args.questions)[0] + ".answers.jsonl"
+
+    print(f"🔄 Loading {'query service at ' + args.service_url if args.service_url else 'index and models'}...",
+          file=sys.stderr)
+    service = RemoteQueryService(args.service_url) if args.service_url else QueryService()
+    if args.warm_up:
+        service.warm_up()
+
+    print(f"❓ {len(questions)} questions, {args.concurrency} at a time", file=sys.stderr)
+    with open(out_path, "w") as out:
+        summary = run(service, questions, out, args.concurrency, args.mode, stream=not args.no_stream)
+
+    print(f"\n📊 {summary['questions']} questions in {summary['seconds']:.1f}s "
+          f"({summary['questions_per_s']:.2f}/s), {summary['errors']} errors, {summary['cached']} cached",
+          file=sys.stderr)
+    print(f"   Modes: {summary['modes']}", file=sys.stderr)
+    print(f"   Latency p50 {summary['p50_ms']:.0f} ms, p95 {summary['p95_ms']:.0f} ms; first token p50 "
+          f"{summary['first_token_p50_ms']:.0f} ms, p95 {summary['first_token_p95_ms']:.0f} ms", file=sys.stderr)
+    if summary["hit_rate"] is not None:
+        print(f"   Retrieval hit rate: {summary['hit_rate']:.1%}", file=sys.stderr)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+    print(f"✅ Results written to {out_path}", file=sys.stderr)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
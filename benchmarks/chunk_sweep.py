@@ -0,0 +1,186 @@
+"""Chunking sweep: index the same corpus at several chunk configs and compare.
+
+Each config ("chunker:size[:overlap]") is indexed into its own scratch
+Chroma + BM25 index and scored on a labeled question set:
+
+    python -m benchmarks.chunk_sweep --configs sentence:1024:200 sentence:512:100 layout:1024 layout:512
+    python -m benchmarks.chunk_sweep --data ./data --questions labeled.jsonl --ollama
+
+Reported per config: chunk count, index size on disk, indexing time,
+retrieval hit rate and latency, and mean prompt tokens (question plus
+packed context actually sent to the LLM). By default the synthetic corpus
+and stub Ollama from run_benchmark are used; --data/--questions point it
+at real PDFs and a JSONL file of {"question", "file", "page"} lines, and
+--ollama embeds with the real model server instead of the stub.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from llama_index.core import Settings
+from llama_index.core.schema import QueryBundle
+
+from benchmarks.ollama_stub import start_stub_server
+from benchmarks.run_benchmark import bench_index, git_commit, is_hit, latency_summary
+from benchmarks.synthetic_corpus import generate_corpus
+from chunking import CHUNKERS, build_node_parser, chunker_config
+from compact_store import open_vector_client
+from context_packer import count_tokens
+from ingest_pipeline import OllamaEmbedClient, OLLAMA_BASE_URL, EMBED_BATCH_SIZE, EMBED_CONCURRENCY
+from lexical_index import LexicalIndex
+from rag_engine import configure_models, build_query_engine
+
+DEFAULT_CONFIGS = ["sentence:1024:200", "sentence:512:100", "layout:1024", "layout:512"]
+
+
+def parse_config(spec):
+    """"layout:512" -> chunker_config("layout", 512, 102); overlap defaults to a fifth of the size"""
+    parts = spec.split(":")
+    if parts[0] not in CHUNKERS or len(parts) not in (2, 3):
+        raise argparse.ArgumentTypeError(f"expected chunker:size[:overlap] with chunker in {CHUNKERS}, got {spec!r}")
+    size = int(parts[1])
+    overlap = int(parts[2]) if len(parts) == 3 else size // 5
+    return chunker_config(parts[0], size, overlap)
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+
+def score_questions(query_engine, questions):
+    """Hit rate, retrieval latency and mean prompt tokens over the question set"""
+    times, hits, prompt_tokens = [], 0, []
+    for question in questions:
+        start = time.perf_counter()
+        # retrieve() applies the reranker and context packer, i.e. exactly what synthesis would see
+        nodes = query_engine.retrieve(QueryBundle(question["question"]))
+        times.append(time.perf_counter() - start)
+        hits += is_hit(nodes, question)
+        prompt_tokens.append(len(Settings.tokenizer(question["question"]))
+                             + sum(count_tokens(n.node) for n in nodes))
+    summary = latency_summary(times)
+    summary["hit_rate"] = hits / len(questions) if questions else 0.0
+    summary["mean_prompt_tokens"] = sum(prompt_tokens) / len(prompt_tokens) if prompt_tokens else 0.0
+    return summary
+
+
+def run_config(config, paths, questions, embed_client, workdir, args):
+    label = f"{config['chunker']}-{config['chunk_size']}-{config['chunk_overlap']}"
+    index_dir = os.path.join(workdir, label)
+    Settings.node_parser = build_node_parser(**config)
+    chroma_collection = open_vector_client(index_dir).get_or_create_collection("hr_documents")
+    lexical_index = LexicalIndex(os.path.join(index_dir, "lexical"))
+
+    index = bench_index(paths, chroma_collection, lexical_index, embed_client, args)
+    query_engine = build_query_engine(chroma_collection, lexical_index, streaming=False)
+    retrieval = score_questions(query_engine, questions)
+    return {
+        **config,
+        "chunks": index["chunks"],
+        "index_mb": dir_size(index_dir) / 2 ** 20,
+        "index_seconds": index["seconds"],
+        "hit_rate": retrieval["hit_rate"],
+        "retrieval_p50_ms": retrieval["p50_ms"],
+        "retrieval_p95_ms": retrieval["p95_ms"],
+        "mean_prompt_tokens": retrieval["mean_prompt_tokens"],
+    }
+
+
+def load_questions(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="rag-chunk-sweep-")
+    server = None
+    try:
+        if args.ollama:
+            base_url = OLLAMA_BASE_URL
+        else:
+            server, base_url = start_stub_server(embed_delay=args.embed_delay)
+
+        if args.data:
+            corpus_dir = args.data
+            questions = load_questions(args.questions)
+        else:
+            corpus_dir = os.path.join(workdir, "data")
+            print(f"📄 Generating {args.files} PDFs x {args.pages} pages in {corpus_dir}...")
+            questions = generate_corpus(corpus_dir, args.files, args.pages, seed=args.seed)
+        paths = sorted(os.path.join(corpus_dir, f) for f in os.listdir(corpus_dir) if f.lower().endswith(".pdf"))
+        questions = random.Random(args.seed).sample(questions, min(args.queries, len(questions)))
+
+        configure_models(base_url=base_url)
+        embed_client = OllamaEmbedClient(base_url=base_url, max_connections=args.concurrency)
+        results = []
+        try:
+            for config in args.configs:
+                print(f"⏱️  {config['chunker']} chunk_size={config['chunk_size']} overlap={config['chunk_overlap']}...")
+                results.append(run_config(config, paths, questions, embed_client, workdir, args))
+        finally:
+            embed_client.close()
+    finally:
+        if server is not None:
+            server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": len(paths),
+        "questions": len(questions),
+        "results": results,
+    }
+
+
+def print_table(results):
+    print(f"\n{'chunker':<10}{'size':>6}{'overlap':>9}{'chunks':>8}{'index MB':>10}{'index s':>9}"
+          f"{'hit rate':>10}{'p50 ms':>9}{'p95 ms':>9}{'prompt tok':>12}")
+    for r in results:
+        print(f"{r['chunker']:<10}{r['chunk_size']:>6}{r['chunk_overlap']:>9}{r['chunks']:>8}{r['index_mb']:>10.2f}"
+              f"{r['index_seconds']:>9.1f}{r['hit_rate']:>10.1%}{r['retrieval_p50_ms']:>9.1f}"
+              f"{r['retrieval_p95_ms']:>9.1f}{r['mean_prompt_tokens']:>12.0f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare chunking configs on index size, speed, recall and prompt size")
+    parser.add_argument("--configs", nargs="+", type=parse_config, default=[parse_config(c) for c in DEFAULT_CONFIGS],
+                        metavar="CHUNKER:SIZE[:OVERLAP]", help=f"configs to sweep (default: {' '.join(DEFAULT_CONFIGS)})")
+    parser.add_argument("--data", default=None, help="index these PDFs instead of a synthetic corpus")
+    parser.add_argument("--questions", default=None, help="labeled questions JSONL (required with --data)")
+    parser.add_argument("--ollama", action="store_true", help="embed with the real Ollama server, not the stub")
+    parser.add_argument("--files", type=int, default=20, help="synthetic PDFs to generate")
+    parser.add_argument("--pages", type=int, default=10, help="pages per synthetic PDF")
+    parser.add_argument("--queries", type=int, default=100, help="questions to score per config")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="chunks per embed request")
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY, help="in-flight embed requests")
+    parser.add_argument("--workers", type=int, default=None, help="PDF parsing processes")
+    parser.add_argument("--embed-delay", type=float, default=0.0, help="stub seconds per embed request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch indexes")
+    parser.add_argument("--out", default="chunk_sweep.json", help="where to write the JSON report")
+    args = parser.parse_args(argv)
+    if args.data and not args.questions:
+        parser.error("--data needs --questions with labeled {question, file, page} lines")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print_table(report["results"])
+    print(f"\n✅ Report written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Local stand-in for the Ollama HTTP API used by the benchmarks.
+
+Implements /api/embed, /api/embeddings, /api/generate and /api/chat
+(streaming and non-streaming) with deterministic output, so indexing and
+query latency can be measured without a model server. Embeddings are
+feature-hashed bags of words, which keeps lexically similar texts close
+together and retrieval meaningful. Generation emits a fixed number of
+tokens with configurable prefill and per-token delays.
+
+Run standalone with ``python -m benchmarks.ollama_stub --port 11435``.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBED_DIM = 768
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def stub_embedding(text, dim=EMBED_DIM):
+    """Deterministic unit vector from hashed word counts"""
+    vector = [0.0] * dim
+    for token in TOKEN_RE.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    if not norm:
+        vector[0] = 1.0
+        return vector
+    return [v / norm for v in vector]
+
+
+class StubConfig:
+    def __init__(self, embed_delay=0.0, first_token_delay=0.0, token_delay=0.0, tokens=64):
+        self.embed_delay = embed_delay
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.tokens = tokens
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            data = (json.dumps(chunk) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "stub", "model": "stub"}]})
+        else:
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        model = request.get("model", "stub")
+
+        if self.path == "/api/embed":
+            inputs = request.get("input", "")
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            time.sleep(self.config.embed_delay)
+            self._send_json({"model": model, "embeddings": [stub_embedding(text) for text in inputs]})
+        elif self.path == "/api/embeddings":
+            time.sleep(self.config.embed_delay)
+            self._send_json({"embedding": stub_embedding(request.get("prompt", ""))})
+        elif self.path in ("/api/generate", "/api/chat"):
+            self._generate(request, model, chat=self.path == "/api/chat")
+        else:
+            self.send_error(404)
+
+    def _generate(self, request, model, chat):
+        if chat:
+            prompt = " ".join(m.get("content", "") for m in request.get("messages", []))
+        else:
+            prompt = request.get("prompt", "")
+        prompt_tokens = len(prompt.split())
+        words = ["stub"] + TOKEN_RE.findall(prompt.lower())[:self.config.tokens - 1]
+        words += ["token"] * (self.config.tokens - len(words))
+
+        def chunk(text, done):
+            payload = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+            if chat:
+                payload["message"] = {"role": "assistant", "content": text}
+            else:
+                payload["response"] = text
+            if done:
+                payload.update(done_reason="stop", prompt_eval_count=prompt_tokens,
+                               eval_count=self.config.tokens, total_duration=0)
+            return payload
+
+        def tokens():
+            time.sleep(self.config.first_token_delay)
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(self.config.token_delay)
+                yield word + " "
+
+        if request.get("stream", True):
+            self._send_stream(itertools.chain((chunk(t, False) for t in tokens()), [chunk("", True)]))
+        else:
+            self._send_json(chunk("".join(tokens()).strip(), True))
+
+
+def start_stub_server(host="127.0.0.1", port=0, **config):
+    """Start the stub in a daemon thread and return (server, base_url)"""
+    handler = type("ConfiguredStubHandler", (StubOllamaHandler,), {"config": StubConfig(**config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic stand-in for the Ollama API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--embed-delay", type=float, default=0.0, help="seconds per embed request")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between tokens")
+    parser.add_argument("--tokens", type=int, default=64, help="tokens per generation")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.host, args.port, embed_delay=args.embed_delay,
+                                    first_token_delay=args.first_token_delay,
+                                    token_delay=args.token_delay, tokens=args.tokens)
+    print(f"Stub Ollama listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Offline benchmark for indexing throughput and query latency.
+
+Generates a synthetic PDF corpus, starts the stub Ollama server and runs
+the real parse -> embed -> Chroma pipeline and query engine against it:
+
+    python -m benchmarks.run_benchmark --files 20 --pages 10 --out bench.json
+    python -m benchmarks.run_benchmark --compare before.json after.json
+
+Stub delays (--embed-delay, --first-token-delay, --token-delay) model the
+model server so results reflect our own overhead plus a fixed, known cost.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from llama_index.core import Settings
+from llama_index.core.schema import MetadataMode, QueryBundle
+from llama_index.vector_stores.chroma import ChromaVectorStore
+
+from benchmarks.ollama_stub import start_stub_server
+from benchmarks.synthetic_corpus import generate_corpus
+from chunking import CHUNKERS, CHUNKER, build_node_parser
+from compact_store import open_vector_client
+from ingest_pipeline import IngestPipeline, OllamaEmbedClient, EMBED_BATCH_SIZE, EMBED_CONCURRENCY
+from lexical_index import LexicalIndex
+from pdf_loader import load_pdfs
+from rag_engine import configure_models, build_query_engine
+from telemetry import percentile
+
+# Metrics shown by --compare, and whether a larger value is better
+COMPARED_METRICS = [
+    ("parse.pages_per_s", True),
+    ("index.chunks_per_s", True),
+    ("retrieval.hit_rate", True),
+    ("retrieval.p50_ms", False),
+    ("retrieval.p95_ms", False),
+    ("retrieval.p99_ms", False),
+    ("query.p50_ms", False),
+    ("query.p95_ms", False),
+    ("query.p99_ms", False),
+]
+
+
+def latency_summary(seconds):
+    return {
+        "count": len(seconds),
+        "mean_ms": 1000 * sum(seconds) / len(seconds) if seconds else 0.0,
+        "p50_ms": 1000 * percentile(seconds, 50),
+        "p95_ms": 1000 * percentile(seconds, 95),
+        "p99_ms": 1000 * percentile(seconds, 99),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_parse(paths, workers):
+    start = time.perf_counter()
+    pages = sum(len(docs) for _, docs, _ in load_pdfs(paths, workers=workers))
+    seconds = time.perf_counter() - start
+    return {"files": len(paths), "pages": pages, "seconds": seconds,
+            "pages_per_s": pages / seconds if seconds else 0.0}
+
+
+def bench_index(paths, chroma_collection, lexical_index, embed_client, args):
+    pipeline = IngestPipeline(
+        ChromaVectorStore(chroma_collection=chroma_collection),
+        embed_client=embed_client,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        parse_workers=args.workers,
+    )
+    stats = pipeline.run(paths, on_nodes_written=lambda nodes: lexical_index.add(
+        (node.node_id, node.get_content(metadata_mode=MetadataMode.NONE)) for node in nodes))
+    lexical_index.flush()
+    return {
+        "chunks": stats.chunks,
+        "seconds": stats.wall_seconds,
+        "chunks_per_s": stats.chunks / stats.wall_seconds if stats.wall_seconds else 0.0,
+        "embed_seconds": stats.embed_seconds,
+        "write_seconds": stats.write_seconds,
+        "embed_requests": stats.embed_requests,
+    }
+
+
+def is_hit(nodes, question):
+    return any(n.node.metadata.get("file_name") == question["file"]
+               and str(n.node.metadata.get("page_label")) == question["page"] for n in nodes)
+
+
+def bench_queries(query_engine, questions, num_queries, seed):
+    sample = random.Random(seed).sample(questions, min(num_queries, len(questions)))
+
+    retrieval_times, hits = [], 0
+    for question in sample:
+        start = time.perf_counter()
+        nodes = query_engine.retrieve(QueryBundle(question["question"]))
+        retrieval_times.append(time.perf_counter() - start)
+        hits += is_hit(nodes, question)
+
+    query_times = []
+    for question in sample:
+        start = time.perf_counter()
+        str(query_engine.query(question["question"]))
+        query_times.append(time.perf_counter() - start)
+
+    retrieval = latency_summary(retrieval_times)
+    retrieval["hit_rate"] = hits / len(sample) if sample else 0.0
+    return retrieval, latency_summary(query_times)
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    server, base_url = start_stub_server(
+        embed_delay=args.embed_delay,
+        first_token_delay=args.first_token_delay,
+        token_delay=args.token_delay,
+        tokens=args.tokens,
+    )
+    try:
+        corpus_dir = os.path.join(workdir, "data")
+        print(f"📄 Generating {args.files} PDFs x {args.pages} pages in {corpus_dir}...")
+        questions = generate_corpus(corpus_dir, args.files, args.pages, seed=args.seed)
+        paths = sorted(os.path.join(corpus_dir, f) for f in os.listdir(corpus_dir) if f.endswith(".pdf"))
+
+        print("⏱️  Parsing...")
+        parse = bench_parse(paths, args.workers)
+
+        print("⏱️  Indexing...")
+        configure_models(base_url=base_url)
+        Settings.node_parser = build_node_parser(args.chunker, args.chunk_size, args.chunk_overlap)
+        chroma_collection = open_vector_client(os.path.join(workdir, "chroma_db")) \
+            .get_or_create_collection("hr_documents")
+        lexical_index = LexicalIndex(os.path.join(workdir, "chroma_db", "lexical"))
+        embed_client = OllamaEmbedClient(base_url=base_url, max_connections=args.concurrency)
+        try:
+            index = bench_index(paths, chroma_collection, lexical_index, embed_client, args)
+        finally:
+            embed_client.close()
+
+        print("⏱️  Querying...")
+        query_engine = build_query_engine(chroma_collection, lexical_index, streaming=False)
+        retrieval, query = bench_queries(query_engine, questions, args.queries, args.seed)
+    finally:
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "keep")},
+        "parse": parse,
+        "index": index,
+        "retrieval": retrieval,
+        "query": query,
+    }
+
+
+def lookup(report, dotted):
+    value = report
+    for key in dotted.split("."):
+        value = value.get(key, {}) if isinstance(value, dict) else {}
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare(base_path, new_path):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'metric':<22}{base.get('commit') or base_path:>14}{new.get('commit') or new_path:>14}   change")
+    for metric, higher_is_better in COMPARED_METRICS:
+        before, after = lookup(base, metric), lookup(new, metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        better = change > 0 if higher_is_better else change < 0
+        marker = "" if abs(change) < 0.02 else ("✅" if better else "⚠️")
+        print(f"{metric:<22}{before:>14.2f}{after:>14.2f}   {change:+.1%} {marker}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline indexing and query benchmark against a stub Ollama")
+    parser.add_argument("--files", type=int, default=20, help="synthetic PDFs to generate")
+    parser.add_argument("--pages", type=int, default=10, help="pages per PDF")
+    parser.add_argument("--queries", type=int, default=50, help="questions to time")
+    parser.add_argument("--chunker", choices=CHUNKERS, default=CHUNKER)
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="chunks per embed request")
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY, help="in-flight embed requests")
+    parser.add_argument("--workers", type=int, default=None, help="PDF parsing processes")
+    parser.add_argument("--embed-delay", type=float, default=0.02, help="stub seconds per embed request")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="stub seconds before first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="stub seconds between tokens")
+    parser.add_argument("--tokens", type=int, default=64, help="stub tokens per answer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    parser.add_argument("--out", default="bench_report.json", help="where to write the JSON report")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two reports and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    report = run(args)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n📊 Parse:     {report['parse']['pages_per_s']:.1f} pages/s")
+    print(f"📊 Index:     {report['index']['chunks_per_s']:.1f} chunks/s ({report['index']['chunks']} chunks)")
+    print(f"📊 Retrieval: p50 {report['retrieval']['p50_ms']:.1f} ms, p95 {report['retrieval']['p95_ms']:.1f} ms, "
+          f"p99 {report['retrieval']['p99_ms']:.1f} ms, hit rate {report['retrieval']['hit_rate']:.1%}")
+    print(f"📊 Query:     p50 {report['query']['p50_ms']:.1f} ms, p95 {report['query']['p95_ms']:.1f} ms, "
+          f"p99 {report['query']['p99_ms']:.1f} ms")
+    print(f"✅ Report written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
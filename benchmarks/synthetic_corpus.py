@@ -0,0 +1,87 @@
+"""Generate a synthetic HR-style PDF corpus with labeled questions.
+
+Every page mentions a unique policy code together with a topic phrase,
+so each generated question has exactly one correct (file, page) answer
+that retrieval hit rate can be measured against. PDFs are written
+directly (Helvetica text objects) to avoid a PDF-writer dependency.
+"""
+import json
+import os
+import random
+
+TOPICS = [
+    "time report submission", "transition cost approval", "travel expense claims",
+    "annual leave requests", "parental leave", "remote work equipment",
+    "overtime compensation", "training budget", "performance review cycle",
+    "sick leave reporting", "contract cost tracking", "onboarding checklist",
+]
+FILLER = (
+    "employees managers policy procedure approval request manager portal form deadline "
+    "department payroll benefits compliance guideline document section member consultant "
+    "project client office schedule record system review team support process update"
+).split()
+
+LINES_PER_PAGE = 55
+WORDS_PER_LINE = 14
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """Write a minimal PDF where each page is a list of text lines"""
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] /Count {len(pages)} >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for page_id, lines in zip(page_ids, pages):
+        stream = "BT /F1 10 Tf 13 TL 50 760 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        objects[page_id] = ("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>")
+        objects[page_id + 1] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for object_id in range(1, len(objects) + 1):
+        offsets.append(len(out))
+        out += f"{object_id} 0 obj\n{objects[object_id]}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_corpus(out_dir, num_files=20, pages_per_file=10, seed=0):
+    """Write the corpus into out_dir and return labeled questions"""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    questions = []
+    for file_index in range(num_files):
+        file_name = f"policy_{file_index:04d}.pdf"
+        pages = []
+        for page_index in range(pages_per_file):
+            topic = rng.choice(TOPICS)
+            code = f"HR-{file_index:04d}-{page_index:03d}"
+            lines = [f"Section {page_index + 1}: {topic.title()} (policy code {code})"]
+            for _ in range(LINES_PER_PAGE - 1):
+                lines.append(" ".join(rng.choice(FILLER) for _ in range(WORDS_PER_LINE)))
+            # Bury the answer sentence mid-page so it isn't always in the first chunk
+            lines.insert(rng.randrange(1, LINES_PER_PAGE),
+                         f"For {topic} under policy code {code}, submit the request in the portal.")
+            pages.append(lines)
+            questions.append({
+                "question": f"What is the procedure for {topic} under policy code {code}?",
+                "file": file_name,
+                "page": str(page_index + 1),
+            })
+        write_pdf(os.path.join(out_dir, file_name), pages)
+
+    with open(os.path.join(out_dir, "questions.jsonl"), "w") as f:
+        for question in questions:
+            f.write(json.dumps(question) + "\n")
+    return questions
@@ -0,0 +1,226 @@
+"""Recall vs latency of the compact vector store against Chroma on the same vectors.
+
+Loads every chunk embedding from a Chroma collection, copies it into
+compact stores at several settings ("quantization:dim:ann") and times
+top-k queries on each, scoring recall against exact float32 search over
+the full-dimension vectors:
+
+    python -m benchmarks.vector_store_compare
+    python -m benchmarks.vector_store_compare --source ./chroma_db --questions labeled.jsonl --ollama
+
+By default a synthetic corpus is indexed with the stub Ollama. Stub
+embeddings are hashed bags of words, not Matryoshka-trained, so recall
+of truncated dimensions is only meaningful with --ollama on real data.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from llama_index.core import Settings
+
+from benchmarks.ollama_stub import start_stub_server
+from benchmarks.run_benchmark import bench_index, git_commit, latency_summary
+from benchmarks.synthetic_corpus import generate_corpus
+from chunking import build_node_parser
+from compact_store import CompactCollection, prepare_vectors
+from ingest_pipeline import OllamaEmbedClient, OLLAMA_BASE_URL, EMBED_BATCH_SIZE, EMBED_CONCURRENCY
+from lexical_index import LexicalIndex
+from rag_engine import configure_models
+
+DEFAULT_CONFIGS = ["float32:0:flat", "int8:0:flat", "int8:512:flat", "int8:256:flat", "int8:0:ivf", "int8:0:hnsw"]
+PAGE_SIZE = 1000
+
+
+def parse_config(spec):
+    quantization, dim, ann = spec.split(":")
+    if quantization not in ("int8", "float32") or ann not in ("flat", "ivf", "hnsw"):
+        raise argparse.ArgumentTypeError(f"expected int8|float32:DIM:flat|ivf|hnsw, got {spec!r}")
+    return {"quantization": quantization, "dim": int(dim), "ann": ann}
+
+
+def load_collection(collection):
+    """All IDs, embeddings, documents and metadatas of a Chroma collection"""
+    ids, embeddings, documents, metadatas = [], [], [], []
+    offset = 0
+    while True:
+        batch = collection.get(include=["embeddings", "documents", "metadatas"], limit=PAGE_SIZE, offset=offset)
+        if not len(batch["ids"]):
+            break
+        ids.extend(batch["ids"])
+        embeddings.extend(batch["embeddings"])
+        documents.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+        offset += len(batch["ids"])
+    return ids, np.asarray(embeddings, dtype=np.float32), documents, metadatas
+
+
+def exact_top_k(vectors, queries, k):
+    scores = prepare_vectors(queries) @ prepare_vectors(vectors).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall(results, truth_ids):
+    return float(np.mean([len(set(found) & set(expected)) / len(expected)
+                          for found, expected in zip(results, truth_ids)]))
+
+
+def time_queries(collection, queries, k):
+    times, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k)
+        times.append(time.perf_counter() - start)
+        results.append(result["ids"][0])
+    return times, results
+
+
+def bench_compact(config, data, queries, truth_ids, workdir, k):
+    ids, vectors, documents, metadatas = data
+    label = f"{config['quantization']}-{config['dim'] or 'full'}-{config['ann']}"
+    collection = CompactCollection(os.path.join(workdir, label), dim=config["dim"], quantization=config["quantization"],
+                                   ann=config["ann"], ann_min_rows=0)
+    start = time.perf_counter()
+    for offset in range(0, len(ids), PAGE_SIZE):
+        end = offset + PAGE_SIZE
+        collection.add(ids[offset:end], vectors[offset:end], metadatas[offset:end], documents[offset:end])
+    # The first query builds the ANN index, so it counts as build time
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=k)
+    build_seconds = time.perf_counter() - start
+
+    times, results = time_queries(collection, queries, k)
+    item_bytes = 1 if collection.quantized else 4
+    report = {
+        **config,
+        "ann": collection.ann,
+        "label": label,
+        "build_seconds": build_seconds,
+        "recall": recall(results, truth_ids),
+        "vector_mb": collection.num_rows * collection.dim * item_bytes / 2 ** 20,
+        "disk_mb": collection.disk_bytes() / 2 ** 20,
+        **latency_summary(times),
+    }
+    collection.close()
+    return report
+
+
+def build_synthetic_index(workdir, base_url, args):
+    import chromadb
+
+    corpus_dir = os.path.join(workdir, "data")
+    print(f"📄 Generating {args.files} PDFs x {args.pages} pages and indexing into Chroma...")
+    questions = generate_corpus(corpus_dir, args.files, args.pages, seed=args.seed)
+    paths = sorted(os.path.join(corpus_dir, f) for f in os.listdir(corpus_dir) if f.endswith(".pdf"))
+    Settings.node_parser = build_node_parser()
+    collection = chromadb.PersistentClient(path=os.path.join(workdir, "chroma_db")) \
+        .get_or_create_collection("hr_documents")
+    embed_client = OllamaEmbedClient(base_url=base_url, max_connections=args.concurrency)
+    try:
+        bench_index(paths, collection, LexicalIndex(os.path.join(workdir, "lexical")), embed_client, args)
+    finally:
+        embed_client.close()
+    return collection, questions
+
+
+def run(args):
+    import chromadb
+
+    workdir = tempfile.mkdtemp(prefix="rag-vector-compare-")
+    server = None
+    try:
+        if args.ollama:
+            base_url = OLLAMA_BASE_URL
+        else:
+            server, base_url = start_stub_server()
+        configure_models(base_url=base_url)
+
+        if args.source:
+            collection = chromadb.PersistentClient(path=args.source).get_collection(args.collection)
+            with open(args.questions) as f:
+                questions = [json.loads(line) for line in f if line.strip()]
+        else:
+            collection, questions = build_synthetic_index(workdir, base_url, args)
+
+        print("📥 Loading vectors from Chroma...")
+        data = load_collection(collection)
+        questions = random.Random(args.seed).sample(questions, min(args.queries, len(questions)))
+        embed_client = OllamaEmbedClient(base_url=base_url)
+        try:
+            queries = np.asarray(embed_client.embed([q["question"] for q in questions]), dtype=np.float32)
+        finally:
+            embed_client.close()
+
+        truth_ids = [[data[0][row] for row in rows] for rows in exact_top_k(data[1], queries, args.k)]
+
+        print(f"⏱️  Chroma ({len(data[0])} vectors, {len(queries)} queries, k={args.k})...")
+        times, results = time_queries(collection, queries, args.k)
+        reports = [{"label": "chroma", "recall": recall(results, truth_ids), **latency_summary(times)}]
+        for config in args.configs:
+            print(f"⏱️  compact {config['quantization']} dim={config['dim'] or 'full'} {config['ann']}...")
+            reports.append(bench_compact(config, data, queries, truth_ids, workdir, args.k))
+    finally:
+        if server is not None:
+            server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "vectors": len(data[0]),
+        "dim": int(data[1].shape[1]) if len(data[1]) else 0,
+        "queries": len(queries),
+        "k": args.k,
+        "results": reports,
+    }
+
+
+def print_table(results):
+    print(f"\n{'store':<22}{'recall':>8}{'p50 ms':>9}{'p95 ms':>9}{'vectors MB':>12}{'disk MB':>9}{'build s':>9}")
+    for r in results:
+        sizes = (f"{r['vector_mb']:>12.2f}{r['disk_mb']:>9.2f}{r['build_seconds']:>9.1f}"
+                 if "vector_mb" in r else f"{'':>12}{'':>9}{'':>9}")
+        print(f"{r['label']:<22}{r['recall']:>8.1%}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{sizes}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare compact vector store settings with Chroma")
+    parser.add_argument("--configs", nargs="+", type=parse_config, default=[parse_config(c) for c in DEFAULT_CONFIGS],
+                        metavar="QUANT:DIM:ANN", help=f"compact settings (default: {' '.join(DEFAULT_CONFIGS)})")
+    parser.add_argument("--source", default=None, help="existing Chroma directory to read vectors from")
+    parser.add_argument("--collection", default="hr_documents")
+    parser.add_argument("--questions", default=None, help="questions JSONL (required with --source)")
+    parser.add_argument("--ollama", action="store_true", help="embed with the real Ollama server, not the stub")
+    parser.add_argument("--files", type=int, default=50, help="synthetic PDFs to generate")
+    parser.add_argument("--pages", type=int, default=20, help="pages per synthetic PDF")
+    parser.add_argument("--queries", type=int, default=200, help="questions to time")
+    parser.add_argument("-k", type=int, default=20, help="neighbours per query (the retriever's candidate count)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="chunks per embed request")
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY, help="in-flight embed requests")
+    parser.add_argument("--workers", type=int, default=None, help="PDF parsing processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    parser.add_argument("--out", default="vector_store_compare.json", help="where to write the JSON report")
+    args = parser.parse_args(argv)
+    if args.source and not args.questions:
+        parser.error("--source needs --questions")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print_table(report["results"])
+    print(f"\n✅ Report written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
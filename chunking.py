@@ -0,0 +1,187 @@
+"""Chunking strategies for the indexer.
+
+"sentence" is the original fixed-size SimpleNodeParser. "layout" splits
+each page into headings, paragraphs, list items and tables first and
+packs whole blocks into chunks, so a chunk never starts mid-table or
+mid-list-item and never spans two sections. The current section title is
+stored as ``section_title`` metadata on every chunk (and carries over
+onto following pages until the next heading).
+
+Select with RAG_CHUNKER / RAG_CHUNK_SIZE / RAG_CHUNK_OVERLAP or the
+indexer's --chunker flag; benchmarks/chunk_sweep.py compares configs.
+"""
+import os
+import re
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.node_parser import NodeParser, SentenceSplitter, SimpleNodeParser
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.utils import get_tokenizer
+
+CHUNKERS = ("sentence", "layout")
+CHUNKER = os.environ.get("RAG_CHUNKER", "sentence")
+CHUNK_SIZE = int(os.environ.get("RAG_CHUNK_SIZE", "1024"))
+CHUNK_OVERLAP = int(os.environ.get("RAG_CHUNK_OVERLAP", "200"))
+
+NUMBERED_HEADING_RE = re.compile(
+    r"^(\d+(\.\d+)*\.?|(chapter|section|article|part|appendix)\s+[\w.]+)(:|\s|$)", re.IGNORECASE)
+LIST_ITEM_RE = re.compile(r"^([•▪◦·●○■□➢►✓\-\*–]|\(?\d{1,2}[.)]|\(?[a-z][.)]|\(?[ivx]{1,4}\))\s+", re.IGNORECASE)
+TABLE_CELL_SPLIT_RE = re.compile(r"\s{2,}|\t|\s*\|\s*")
+MAX_HEADING_CHARS = 90
+MAX_HEADING_WORDS = 12
+
+
+def is_heading(line):
+    if len(line) > MAX_HEADING_CHARS or len(line.split()) > MAX_HEADING_WORDS or line[-1] in ".,;":
+        return False
+    if NUMBERED_HEADING_RE.match(line):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    if len(letters) >= 3 and all(c.isupper() for c in letters):
+        return True
+    words = [w for w in line.split() if w[0].isalpha()]
+    return len(words) >= 2 and sum(w[0].isupper() for w in words) / len(words) >= 0.8
+
+
+def is_table_row(line):
+    cells = [cell for cell in TABLE_CELL_SPLIT_RE.split(line.strip()) if cell]
+    return len(cells) >= 3
+
+
+def classify_line(line):
+    """Return "heading", "list_item", "table_row" or "text" for one stripped line"""
+    if is_table_row(line):
+        return "table_row"
+    if LIST_ITEM_RE.match(line) and not (NUMBERED_HEADING_RE.match(line) and is_heading(line)):
+        return "list_item"
+    if is_heading(line):
+        return "heading"
+    return "text"
+
+
+def layout_blocks(text, section=None):
+    """Split page text into [kind, section, lines] blocks (heading, paragraph, list_item, table)"""
+    blocks = []
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            # A blank line ends paragraphs and list items, but not tables
+            if blocks and blocks[-1][0] != "table":
+                blocks.append(["break", section, []])
+            continue
+        kind = classify_line(line)
+        last = blocks[-1] if blocks else None
+        if kind == "heading":
+            section = line
+            blocks.append(["heading", section, [line]])
+        elif kind == "table_row" and last and last[0] == "table":
+            last[2].append(line)
+        elif kind == "table_row":
+            blocks.append(["table", section, [line]])
+        elif kind == "list_item":
+            blocks.append(["list_item", section, [line]])
+        elif last and last[0] in ("paragraph", "list_item"):
+            # Wrapped line of the paragraph or list item above
+            last[2].append(line)
+        else:
+            blocks.append(["paragraph", section, [line]])
+
+    for block in blocks:
+        # A lone "table row" is just a line with wide spacing
+        if block[0] == "table" and len(block[2]) == 1:
+            block[0] = "paragraph"
+    return [block for block in blocks if block[0] != "break"], section
+
+
+class LayoutNodeParser(NodeParser):
+    """Structure-aware chunker: packs whole layout blocks up to chunk_size tokens"""
+
+    chunk_size: int = CHUNK_SIZE
+    chunk_overlap: int = CHUNK_OVERLAP
+
+    _tokenizer = PrivateAttr()
+    _splitter = PrivateAttr()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._tokenizer = get_tokenizer()
+        self._splitter = SentenceSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+
+    @classmethod
+    def class_name(cls):
+        return "LayoutNodeParser"
+
+    def _tokens(self, text):
+        return len(self._tokenizer(text))
+
+    def _split_block(self, kind, lines):
+        """Split a block that alone exceeds chunk_size"""
+        if kind != "table":
+            return self._splitter.split_text("\n".join(lines))
+        # Tables split between rows, repeating the header row in every piece
+        header, pieces, current = lines[0], [], [lines[0]]
+        for row in lines[1:]:
+            if len(current) > 1 and self._tokens("\n".join(current + [row])) > self.chunk_size:
+                pieces.append("\n".join(current))
+                current = [header]
+            current.append(row)
+        pieces.append("\n".join(current))
+        return pieces
+
+    def split_page(self, text, section=None):
+        """Return ([(chunk_text, section_title)], section at the end of the page)"""
+        blocks, end_section = layout_blocks(text, section)
+        chunks, current, current_tokens, current_section = [], [], 0, section
+
+        def flush():
+            nonlocal current, current_tokens
+            if current:
+                chunks.append(("\n".join(current), current_section))
+            current, current_tokens = [], 0
+
+        for kind, block_section, lines in blocks:
+            if kind == "heading" or block_section != current_section:
+                flush()
+                current_section = block_section
+            block_text = "\n".join(lines)
+            tokens = self._tokens(block_text)
+            if tokens > self.chunk_size:
+                flush()
+                chunks.extend((piece, current_section) for piece in self._split_block(kind, lines))
+                continue
+            if current_tokens + tokens > self.chunk_size:
+                flush()
+            current.append(block_text)
+            current_tokens += tokens
+        flush()
+        return chunks, end_section
+
+    def _parse_nodes(self, nodes, show_progress=False, **kwargs):
+        all_nodes = []
+        section, file_name = None, None
+        for node in nodes:
+            # Sections run on across pages of the same file
+            if node.metadata.get("file_name") != file_name:
+                section, file_name = None, node.metadata.get("file_name")
+            chunks, section = self.split_page(node.get_content(), section)
+            if not chunks:
+                continue
+            split_nodes = build_nodes_from_splits([text for text, _ in chunks], node, id_func=self.id_func)
+            for split_node, (_, chunk_section) in zip(split_nodes, chunks):
+                if chunk_section:
+                    split_node.metadata["section_title"] = chunk_section
+            all_nodes.extend(split_nodes)
+        return all_nodes
+
+
+def build_node_parser(chunker=CHUNKER, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    if chunker == "layout":
+        return LayoutNodeParser(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    if chunker == "sentence":
+        return SimpleNodeParser.from_defaults(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    raise ValueError(f"Unknown chunker {chunker!r}, expected one of {', '.join(CHUNKERS)}")
+
+
+def chunker_config(chunker=CHUNKER, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """What the manifest records, so re-chunking without --rebuild can be spotted"""
+    return {"chunker": chunker, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
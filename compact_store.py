@@ -0,0 +1,647 @@
+"""Compact memory-mapped vector store, usable in place of Chroma.
+
+CompactCollection implements the part of the Chroma collection API this
+app uses (add/upsert, update, get, query, delete, count), so it plugs in behind
+ChromaVectorStore, the hybrid retriever, the router and the indexer
+unchanged. Select it with RAG_VECTOR_BACKEND=compact and re-index.
+
+Layout under ./chroma_db/compact/<collection>:
+
+    vectors.bin   row-major matrix, int8 (or float32), memory-mapped for search
+    scales.bin    per-row float32 scale for int8 rows
+    rows.sqlite   row -> chunk ID, text and metadata (JSON); deleted rows are absent;
+                  the compaction generation, which names the live vector files
+    store.json    stored dimension and quantization
+
+Compaction writes vectors.<generation>.bin and scales.<generation>.bin
+and commits the new generation in the same transaction as the row
+renumbering, so readers always map the files their rows point into.
+
+Vectors are optionally truncated to their first RAG_VECTOR_DIM dimensions
+(Matryoshka; nomic-embed-text supports 768/512/256/128/64), normalized
+and quantized to int8 with one scale per row. Search is a blocked
+matrix product over the mmap for a batch of queries with a running
+top-k. For large corpora RAG_VECTOR_ANN=ivf (NumPy k-means inverted
+lists) or hnsw (needs hnswlib) picks candidates that are then rescored
+exactly. The ANN index is built on a background thread after compaction
+or once it goes stale, and persisted; queries use exact search (or the
+previous index) until it is ready. benchmarks/vector_store_compare.py measures recall and latency
+against Chroma.
+"""
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTOR_BACKEND = os.environ.get("RAG_VECTOR_BACKEND", "chroma")
+# Keep only the first N embedding dimensions; 0 keeps them all
+VECTOR_DIM = int(os.environ.get("RAG_VECTOR_DIM", "0"))
+QUANTIZATION = os.environ.get("RAG_VECTOR_QUANTIZATION", "int8")
+ANN_MODE = os.environ.get("RAG_VECTOR_ANN", "flat")
+# Below this many rows an exact scan beats building an ANN index
+ANN_MIN_ROWS = int(os.environ.get("RAG_VECTOR_ANN_MIN_ROWS", "20000"))
+IVF_NPROBE = int(os.environ.get("RAG_VECTOR_IVF_NPROBE", "8"))
+HNSW_EF = int(os.environ.get("RAG_VECTOR_HNSW_EF", "128"))
+
+SEARCH_BLOCK_ROWS = 8192
+SQL_BATCH = 500
+# Rewrite the matrix once this share of its rows are deleted
+COMPACT_DEAD_RATIO = 0.25
+# Rebuild the ANN index once rows added since it was built reach this share
+ANN_STALE_RATIO = 0.2
+
+_OPS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def prepare_vectors(vectors, dim=None):
+    """Truncate rows to dim (Matryoshka) and L2-normalize them"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    if dim:
+        vectors = vectors[:, :dim]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def quantize_int8(vectors):
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def where_to_sql(where):
+    """Translate a Chroma metadata filter into (sql, params) over the JSON metadata column"""
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_to_sql(w) for w in condition]
+            clauses.append("(" + f" {key[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+        path = "$." + json.dumps(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, value in condition.items():
+            if op in ("$in", "$nin"):
+                negate = "NOT " if op == "$nin" else ""
+                clauses.append(f"json_extract(metadata, ?) {negate}IN ({','.join('?' * len(value))})")
+                params.extend([path, *value])
+            else:
+                clauses.append(f"json_extract(metadata, ?) {_OPS[op]} ?")
+                params.extend([path, value])
+    return " AND ".join(clauses) or "1", params
+
+
+def _dequantize(matrix, scales, rows):
+    """Float32 vectors for row indices or a slice; scales is None for float32 storage"""
+    block = np.asarray(matrix[rows], dtype=np.float32)
+    if scales is not None:
+        block *= scales[rows][:, None]
+    return block
+
+
+class _MatrixView:
+    """The vector files as mapped at one moment, so an ANN index can be built without the collection lock"""
+
+    def __init__(self, collection):
+        self.dim = collection.dim
+        self.num_rows = collection.num_rows
+        self._matrix = collection._matrix
+        self._scales = collection._scales
+
+    def vectors(self, rows):
+        return _dequantize(self._matrix, self._scales, rows)
+
+
+def _top_k(scores, rows, k):
+    """Keep the k best (score, row) pairs per query, best first"""
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        rows = np.take_along_axis(rows, keep, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+
+class IVFIndex:
+    """Inverted lists over spherical k-means centroids"""
+
+    def __init__(self, centroids, order, offsets, num_rows):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.num_rows = num_rows
+
+    @classmethod
+    def build(cls, collection, iterations=10, seed=0):
+        n = collection.num_rows
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n, min(n, nlist * 64), replace=False))
+        data = collection.vectors(sample)
+        centroids = data[rng.choice(len(data), nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            counts = np.bincount(assign, minlength=nlist)
+            centroids = np.where(counts[:, None] > 0, prepare_vectors(sums), centroids)
+
+        assign = np.concatenate([
+            np.argmax(collection.vectors(slice(start, min(start + SEARCH_BLOCK_ROWS, n))) @ centroids.T, axis=1)
+            for start in range(0, n, SEARCH_BLOCK_ROWS)
+        ])
+        order = np.argsort(assign, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        return cls(centroids, order, offsets, n)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["centroids"], data["order"], data["offsets"], int(data["num_rows"]))
+
+    def save(self, path):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 num_rows=self.num_rows)
+        os.replace(tmp_path, path)
+
+    def candidates(self, query, k, nprobe=IVF_NPROBE):
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+
+
+class HNSWIndex:
+    """hnswlib graph over the dequantized vectors"""
+
+    def __init__(self, index, num_rows):
+        self.index = index
+        self.num_rows = num_rows
+
+    @classmethod
+    def build(cls, collection):
+        import hnswlib
+        n = collection.num_rows
+        index = hnswlib.Index(space="ip", dim=collection.dim)
+        index.init_index(max_elements=n, ef_construction=200, M=16)
+        for start in range(0, n, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, n)
+            index.add_items(collection.vectors(slice(start, end)), np.arange(start, end))
+        return cls(index, n)
+
+    @classmethod
+    def load(cls, path, dim, num_rows):
+        import hnswlib
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.load_index(path, max_elements=num_rows)
+        return cls(index, num_rows)
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        self.index.save_index(tmp_path)
+        os.replace(tmp_path, path)
+
+    def candidates(self, query, k):
+        self.index.set_ef(max(HNSW_EF, 2 * k))
+        labels, _ = self.index.knn_query(query[None, :], k=min(2 * k, self.num_rows))
+        return labels[0].astype(np.int64)
+
+
+class CompactCollection:
+    def __init__(self, path, name=None, dim=VECTOR_DIM, quantization=QUANTIZATION, ann=ANN_MODE,
+                 ann_min_rows=ANN_MIN_ROWS):
+        self.path = path
+        self.name = name or os.path.basename(os.path.normpath(path))
+        self.ann = ann
+        self.ann_min_rows = ann_min_rows
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(path, "rows.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS rows "
+                         "(row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, document TEXT, metadata TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+        self._db.commit()
+
+        self._config_path = os.path.join(path, "store.json")
+        self.config = self._load_config() or {"dim": dim or None, "quantization": quantization}
+        self.generation = 0
+        self._vectors_path, self._scales_path = self._vector_files(0)
+        self._version = None
+        self._matrix = None
+        self._scales = None
+        self._live = np.zeros(0, dtype=bool)
+        self.num_rows = 0
+        self._ann_index = None
+        self._ann_thread = None
+
+    # -- storage --------------------------------------------------------------
+
+    def _vector_files(self, generation):
+        """Vector and scale file paths of a compaction generation (0 keeps the original names)"""
+        suffix = f".{generation}" if generation else ""
+        return (os.path.join(self.path, f"vectors{suffix}.bin"),
+                os.path.join(self.path, f"scales{suffix}.bin"))
+
+    def _load_config(self):
+        if os.path.exists(self._config_path):
+            with open(self._config_path) as f:
+                return json.load(f)
+        return None
+
+    def _save_config(self):
+        tmp_path = self._config_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.config, f)
+        os.replace(tmp_path, self._config_path)
+
+    @property
+    def dim(self):
+        return self.config["dim"]
+
+    @property
+    def quantized(self):
+        return self.config["quantization"] == "int8"
+
+    def _stored_rows(self):
+        """Rows fully present in the vector (and scale) files"""
+        if not self.dim or not os.path.exists(self._vectors_path):
+            return 0
+        rows = os.path.getsize(self._vectors_path) // (self.dim * (1 if self.quantized else 4))
+        if self.quantized:
+            rows = min(rows, os.path.getsize(self._scales_path) // 4 if os.path.exists(self._scales_path) else 0)
+        return rows
+
+    def _refresh(self):
+        """Re-map the files and reload the live mask if anything changed (possibly in another process)"""
+        data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        stat = os.stat(self._vectors_path) if os.path.exists(self._vectors_path) else None
+        version = (data_version, stat and stat.st_size, stat and stat.st_mtime_ns)
+        if version == self._version:
+            return
+        # One read transaction: the generation and the row numbers come from the same commit
+        with self._db:
+            if not self._db.in_transaction:
+                self._db.execute("BEGIN")
+            generation = self._db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+            rows = np.array([r for (r,) in self._db.execute("SELECT row FROM rows")], dtype=np.int64)
+        if generation != self.generation:
+            self.generation = generation
+            self._vectors_path, self._scales_path = self._vector_files(generation)
+            stat = os.stat(self._vectors_path) if os.path.exists(self._vectors_path) else None
+            version = (data_version, stat and stat.st_size, stat and stat.st_mtime_ns)
+        self._version = version
+        self.config = self._load_config() or self.config
+        n = self.num_rows = self._stored_rows()
+        if n:
+            dtype = np.int8 if self.quantized else np.float32
+            self._matrix = np.memmap(self._vectors_path, dtype=dtype, mode="r", shape=(n, self.dim))
+            self._scales = (np.memmap(self._scales_path, dtype=np.float32, mode="r", shape=(n,))
+                            if self.quantized else None)
+        else:
+            self._matrix, self._scales = None, None
+        self._live = np.zeros(n, dtype=bool)
+        self._live[rows[rows < n]] = True
+        if self._ann_index is not None and self._ann_index[0] != self.generation:
+            self._ann_index = None
+
+    def vectors(self, rows):
+        """Dequantized float32 vectors for row indices or a slice"""
+        return _dequantize(self._matrix, self._scales, rows)
+
+    # -- Chroma collection API ----------------------------------------------------
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        """Append vectors; existing IDs are replaced"""
+        with self._lock:
+            if not ids:
+                return
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            self._refresh()
+            if self.dim is None or self.dim > embeddings.shape[1]:
+                if self.num_rows:
+                    # Rereading the stored matrix at another row width would scramble it
+                    raise ValueError(f"Embedding dimension {embeddings.shape[1]} is below the stored dimension "
+                                     f"{self.dim} of {self.name}; re-index to change the embedding model")
+                self.config["dim"] = embeddings.shape[1]
+                self._save_config()
+            vectors = prepare_vectors(embeddings, self.dim)
+            start = self.num_rows
+
+            # Drop any partial rows an interrupted write left behind, then append
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(start * self.dim * (1 if self.quantized else 4))
+                if self.quantized:
+                    vectors, scales = quantize_int8(vectors)
+                    with open(self._scales_path, "ab") as s:
+                        s.truncate(start * 4)
+                        s.write(scales.tobytes())
+                f.write(vectors.tobytes())
+
+            metadatas = metadatas or [{}] * len(ids)
+            documents = documents or [None] * len(ids)
+            with self._db:
+                self._delete_ids(ids)
+                self._db.executemany(
+                    "INSERT INTO rows (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(start + i, chunk_id, document, json.dumps(metadata))
+                     for i, (chunk_id, document, metadata) in enumerate(zip(ids, documents, metadatas))])
+            self._version = None
+
+    upsert = add
+
+    def _select(self, columns, ids=None, where=None, rows=None, limit=None, offset=None):
+        clauses, params = [], []
+        if where:
+            sql, where_params = where_to_sql(where)
+            clauses.append(sql)
+            params.extend(where_params)
+        keys = ids if ids is not None else rows
+        key_column = "id" if ids is not None else "row"
+        if keys is None:
+            batches = [None]
+        else:
+            keys = [k.item() if hasattr(k, "item") else k for k in keys]
+            batches = [keys[i:i + SQL_BATCH] for i in range(0, len(keys), SQL_BATCH)]
+
+        results = []
+        for batch in batches:
+            batch_clauses, batch_params = list(clauses), list(params)
+            if batch is not None:
+                batch_clauses.append(f"{key_column} IN ({','.join('?' * len(batch))})")
+                batch_params.extend(batch)
+            sql = f"SELECT {columns} FROM rows WHERE {' AND '.join(batch_clauses) or '1'} ORDER BY row"
+            if limit is not None or offset:
+                sql += " LIMIT ? OFFSET ?"
+                batch_params.extend([-1 if limit is None else limit, offset or 0])
+            results.extend(self._db.execute(sql, batch_params).fetchall())
+        return results
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents"), **kwargs):
+        with self._lock:
+            self._refresh()
+            found = self._select("row, id, document, metadata", ids=ids, where=where, limit=limit, offset=offset)
+            return {
+                "ids": [chunk_id for _, chunk_id, _, _ in found],
+                "documents": [doc for _, _, doc, _ in found] if "documents" in include else None,
+                "metadatas": [json.loads(meta) for _, _, _, meta in found] if "metadatas" in include else None,
+                "embeddings": (self.vectors(np.array([row for row, _, _, _ in found], dtype=np.int64)).tolist()
+                               if "embeddings" in include and found else None),
+            }
+
+    def update(self, ids, metadatas=None, **kwargs):
+        """Replace the metadata of existing rows (vectors and text are kept)"""
+        if metadatas is None:
+            return
+        with self._lock, self._db:
+            self._db.executemany("UPDATE rows SET metadata = ? WHERE id = ?",
+                                 [(json.dumps(metadata), chunk_id) for chunk_id, metadata in zip(ids, metadatas)])
+            self._version = None
+
+    def _delete_ids(self, ids):
+        for start in range(0, len(ids), SQL_BATCH):
+            batch = list(ids[start:start + SQL_BATCH])
+            self._db.execute(f"DELETE FROM rows WHERE id IN ({','.join('?' * len(batch))})", batch)
+
+    def delete(self, ids=None, where=None, **kwargs):
+        with self._lock:
+            with self._db:
+                if ids is not None and where:
+                    rows = [row for (row,) in self._select("row", ids=ids, where=where)]
+                    for start in range(0, len(rows), SQL_BATCH):
+                        batch = rows[start:start + SQL_BATCH]
+                        self._db.execute(f"DELETE FROM rows WHERE row IN ({','.join('?' * len(batch))})", batch)
+                elif ids is not None:
+                    self._delete_ids(ids)
+                elif where:
+                    sql, params = where_to_sql(where)
+                    self._db.execute(f"DELETE FROM rows WHERE {sql}", params)
+            self._version = None
+            self._refresh()
+            dead = self.num_rows - int(self._live.sum())
+            if dead and dead >= COMPACT_DEAD_RATIO * self.num_rows:
+                self.compact()
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("metadatas", "documents", "distances"),
+              **kwargs):
+        with self._lock:
+            queries = np.asarray(query_embeddings, dtype=np.float32)
+            if queries.ndim == 1:
+                queries = queries[None, :]
+            self._refresh()
+            allowed = None
+            if where:
+                allowed = np.array([row for (row,) in self._select("row", where=where)], dtype=np.int64)
+            scores, rows = self.search(queries, n_results, allowed)
+
+            hits = [(s[np.isfinite(s)], r[np.isfinite(s)]) for s, r in zip(scores, rows)]
+            needed = sorted({int(row) for _, r in hits for row in r})
+            by_row = {row: (chunk_id, doc, meta) for row, chunk_id, doc, meta
+                      in self._select("row, id, document, metadata", rows=needed)}
+            result = {"ids": [[by_row[int(row)][0] for row in r] for _, r in hits]}
+            if "documents" in include:
+                result["documents"] = [[by_row[int(row)][1] for row in r] for _, r in hits]
+            if "metadatas" in include:
+                result["metadatas"] = [[json.loads(by_row[int(row)][2]) for row in r] for _, r in hits]
+            if "distances" in include:
+                # Squared L2 between unit vectors, matching Chroma's default space
+                result["distances"] = [(2 - 2 * s).tolist() for s, _ in hits]
+            if "embeddings" in include:
+                result["embeddings"] = [self.vectors(r).tolist() if len(r) else [] for _, r in hits]
+            return result
+
+    # -- search -----------------------------------------------------------------
+
+    def search(self, queries, k, allowed=None):
+        """Return (scores, rows), each (num_queries, k); missing hits have score -inf"""
+        queries = prepare_vectors(queries, self.dim)
+        empty = (np.full((len(queries), 0), -np.inf, dtype=np.float32), np.zeros((len(queries), 0), dtype=np.int64))
+        if not self.num_rows or k <= 0:
+            return empty
+
+        if allowed is not None:
+            allowed = allowed[allowed < self.num_rows]
+            return self._exact(queries, k, allowed[self._live[allowed]])
+        ann_index = self._get_ann_index()
+        if ann_index is None:
+            return self._exact(queries, k)
+
+        # Candidates from the ANN index plus rows added since it was built, rescored exactly
+        tail = np.arange(ann_index.num_rows, self.num_rows)
+        results = []
+        for query in queries:
+            candidates = np.unique(np.concatenate([ann_index.candidates(query, k), tail]))
+            candidates = candidates[(candidates >= 0) & (candidates < self.num_rows)]
+            results.append(self._exact(query[None, :], k, candidates[self._live[candidates]]))
+        width = max(s.shape[1] for s, _ in results)
+        scores = np.full((len(queries), width), -np.inf, dtype=np.float32)
+        rows = np.zeros((len(queries), width), dtype=np.int64)
+        for i, (s, r) in enumerate(results):
+            scores[i, :s.shape[1]] = s[0]
+            rows[i, :r.shape[1]] = r[0]
+        return scores, rows
+
+    def _exact(self, queries, k, rows=None):
+        """Blocked brute-force top-k over all live rows, or over the given rows"""
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        total = self.num_rows if rows is None else len(rows)
+        for start in range(0, total, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, total)
+            if rows is None:
+                block_rows = np.arange(start, end)
+                scores = queries @ self.vectors(slice(start, end)).T
+                scores[:, ~self._live[start:end]] = -np.inf
+            else:
+                block_rows = rows[start:end]
+                scores = queries @ self.vectors(block_rows).T
+            best_scores, best_rows = _top_k(
+                np.concatenate([best_scores, scores], axis=1),
+                np.concatenate([best_rows, np.broadcast_to(block_rows, scores.shape)], axis=1),
+                k,
+            )
+        return best_scores, best_rows
+
+    def _get_ann_index(self):
+        """The ANN index to search with, or None for exact search; a missing or stale one is rebuilt off-thread"""
+        if self.ann == "flat" or int(self._live.sum()) < self.ann_min_rows:
+            return None
+        if self._ann_index is None:
+            self._ann_index = (self.generation, self._load_ann_index())
+        index = self._ann_index[1]
+        if index is None or self.num_rows - index.num_rows > ANN_STALE_RATIO * index.num_rows:
+            self._start_ann_build()
+        # Until the new one is ready, rows added since the old one was built are rescored exactly
+        return index
+
+    def _ann_path(self):
+        return os.path.join(self.path, "ivf.npz" if self.ann == "ivf" else "hnsw.bin")
+
+    def _load_ann_index(self):
+        path = self._ann_path()
+        meta_path = path + ".json"
+        if not os.path.exists(path) or not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["generation"] != self.generation or meta["num_rows"] > self.num_rows:
+            return None
+        if self.ann == "ivf":
+            return IVFIndex.load(path)
+        try:
+            return HNSWIndex.load(path, self.dim, meta["num_rows"])
+        except ImportError:
+            return None
+
+    def _start_ann_build(self):
+        if self._ann_thread is not None and self._ann_thread.is_alive():
+            return
+        self._ann_thread = threading.Thread(target=self._build_ann_index, args=(_MatrixView(self), self.generation),
+                                            name=f"ann-build-{self.name}", daemon=True)
+        self._ann_thread.start()
+
+    def _build_ann_index(self, view, generation):
+        """Build an index over view (a _MatrixView) off the lock; kept only if no compaction happened meanwhile"""
+        try:
+            index = IVFIndex.build(view) if self.ann == "ivf" else HNSWIndex.build(view)
+        except ImportError:
+            logger.warning("hnswlib not installed, using exact search")
+            self.ann = "flat"
+            return
+        except Exception:
+            logger.exception("Building the %s index for %s failed, using exact search", self.ann, self.name)
+            # Otherwise every query would start another doomed build
+            self.ann = "flat"
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            index.save(self._ann_path())
+            with open(self._ann_path() + ".json", "w") as f:
+                json.dump({"generation": generation, "num_rows": index.num_rows}, f)
+            self._ann_index = (generation, index)
+
+    def compact(self):
+        """Rewrite the matrix without deleted rows into the next generation's files and renumber the rest"""
+        with self._lock:
+            self._refresh()
+            live_rows = np.flatnonzero(self._live)
+            generation = self.generation + 1
+            vectors_path, scales_path = self._vector_files(generation)
+            with open(vectors_path, "wb") as f:
+                for start in range(0, len(live_rows), SEARCH_BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(self._matrix[live_rows[start:start + SEARCH_BLOCK_ROWS]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            if self.quantized:
+                with open(scales_path, "wb") as f:
+                    f.write(np.ascontiguousarray(self._scales[live_rows]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            # The new files go live with the renumbering, in one commit; a crash before it leaves the old ones live.
+            # Ascending order never collides: each row only moves down into a freed slot
+            with self._db:
+                self._db.executemany("UPDATE rows SET row = ? WHERE row = ?",
+                                     [(new, int(old)) for new, old in enumerate(live_rows) if new != old])
+                self._db.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (generation,))
+            self._matrix, self._scales = None, None
+            self._ann_index = None
+            self._version = None
+            self._refresh()
+            self._get_ann_index()
+            # Older generations (including ones a crash left behind); readers still mapping them keep them until
+            # they refresh
+            live_files = {os.path.basename(self._vectors_path), os.path.basename(self._scales_path)}
+            for file_name in os.listdir(self.path):
+                if file_name.startswith(("vectors.", "scales.")) and file_name.endswith(".bin") \
+                        and file_name not in live_files:
+                    os.remove(os.path.join(self.path, file_name))
+
+    def disk_bytes(self):
+        return sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path))
+
+    def close(self):
+        self._db.close()
+
+
+class CompactClient:
+    """Stands in for chromadb.PersistentClient"""
+
+    def __init__(self, path):
+        self.path = os.path.join(path, "compact")
+        self._collections = {}
+
+    def get_or_create_collection(self, name, **kwargs):
+        if name not in self._collections:
+            self._collections[name] = CompactCollection(os.path.join(self.path, name), name=name)
+        return self._collections[name]
+
+    get_collection = get_or_create_collection
+
+    def delete_collection(self, name):
+        collection = self._collections.pop(name, None)
+        if collection is not None:
+            collection.close()
+        shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+
+def open_vector_client(path, backend=VECTOR_BACKEND):
+    """The vector store client for the configured backend ("chroma" or "compact")"""
+    if backend == "compact":
+        return CompactClient(path)
+    import chromadb
+    return chromadb.PersistentClient(path=path)
@@ -0,0 +1,186 @@
+"""Token-budgeted context assembly between reranking and synthesis.
+
+Chunks are indexed with a 200-token overlap, so neighbouring chunks from
+the same page repeat text. ContextPacker merges overlapping or adjacent
+chunks of the same file and page into one span, drops chunks contained
+in another, and then fills the context budget (num_ctx minus num_predict
+minus the prompt itself) best chunk first, so the prompt never overflows
+the model's window. Retrieved vs packed tokens go into the query trace.
+"""
+import json
+
+from llama_index.core import Settings
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, TextNode
+
+from dedup import DUPLICATE_REFS_KEY, duplicate_refs
+from telemetry import current_trace, stage
+
+# Template, question and separators all come out of the same window
+PROMPT_RESERVE_TOKENS = 160
+# A partial chunk smaller than this is not worth its prompt tokens
+MIN_PARTIAL_TOKENS = 64
+# Shortest text repeat treated as chunk overlap rather than coincidence
+MIN_OVERLAP_CHARS = 32
+# Chunks whose character ranges are at most this far apart are adjacent
+ADJACENT_GAP_CHARS = 2
+
+
+def overlap_length(a, b, min_overlap=MIN_OVERLAP_CHARS):
+    """Length of the longest suffix of a that is also a prefix of b (0 if none)"""
+    if len(b) < min_overlap:
+        return 0
+    anchor = b[:min_overlap]
+    start = a.find(anchor, max(0, len(a) - len(b)))
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(anchor, start + 1)
+    return 0
+
+
+def _char_range(node):
+    start, end = node.start_char_idx, node.end_char_idx
+    if start is None or end is None or start < 0:
+        return None
+    return start, end
+
+
+class _Span:
+    def __init__(self, node_with_score):
+        node = node_with_score.node
+        self.node = node
+        self.text = node.get_content(metadata_mode=MetadataMode.NONE)
+        self.range = _char_range(node)
+        self.score = node_with_score.score or 0.0
+        # Near-duplicates folded into any of the merged chunks (see dedup.py)
+        self.refs = duplicate_refs(node.metadata)
+        self.excluded_embed_metadata_keys = list(node.excluded_embed_metadata_keys)
+        self.excluded_llm_metadata_keys = list(node.excluded_llm_metadata_keys)
+
+    def absorb(self, other):
+        """Merge other into this span if they overlap, touch or contain one another"""
+        if other.text in self.text:
+            merged = self.text
+        elif self.text in other.text:
+            merged = other.text
+        elif overlap := overlap_length(self.text, other.text):
+            merged = self.text + other.text[overlap:]
+        elif overlap := overlap_length(other.text, self.text):
+            merged = other.text + self.text[overlap:]
+        elif self.range and other.range and 0 <= other.range[0] - self.range[1] <= ADJACENT_GAP_CHARS:
+            merged = self.text + "\n" + other.text
+        elif self.range and other.range and 0 <= self.range[0] - other.range[1] <= ADJACENT_GAP_CHARS:
+            merged = other.text + "\n" + self.text
+        else:
+            return False
+        self.text = merged
+        if self.range and other.range:
+            self.range = (min(self.range[0], other.range[0]), max(self.range[1], other.range[1]))
+        else:
+            self.range = None
+        self.score = max(self.score, other.score)
+        self.refs += [ref for ref in other.refs if ref not in self.refs]
+        for key in other.excluded_embed_metadata_keys:
+            if key not in self.excluded_embed_metadata_keys:
+                self.excluded_embed_metadata_keys.append(key)
+        for key in other.excluded_llm_metadata_keys:
+            if key not in self.excluded_llm_metadata_keys:
+                self.excluded_llm_metadata_keys.append(key)
+        return True
+
+    def to_node(self, text=None):
+        metadata = dict(self.node.metadata)
+        if self.refs:
+            metadata[DUPLICATE_REFS_KEY] = json.dumps(self.refs)
+        node = TextNode(
+            text=self.text if text is None else text,
+            metadata=metadata,
+            excluded_embed_metadata_keys=self.excluded_embed_metadata_keys,
+            excluded_llm_metadata_keys=self.excluded_llm_metadata_keys,
+        )
+        return NodeWithScore(node=node, score=self.score)
+
+
+def merge_spans(nodes):
+    """Collapse overlapping/adjacent chunks of the same file and page, best score first"""
+    pages = {}
+    for n in nodes:
+        key = (n.node.metadata.get("file_name"), n.node.metadata.get("page_label"))
+        pages.setdefault(key, []).append(_Span(n))
+
+    spans = []
+    for page_spans in pages.values():
+        merged = []
+        for span in page_spans:
+            # A merge can bridge two spans that did not touch before, so keep folding
+            while True:
+                for other in merged:
+                    if span.absorb(other):
+                        merged.remove(other)
+                        break
+                else:
+                    break
+            merged.append(span)
+        spans.extend(merged)
+    return sorted(spans, key=lambda s: s.score, reverse=True)
+
+
+def count_tokens(node):
+    return len(Settings.tokenizer(node.get_content(metadata_mode=MetadataMode.LLM)))
+
+
+class ContextPacker(BaseNodePostprocessor):
+    context_window: int = 2048
+    num_output: int = 256
+    prompt_reserve: int = PROMPT_RESERVE_TOKENS
+
+    @classmethod
+    def class_name(cls):
+        return "ContextPacker"
+
+    def budget(self, query_bundle=None):
+        question = len(Settings.tokenizer(query_bundle.query_str)) if query_bundle else 0
+        return self.context_window - self.num_output - self.prompt_reserve - question
+
+    def _postprocess_nodes(self, nodes, query_bundle=None):
+        if not nodes:
+            return nodes
+        with stage("context_packing"):
+            retrieved_tokens = sum(count_tokens(n.node) for n in nodes)
+            packed, packed_tokens = self._pack(merge_spans(nodes), self.budget(query_bundle))
+
+        trace = current_trace()
+        if trace is not None:
+            trace.count("retrieved_tokens", retrieved_tokens)
+            trace.count("packed_tokens", packed_tokens)
+            trace.count("prompt_tokens_saved", retrieved_tokens - packed_tokens)
+        return packed
+
+    def _pack(self, spans, budget):
+        packed, used = [], 0
+        for span in spans:
+            node = span.to_node()
+            tokens = count_tokens(node.node)
+            remaining = budget - used
+            if tokens > remaining:
+                if remaining < MIN_PARTIAL_TOKENS:
+                    continue
+                node, tokens = self._truncate(span, tokens, remaining)
+                if node is None:
+                    continue
+            packed.append(node)
+            used += tokens
+        return packed, used
+
+    def _truncate(self, span, tokens, remaining):
+        """Cut the span at a word boundary so it fits in the remaining tokens"""
+        chars = int(len(span.text) * remaining / tokens)
+        while chars > 0:
+            cut = span.text.rfind(" ", 0, chars)
+            node = span.to_node(span.text[:cut if cut > 0 else chars])
+            node_tokens = count_tokens(node.node)
+            if node_tokens <= remaining:
+                return node, node_tokens
+            chars = int(chars * 0.9)
+        return None, 0
@@ -0,0 +1,116 @@
+"""Conversation memory for follow-up questions.
+
+A conversation is a plain dict, ``{"summary": str, "turns": [{"question",
+"answer"}, ...]}``, so the UI can keep it in session state and send it to
+a remote query service as JSON. Follow-up questions ("and for
+contractors?") are condensed into standalone questions using that
+memory; everything downstream (routing, answer cache, retrieval,
+generation) then sees only the standalone question.
+
+The memory stays inside a fixed token budget: once the recent turns no
+longer fit, the oldest turn is folded into the rolling summary with one
+short LLM call that sees only the old summary and that turn. The prompt
+sizes therefore stay flat however long the conversation runs.
+"""
+import os
+import re
+
+from llama_index.core import Settings
+
+CONVERSATION_TOKENS = int(os.environ.get("RAG_CONVERSATION_TOKENS", "768"))
+CONVERSATION_TURNS = int(os.environ.get("RAG_CONVERSATION_TURNS", "3"))
+SUMMARY_TOKENS = 200
+TURN_ANSWER_TOKENS = 200
+
+# Words that only make sense with earlier context
+FOLLOW_UP_RE = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|their|he|she|his|her|same|above|"
+    r"previous|earlier|also|else|instead|again)\b|^(and|but|or|so|what about|how about)\b",
+    re.IGNORECASE)
+SHORT_FOLLOW_UP_WORDS = 4
+
+CONDENSE_PROMPT = """Rewrite the follow-up question as one standalone question that can be understood without the conversation. Keep names, numbers and policy terms. Reply with the question only.
+
+Conversation so far:
+{context}
+
+Follow-up question: {question}
+
+Standalone question:"""
+
+SUMMARY_PROMPT = """Update the summary of an HR assistant conversation with the exchange below. Keep the topics, documents and facts that later questions may refer to. Reply with at most 3 sentences.
+
+Current summary: {summary}
+
+User: {question}
+Assistant: {answer}
+
+Updated summary:"""
+
+
+def new_conversation():
+    return {"summary": "", "turns": []}
+
+
+def count_tokens(text):
+    return len(Settings.tokenizer(text)) if text else 0
+
+
+def clip_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens, at a word boundary"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    # Tokens per word is close to constant within one text, so scale and trim
+    words = words[:max(1, len(words) * max_tokens // count_tokens(text))]
+    while len(words) > 1 and count_tokens(" ".join(words)) > max_tokens:
+        words = words[:-max(1, len(words) // 10)]
+    return " ".join(words) + " ..."
+
+
+def conversation_context(conversation):
+    lines = []
+    if conversation.get("summary"):
+        lines.append(f"Summary: {conversation['summary']}")
+    for turn in conversation.get("turns", []):
+        lines.append(f"User: {turn['question']}")
+        lines.append(f"Assistant: {turn['answer']}")
+    return "\n".join(lines)
+
+
+def conversation_tokens(conversation):
+    return count_tokens(conversation_context(conversation))
+
+
+def is_follow_up(question):
+    """Cheap check whether a question may lean on earlier turns"""
+    return bool(FOLLOW_UP_RE.search(question)) or len(question.split()) <= SHORT_FOLLOW_UP_WORDS
+
+
+def condense_question(complete, conversation, question):
+    """Standalone version of question; complete(prompt) -> text is the LLM call"""
+    if not conversation or not (conversation.get("turns") or conversation.get("summary")):
+        return question
+    if not is_follow_up(question):
+        return question
+    reply = complete(CONDENSE_PROMPT.format(context=conversation_context(conversation), question=question))
+    # Small models sometimes add an explanation after the question
+    lines = reply.strip().splitlines()
+    standalone = lines[0].strip().strip('"') if lines else ""
+    return standalone or question
+
+
+def remember(complete, conversation, question, answer, budget=CONVERSATION_TOKENS, max_turns=CONVERSATION_TURNS):
+    """New conversation with the exchange appended, older turns folded into the summary to fit the budget"""
+    conversation = conversation or new_conversation()
+    summary = conversation.get("summary", "")
+    turns = list(conversation.get("turns", []))
+    turns.append({"question": question, "answer": clip_tokens(answer, TURN_ANSWER_TOKENS)})
+
+    while len(turns) > 1 and (len(turns) > max_turns
+                              or conversation_tokens({"summary": summary, "turns": turns}) > budget):
+        oldest = turns.pop(0)
+        summary = complete(SUMMARY_PROMPT.format(summary=summary or "(empty)", question=oldest["question"],
+                                                 answer=oldest["answer"])).strip()
+        summary = clip_tokens(summary, SUMMARY_TOKENS)
+    return {"summary": summary, "turns": turns}
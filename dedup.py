@@ -0,0 +1,223 @@
+"""Near-duplicate chunk elimination at ingest.
+
+HR folders hold many near-identical documents (v2/v3 of one policy, UK
+and IE variants), whose chunks would otherwise each be embedded, stored
+and compete for the same retrieval slots. Every chunk gets a MinHash
+signature over its word 5-grams; LSH banding finds earlier chunks that
+may be near-duplicates and the signatures confirm an estimated Jaccard
+similarity of at least RAG_DEDUP_THRESHOLD.
+
+A near-duplicate is not embedded or stored. Its file and page are added
+to the canonical (first seen) chunk instead: ``duplicate_refs`` in the
+node metadata lets the sources panel cite every document, and one
+``also_in:<file>`` flag per file lets a search pinned to that file still
+find the passage. Signatures of the canonical chunks are kept per shard
+in dedup.npz, so later runs dedupe against what is already indexed.
+
+Deduplication only works within a shard: variants filed in sibling
+subfolders of ./data (e.g. data/uk and data/ie) are separate shards and
+are each indexed in full. Folding across shards would put a passage in
+one shard's collection while searches pinned to the other file skip
+that shard, and would tie a single-shard rebuild or delete to the other
+shards' chunks. Keep variants in one subfolder to have them folded.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from lexical_index import tokenize
+
+DEDUP = os.environ.get("RAG_DEDUP", "1") != "0"
+# Estimated Jaccard similarity of the 5-gram sets above which chunks are the same passage
+DEDUP_THRESHOLD = float(os.environ.get("RAG_DEDUP_THRESHOLD", "0.9"))
+SHINGLE_WORDS = 5
+# Shorter chunks (headings, page footers) are always kept
+MIN_WORDS = 20
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs above ~0.5 similarity share a band with high probability
+BANDS = 16
+
+DUPLICATE_REFS_KEY = "duplicate_refs"
+ALSO_IN_PREFIX = "also_in:"
+
+_rng = np.random.default_rng(20240601)
+# x -> a*x + b (mod 2^64) with odd a is a permutation of the 64-bit hashes
+_PERM_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+
+def minhash(text):
+    """MinHash signature of the text's word 5-grams, or None for chunks too short to dedupe"""
+    tokens = tokenize(text)
+    if len(tokens) < MIN_WORDS:
+        return None
+    shingles = {" ".join(tokens[i:i + SHINGLE_WORDS]) for i in range(len(tokens) - SHINGLE_WORDS + 1)}
+    hashes = np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                       for s in shingles], dtype=np.uint64)
+    permuted = hashes[:, None] * _PERM_A + _PERM_B
+    permuted ^= permuted >> np.uint64(32)
+    return permuted.min(axis=0)
+
+
+class NearDuplicateIndex:
+    """MinHash LSH over the canonical chunks of one shard"""
+
+    def __init__(self, path=None, threshold=DEDUP_THRESHOLD, bands=BANDS):
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self._rows = NUM_PERM // bands
+        self._signatures = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                for chunk_id, signature in zip(data["ids"].tolist(), data["signatures"]):
+                    self._add(chunk_id, signature)
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self._rows:(band + 1) * self._rows].tobytes()) for band in range(self.bands)]
+
+    def _add(self, chunk_id, signature):
+        self._signatures[chunk_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(chunk_id)
+
+    def find(self, signature):
+        """The most similar indexed chunk at or above the threshold, or None"""
+        best_id, best = None, self.threshold
+        seen = set()
+        for key in self._band_keys(signature):
+            for chunk_id in self._buckets.get(key, ()):
+                if chunk_id in seen:
+                    continue
+                seen.add(chunk_id)
+                similarity = float(np.mean(self._signatures[chunk_id] == signature))
+                if similarity >= best:
+                    best_id, best = chunk_id, similarity
+        return best_id
+
+    def check(self, chunk_id, text):
+        """Canonical chunk ID if text near-duplicates an indexed chunk; otherwise index it and return None"""
+        signature = minhash(text)
+        if signature is None:
+            return None
+        with self._lock:
+            canonical_id = self.find(signature)
+            if canonical_id is None:
+                self._add(chunk_id, signature)
+            return canonical_id
+
+    def remove(self, chunk_ids):
+        with self._lock:
+            for chunk_id in chunk_ids:
+                signature = self._signatures.pop(chunk_id, None)
+                if signature is None:
+                    continue
+                for key in self._band_keys(signature):
+                    bucket = self._buckets[key]
+                    bucket.remove(chunk_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def retain(self, chroma_collection):
+        """Forget chunks no longer in the collection (e.g. after an interrupted run)"""
+        ids = list(self._signatures)
+        if not ids:
+            return
+        stored = set(chroma_collection.get(ids=ids, include=[])["ids"])
+        self.remove([chunk_id for chunk_id in ids if chunk_id not in stored])
+
+    def save(self):
+        with self._lock:
+            ids = list(self._signatures)
+            signatures = np.array([self._signatures[i] for i in ids], dtype=np.uint64).reshape(len(ids), NUM_PERM)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, ids=np.array(ids, dtype=str), signatures=signatures)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self._lock:
+            self._signatures.clear()
+            self._buckets.clear()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def duplicate_refs(metadata):
+    """[{"file", "page"}] of the near-duplicates folded into a chunk"""
+    refs = metadata.get(DUPLICATE_REFS_KEY)
+    return json.loads(refs) if refs else []
+
+
+def metadata_files(metadata):
+    """Every file a chunk stands for: its own plus those of its near-duplicates"""
+    return {metadata.get("file_name")} | {ref["file"] for ref in duplicate_refs(metadata)}
+
+
+def _with_refs(metadata, refs):
+    """Copy of a stored chunk's metadata listing refs as its near-duplicates"""
+    metadata = dict(metadata)
+    old_files = {ref["file"] for ref in duplicate_refs(metadata)}
+    metadata[DUPLICATE_REFS_KEY] = json.dumps(refs)
+    # Flags can't be deleted through every backend's update, so dropped files are set to False
+    for name in old_files:
+        metadata[ALSO_IN_PREFIX + name] = False
+    for ref in refs:
+        metadata[ALSO_IN_PREFIX + ref["file"]] = True
+    # Retrieved nodes are rebuilt from the serialized node, so it needs the refs too
+    if "_node_content" in metadata:
+        node = json.loads(metadata["_node_content"])
+        node.setdefault("metadata", {})[DUPLICATE_REFS_KEY] = metadata[DUPLICATE_REFS_KEY]
+        for key in ("excluded_embed_metadata_keys", "excluded_llm_metadata_keys"):
+            if DUPLICATE_REFS_KEY not in node.setdefault(key, []):
+                node[key].append(DUPLICATE_REFS_KEY)
+        metadata["_node_content"] = json.dumps(node)
+    return metadata
+
+
+def link_duplicates(chroma_collection, refs_by_canonical):
+    """Add {canonical_id: [{"file", "page"}]} refs to the stored chunks; returns {canonical_id: embedding}"""
+    if not refs_by_canonical:
+        return {}
+    ids = list(refs_by_canonical)
+    stored = chroma_collection.get(ids=ids, include=["metadatas", "embeddings"])
+    metadatas = []
+    for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+        refs = duplicate_refs(metadata)
+        refs += [ref for ref in refs_by_canonical[chunk_id] if ref not in refs]
+        metadatas.append(_with_refs(metadata, refs))
+    if metadatas:
+        chroma_collection.update(ids=stored["ids"], metadatas=metadatas)
+    embeddings = stored["embeddings"] if stored["embeddings"] is not None else []
+    return dict(zip(stored["ids"], embeddings))
+
+
+def unlink_duplicates(chroma_collection, name, canonical_ids):
+    """Drop a file's refs from the chunks its near-duplicates were folded into"""
+    if not canonical_ids:
+        return
+    stored = chroma_collection.get(ids=list(canonical_ids), include=["metadatas"])
+    metadatas = [_with_refs(metadata, [ref for ref in duplicate_refs(metadata) if ref["file"] != name])
+                 for metadata in stored["metadatas"]]
+    if metadatas:
+        chroma_collection.update(ids=stored["ids"], metadatas=metadatas)
+
+
+def savings_summary(stats, dim):
+    """What skipping the near-duplicates of an ingest run (PipelineStats) saved"""
+    total = stats.chunks + stats.duplicates
+    share = stats.duplicates / total if total else 0.0
+    # Embedding time scales with the number of chunks sent
+    saved_seconds = stats.embed_seconds * stats.duplicates / stats.chunks if stats.chunks else 0.0
+    saved_mb = (stats.duplicate_bytes + stats.duplicates * dim * 4) / (1024 * 1024)
+    return (f"{stats.duplicates} of {total} chunks ({share:.0%}) were near-duplicates: {stats.duplicates} "
+            f"embeddings (~{saved_seconds:.1f}s) and ~{saved_mb:.2f} MB of vectors and text not stored")
@@ -0,0 +1,121 @@
+"""Document-level profiles for two-stage retrieval.
+
+Alongside the chunk collection the indexer keeps one profile per PDF in
+a second collection: the mean of its (unit) chunk vectors plus category,
+department, page and chunk counts. At query time the profiles shortlist
+the most relevant documents and chunk search runs only inside them via a
+``file_name`` filter; the sidebar can pin the search to chosen files.
+
+Category and department come from ./data/documents.json when the file is
+listed there, e.g. ``{"leave_policy.pdf": {"category": "Leave",
+"department": "HR"}}``; otherwise the category is guessed from keywords.
+"""
+import json
+import os
+from collections import Counter
+
+import numpy as np
+
+PROFILE_COLLECTION_NAME = "hr_document_profiles"
+DOCUMENT_METADATA_PATH = "./data/documents.json"
+# How much text of each document the category guess and profile text use
+PROFILE_TEXT_CHARS = 4000
+
+CATEGORY_KEYWORDS = {
+    "Leave": ["leave", "vacation", "holiday", "absence", "sick", "parental", "maternity"],
+    "Time Reporting": ["timesheet", "time report", "hours", "overtime", "time entry"],
+    "Expenses": ["expense", "travel", "reimbursement", "receipt", "per diem", "mileage"],
+    "Contracts & Costs": ["contract", "transition cost", "invoice", "budget", "cost"],
+    "Benefits & Pay": ["benefit", "salary", "payroll", "pension", "insurance", "bonus"],
+    "Onboarding": ["onboarding", "new hire", "orientation", "induction", "probation"],
+    "Conduct & Compliance": ["code of conduct", "ethics", "compliance", "harassment", "security", "privacy"],
+}
+
+
+def infer_category(text):
+    """Best keyword match for the document text, or "General" """
+    text = text.lower()
+    counts = Counter({category: sum(text.count(keyword) for keyword in keywords)
+                      for category, keywords in CATEGORY_KEYWORDS.items()})
+    category, hits = counts.most_common(1)[0]
+    return category if hits else "General"
+
+
+def load_document_metadata(path=DOCUMENT_METADATA_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def mean_vector(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    mean = vectors.mean(axis=0)
+    return mean / max(float(np.linalg.norm(mean)), 1e-12)
+
+
+def write_profile(profile_collection, name, vectors, texts, pages=None, known=None):
+    """Upsert the profile of one document from its chunk vectors and texts"""
+    known = known if known is not None else load_document_metadata().get(name, {})
+    text = "\n".join(texts)[:PROFILE_TEXT_CHARS]
+    metadata = {
+        "file_name": name,
+        "category": known.get("category") or infer_category(name.replace("_", " ") + "\n" + text),
+        "department": known.get("department") or "General",
+        "chunks": len(vectors),
+    }
+    if pages is not None:
+        metadata["pages"] = pages
+    profile_collection.upsert(ids=[name], embeddings=[mean_vector(vectors).tolist()],
+                              metadatas=[metadata], documents=[text])
+
+
+class ProfileBuilder:
+    """Accumulates chunk vectors per file while the ingest pipeline writes them"""
+
+    def __init__(self, profile_collection):
+        self.profile_collection = profile_collection
+        self.known = load_document_metadata()
+        self._vectors = {}
+        self._texts = {}
+
+    def add_nodes(self, nodes):
+        for node in nodes:
+            name = node.metadata.get("file_name")
+            self._vectors.setdefault(name, []).append(node.embedding)
+            texts = self._texts.setdefault(name, [])
+            if sum(len(t) for t in texts) < PROFILE_TEXT_CHARS:
+                texts.append(node.get_content())
+
+    def finish(self, name, pages):
+        vectors = self._vectors.pop(name, [])
+        texts = self._texts.pop(name, [])
+        if vectors:
+            write_profile(self.profile_collection, name, vectors, texts, pages, self.known.get(name, {}))
+
+
+def rebuild_profiles(chunk_collection, profile_collection, files):
+    """Recompute profiles for files ({name: manifest entry}) from vectors already in the chunk collection"""
+    known = load_document_metadata()
+    for name, entry in files.items():
+        # Passages folded into another file's chunk (see dedup.py) count with that chunk's vector
+        chunk_ids = (entry.get("chunk_ids") or []) + list(entry.get("duplicate_of") or {})
+        if chunk_ids:
+            result = chunk_collection.get(ids=chunk_ids, include=["embeddings", "documents"])
+        else:
+            result = chunk_collection.get(where={"file_name": name}, include=["embeddings", "documents"])
+        if result["embeddings"] is not None and len(result["embeddings"]):
+            write_profile(profile_collection, name, result["embeddings"], result["documents"],
+                          known=known.get(name, {}))
+
+
+def shortlist_documents(profile_collection, embedding, n, within=None):
+    """File names of the n documents whose profiles are closest to the query"""
+    where = {"file_name": {"$in": list(within)}} if within else None
+    n = min(n, profile_collection.count())
+    if not n:
+        return []
+    result = profile_collection.query(query_embeddings=[np.asarray(embedding, dtype=np.float32).tolist()],
+                                      n_results=n, where=where, include=["metadatas"])
+    return [metadata["file_name"] for metadata in result["metadatas"][0]]
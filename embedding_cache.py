@@ -0,0 +1,126 @@
+"""On-disk embedding cache for the indexer.
+
+Embeddings are stored in SQLite keyed by (embedding model, sha256 of the
+chunk text), so rebuilds, crash recovery and chunking changes only pay
+for chunks whose text actually changed. The least recently used entries
+are evicted once the cache grows past its entry limit.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+CACHE_PATH = os.environ.get("RAG_EMBED_CACHE_PATH", "./cache/embeddings.sqlite")
+# ~3 KB per 768-dim vector, so the default caps the file at roughly 600 MB
+MAX_ENTRIES = int(os.environ.get("RAG_EMBED_CACHE_MAX_ENTRIES", "200000"))
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, model, texts):
+        """Return a list aligned with texts holding cached vectors or None"""
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+            results = [list(array("f", found[h])) if h in found else None for h in hashes]
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model, texts, embeddings):
+        now = time.time()
+        rows = [(model, text_hash(text), array("f", embedding).tobytes(), now)
+                for text, embedding in zip(texts, embeddings)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def evict(self):
+        """Drop least recently used entries beyond max_entries"""
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self._conn.commit()
+                self.evicted += excess
+        return max(excess, 0)
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return (f"Embedding cache: {self.hits} hits, {self.misses} misses ({rate:.1%} hit rate), "
+                f"{self.evicted} evicted")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbedClient:
+    """Wrap an embed client so only cache misses reach the embedding model"""
+
+    def __init__(self, client, cache):
+        self.client = client
+        self.cache = cache
+        self.model_name = client.model_name
+
+    def embed(self, texts):
+        cached = self.cache.get_many(self.model_name, texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            fresh = self.client.embed([texts[i] for i in missing])
+            self.cache.put_many(self.model_name, [texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                cached[i] = vector
+        return cached
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,248 @@
+"""Hybrid BM25 + vector retrieval fused with reciprocal-rank fusion.
+
+With document profiles available, retrieval is two-stage on large
+corpora: the query shortlists the closest documents first and chunk
+search (vector and BM25) is restricted to those files. Callers can also
+pin a query to chosen files with ``restrict_to_documents``.
+
+With several index shards (see sharding.py) ShardedRetriever searches
+every relevant shard in parallel and fuses their candidates once, as if
+they came from a single index.
+"""
+import contextvars
+import logging
+import math
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from llama_index.core import Settings
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+from dedup import ALSO_IN_PREFIX, metadata_files
+from document_profiles import shortlist_documents
+from telemetry import current_trace, stage, untraced
+
+logger = logging.getLogger(__name__)
+
+RRF_K = 60
+SHORTLIST_DOCS = int(os.environ.get("RAG_SHORTLIST_DOCS", "10"))
+# Below this many documents a flat search is already cheap and a shortlist only risks misses
+SHORTLIST_MIN_DOCS = int(os.environ.get("RAG_SHORTLIST_MIN_DOCS", "25"))
+# BM25 hits outside the allowed files are dropped, so fetch more of them
+LEXICAL_OVERFETCH = 4
+# Shard searches in flight at once, shared by all queries
+SHARD_WORKERS = int(os.environ.get("RAG_SHARD_WORKERS", "8"))
+
+_document_scope = contextvars.ContextVar("rag_document_scope", default=None)
+
+
+@contextmanager
+def restrict_to_documents(file_names):
+    """Limit retrieval in the enclosed block to these files (None or empty means all)"""
+    token = _document_scope.set(list(file_names) if file_names else None)
+    try:
+        yield
+    finally:
+        _document_scope.reset(token)
+
+
+def _to_node(text, metadata):
+    node = metadata_dict_to_node(metadata)
+    node.set_content(text)
+    return node
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse ranked ID lists into {id: score}, normalized so 1.0 means first in every list"""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            fused[item_id] += 1.0 / (k + rank + 1)
+    best_possible = len(rankings) / (k + 1)
+    return {item_id: score / best_possible for item_id, score in fused.items()}
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuse dense results with BM25 hits from the on-disk lexical index"""
+
+    def __init__(self, vector_retriever, lexical_index, chroma_collection, top_k=2, lexical_top_k=10,
+                 embed_model=None, profile_collection=None, shortlist_docs=SHORTLIST_DOCS,
+                 shortlist_min_docs=SHORTLIST_MIN_DOCS):
+        super().__init__()
+        self.vector_retriever = vector_retriever
+        self.embed_model = embed_model or Settings.embed_model
+        self.lexical_index = lexical_index
+        self.chroma_collection = chroma_collection
+        self.profile_collection = profile_collection
+        self.top_k = top_k
+        self.lexical_top_k = lexical_top_k
+        self.shortlist_docs = shortlist_docs
+        self.shortlist_min_docs = shortlist_min_docs
+
+    def _files_to_search(self, embedding):
+        """Files to search, or None for the whole collection"""
+        selected = _document_scope.get()
+        if self.profile_collection is None or embedding is None or (selected and len(selected) <= self.shortlist_docs):
+            return selected
+        if not selected and self.profile_collection.count() < self.shortlist_min_docs:
+            return None
+        with stage("doc_shortlist"):
+            return shortlist_documents(self.profile_collection, embedding, self.shortlist_docs, within=selected) \
+                or selected
+
+    def _vector_search(self, query_bundle, file_names):
+        if not file_names:
+            return self.vector_retriever.retrieve(query_bundle)
+        # Chunks that near-duplicates of these files were folded into count as theirs too
+        where = {"$or": [{"file_name": {"$in": file_names}}] + [{ALSO_IN_PREFIX + name: True} for name in file_names]}
+        result = self.chroma_collection.query(query_embeddings=[list(query_bundle.embedding)], n_results=self.top_k,
+                                              where=where,
+                                              include=["documents", "metadatas", "distances"])
+        return [NodeWithScore(node=_to_node(text, metadata), score=math.exp(-distance))
+                for text, metadata, distance
+                in zip(result["documents"][0], result["metadatas"][0], result["distances"][0])]
+
+    def embed(self, query_bundle):
+        # Embedding here (rather than inside the vector retriever) lets it be timed on its own
+        if query_bundle.embedding is None and query_bundle.embedding_strs:
+            with stage("embed_query"):
+                query_bundle.embedding = self.embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs)
+
+    def candidates(self, query_bundle):
+        """Vector hits, BM25 (chunk_id, score) hits and the nodes fetched so far, before fusion"""
+        file_names = self._files_to_search(query_bundle.embedding)
+        with stage("vector_search"):
+            vector_hits = self._vector_search(query_bundle, file_names)
+        with stage("bm25_search"):
+            lexical_hits = self.lexical_index.search(
+                query_bundle.query_str, self.lexical_top_k * (LEXICAL_OVERFETCH if file_names else 1))
+        nodes = {hit.node.node_id: hit.node for hit in vector_hits}
+
+        if file_names:
+            # The BM25 index has no metadata: fetch every hit to drop those from other files
+            self._fetch_nodes([chunk_id for chunk_id, _ in lexical_hits if chunk_id not in nodes], nodes)
+            allowed = set(file_names)
+            lexical_hits = [(chunk_id, score) for chunk_id, score in lexical_hits
+                            if chunk_id in nodes and allowed.intersection(metadata_files(nodes[chunk_id].metadata))]
+            lexical_hits = lexical_hits[:self.lexical_top_k]
+        return vector_hits, lexical_hits, nodes
+
+    def _retrieve(self, query_bundle):
+        self.embed(query_bundle)
+        vector_hits, lexical_hits, nodes = self.candidates(query_bundle)
+        fused = reciprocal_rank_fusion([[hit.node.node_id for hit in vector_hits],
+                                        [chunk_id for chunk_id, _ in lexical_hits]])
+        ranked = sorted(fused, key=fused.get, reverse=True)[:self.top_k]
+
+        # BM25-only hits still need their text and metadata from Chroma
+        self._fetch_nodes([chunk_id for chunk_id in ranked if chunk_id not in nodes], nodes)
+
+        return [NodeWithScore(node=nodes[chunk_id], score=fused[chunk_id])
+                for chunk_id in ranked if chunk_id in nodes]
+
+    def _fetch_nodes(self, chunk_ids, nodes):
+        if not chunk_ids:
+            return
+        with stage("fetch_nodes"):
+            result = self.chroma_collection.get(ids=chunk_ids, include=["documents", "metadatas"])
+        for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"]):
+            nodes[chunk_id] = _to_node(text, metadata)
+
+
+_shard_executor = None
+
+
+def _get_shard_executor():
+    global _shard_executor
+    if _shard_executor is None:
+        _shard_executor = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="shard-search")
+    return _shard_executor
+
+
+def _shard_candidates(retriever, query_bundle):
+    # Shards search concurrently, so their stages would overlap in the trace; shard_search times them as a whole
+    with untraced():
+        return retriever.candidates(query_bundle)
+
+
+class ShardedRetriever(BaseRetriever):
+    """Search several shards' HybridRetrievers in parallel and fuse their candidates once.
+
+    Vector scores come from one embedding model and metric, so they merge
+    as they are. BM25 scores depend on each shard's own term statistics,
+    so they are divided by the shard's best score before merging.
+    """
+
+    def __init__(self, retrievers, top_k=2, lexical_top_k=10, embed_model=None):
+        super().__init__()
+        self.retrievers = retrievers
+        self.embed_model = embed_model or Settings.embed_model
+        self.top_k = top_k
+        self.lexical_top_k = lexical_top_k
+
+    def _shards_to_search(self):
+        """Skip shards holding none of the documents the query is pinned to"""
+        selected = _document_scope.get()
+        if not selected:
+            return self.retrievers
+        relevant = [retriever for retriever in self.retrievers if retriever.profile_collection is None
+                    or retriever.profile_collection.get(ids=selected, include=[])["ids"]]
+        return relevant or self.retrievers
+
+    def _retrieve(self, query_bundle):
+        if query_bundle.embedding is None and query_bundle.embedding_strs:
+            with stage("embed_query"):
+                query_bundle.embedding = self.embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs)
+        retrievers = self._shards_to_search()
+
+        # Each search runs in a copy of this context so the document scope follows it
+        with stage("shard_search"):
+            futures = [_get_shard_executor().submit(contextvars.copy_context().run, _shard_candidates, retriever,
+                                                    query_bundle)
+                       for retriever in retrievers]
+            results, errors = [], []
+            for retriever, future in zip(retrievers, futures):
+                try:
+                    results.append((retriever, future.result()))
+                except Exception as error:
+                    # One failing shard costs its candidates, not the whole query
+                    logger.warning("Search in shard %s failed: %s", retriever.chroma_collection.name, error,
+                                   exc_info=True)
+                    errors.append(error)
+        if errors:
+            trace = current_trace()
+            if trace is not None:
+                trace.count("failed_shards", len(errors))
+            if not results:
+                raise errors[0]
+
+        owners, nodes, vector_hits, lexical_hits = {}, {}, [], []
+        for retriever, (shard_vector_hits, shard_lexical_hits, shard_nodes) in results:
+            nodes.update(shard_nodes)
+            vector_hits.extend(shard_vector_hits)
+            best = max((score for _, score in shard_lexical_hits), default=0.0) or 1.0
+            lexical_hits.extend((chunk_id, score / best) for chunk_id, score in shard_lexical_hits)
+            owners.update((hit.node.node_id, retriever) for hit in shard_vector_hits)
+            owners.update((chunk_id, retriever) for chunk_id, _ in shard_lexical_hits)
+
+        vector_ranking = [hit.node.node_id for hit in sorted(vector_hits, key=lambda hit: hit.score or 0.0,
+                                                             reverse=True)[:self.top_k]]
+        lexical_ranking = [chunk_id for chunk_id, _ in sorted(lexical_hits, key=lambda hit: hit[1],
+                                                              reverse=True)[:self.lexical_top_k]]
+        fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking])
+        ranked = sorted(fused, key=fused.get, reverse=True)[:self.top_k]
+
+        # BM25-only hits still need their text and metadata from their own shard
+        missing = defaultdict(list)
+        for chunk_id in ranked:
+            if chunk_id not in nodes:
+                missing[owners[chunk_id]].append(chunk_id)
+        for retriever, chunk_ids in missing.items():
+            retriever._fetch_nodes(chunk_ids, nodes)
+
+        return [NodeWithScore(node=nodes[chunk_id], score=fused[chunk_id])
+                for chunk_id in ranked if chunk_id in nodes]
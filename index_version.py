@@ -0,0 +1,29 @@
+"""Index version marker shared by the indexer and the app.
+
+rag_app.py writes a fresh version token whenever the indexed corpus
+changes; anything derived from the index (such as cached answers) is
+tagged with the version it was built against and dropped once it moves.
+"""
+import os
+import time
+import uuid
+
+INDEX_VERSION_PATH = "./chroma_db/index_version"
+
+
+def write_index_version():
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(os.path.dirname(INDEX_VERSION_PATH), exist_ok=True)
+    tmp_path = INDEX_VERSION_PATH + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, INDEX_VERSION_PATH)
+    return version
+
+
+def read_index_version():
+    try:
+        with open(INDEX_VERSION_PATH, 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
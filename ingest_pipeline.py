@@ -0,0 +1,242 @@
+"""Pipelined ingestion: parse -> chunk -> embed -> write.
+
+Each stage runs in its own thread(s) and hands work to the next through a
+bounded queue, so PDF parsing, embedding round-trips to Ollama and Chroma
+writes overlap instead of running one after another. A full queue blocks
+the stage feeding it, which keeps memory flat on large corpora.
+
+With a deduplicator (see dedup.py) near-duplicate chunks skip the embed
+stage and are handed to on_file_done instead of being written.
+"""
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+from llama_index.core import Settings
+from llama_index.core.schema import MetadataMode
+
+from pdf_loader import load_pdfs
+
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+EMBED_MODEL = "nomic-embed-text"
+# How long Ollama keeps a model loaded after a request ("30m", "-1" = forever)
+KEEP_ALIVE = os.environ.get("RAG_OLLAMA_KEEP_ALIVE", "30m")
+
+EMBED_BATCH_SIZE = int(os.environ.get("RAG_EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.environ.get("RAG_EMBED_CONCURRENCY", "4"))
+QUEUE_SIZE = int(os.environ.get("RAG_PIPELINE_QUEUE_SIZE", "8"))
+
+_DONE = object()
+
+
+class OllamaEmbedClient:
+    """Batched Ollama embeddings over a pooled keep-alive HTTP client"""
+
+    def __init__(self, model_name=EMBED_MODEL, base_url=OLLAMA_BASE_URL,
+                 max_connections=EMBED_CONCURRENCY, timeout=120.0, keep_alive=KEEP_ALIVE):
+        self.model_name = model_name
+        self.keep_alive = keep_alive
+        self._client = httpx.Client(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+        )
+
+    def embed(self, texts):
+        response = self._client.post("/api/embed", json={"model": self.model_name, "input": texts,
+                                                         "keep_alive": self.keep_alive})
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def close(self):
+        self._client.close()
+
+
+class PipelineStats:
+    def __init__(self):
+        self.files = 0
+        self.pages = 0
+        self.chunks = 0
+        self.duplicates = 0
+        self.duplicate_bytes = 0
+        self.embed_requests = 0
+        self.parse_seconds = 0.0
+        self.embed_seconds = 0.0
+        self.write_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def summary(self):
+        rate = self.chunks / self.wall_seconds if self.wall_seconds else 0.0
+        return (f"{self.files} files, {self.pages} pages, {self.chunks} chunks in {self.wall_seconds:.1f}s "
+                f"({rate:.1f} chunks/s) | parse {self.parse_seconds:.1f}s, "
+                f"embed {self.embed_seconds:.1f}s over {self.embed_requests} requests, "
+                f"write {self.write_seconds:.1f}s")
+
+
+class IngestPipeline:
+    """Index PDFs into a vector store with overlapping parse/chunk/embed/write stages"""
+
+    def __init__(self, vector_store, node_parser=None, embed_client=None,
+                 batch_size=EMBED_BATCH_SIZE, concurrency=EMBED_CONCURRENCY,
+                 queue_size=QUEUE_SIZE, parse_workers=None, deduplicator=None):
+        self.vector_store = vector_store
+        self.node_parser = node_parser or Settings.node_parser
+        self.embed_client = embed_client or OllamaEmbedClient(max_connections=concurrency)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.parse_workers = parse_workers
+        self.deduplicator = deduplicator
+        self.stats = PipelineStats()
+
+    def run(self, paths, on_file_done=None, on_nodes_written=None):
+        """Index the given PDFs and return PipelineStats.
+
+        on_nodes_written(nodes) is called after each batch is written to the
+        vector store, and on_file_done(name, chunk_ids, pages, parse_seconds,
+        duplicates) once every chunk of that file has been written;
+        duplicates are the (node, canonical chunk ID) pairs that were not.
+        Both run on the calling thread.
+        """
+        start = time.perf_counter()
+        self._abort = threading.Event()
+        self._lock = threading.Lock()
+        self._expected = {}
+        self._duplicates = {}
+        batch_q = queue.Queue(maxsize=self.queue_size)
+        write_q = queue.Queue(maxsize=self.queue_size)
+
+        threads = [threading.Thread(target=self._chunk_stage, args=(paths, batch_q, write_q), daemon=True)]
+        threads += [threading.Thread(target=self._embed_stage, args=(batch_q, write_q), daemon=True)
+                    for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            self._write_stage(write_q, on_file_done, on_nodes_written)
+        finally:
+            self._abort.set()
+            for thread in threads:
+                thread.join()
+        self.stats.wall_seconds = time.perf_counter() - start
+        return self.stats
+
+    def _put(self, q, item):
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _chunk_stage(self, paths, batch_q, write_q):
+        batch = []
+        try:
+            for path, docs, parse_seconds in load_pdfs(paths, workers=self.parse_workers):
+                if self._abort.is_set():
+                    return
+                name = os.path.basename(path)
+                nodes = self.node_parser.get_nodes_from_documents(docs)
+                with self._lock:
+                    self.stats.parse_seconds += parse_seconds
+                    self._expected[name] = (len(nodes), len(docs), parse_seconds)
+                if not nodes:
+                    self._put(write_q, [(name, None)])
+                for node in nodes:
+                    if self._is_duplicate(node):
+                        self._put(write_q, [(name, node)])
+                        continue
+                    batch.append((name, node))
+                    if len(batch) >= self.batch_size:
+                        self._put(batch_q, batch)
+                        batch = []
+            if batch:
+                self._put(batch_q, batch)
+        except Exception as e:
+            self._put(write_q, e)
+        finally:
+            for _ in range(self.concurrency):
+                self._put(batch_q, _DONE)
+
+    def _is_duplicate(self, node):
+        if self.deduplicator is None:
+            return False
+        text = node.get_content(metadata_mode=MetadataMode.NONE)
+        canonical_id = self.deduplicator.check(node.node_id, text)
+        if canonical_id is None:
+            return False
+        with self._lock:
+            self._duplicates[node.node_id] = canonical_id
+            self.stats.duplicates += 1
+            self.stats.duplicate_bytes += len(text.encode("utf-8"))
+        return True
+
+    def _embed_stage(self, batch_q, write_q):
+        while True:
+            batch = self._get(batch_q)
+            if batch is _DONE:
+                self._put(write_q, _DONE)
+                return
+            try:
+                texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for _, node in batch]
+                start = time.perf_counter()
+                embeddings = self.embed_client.embed(texts)
+                with self._lock:
+                    self.stats.embed_seconds += time.perf_counter() - start
+                    self.stats.embed_requests += 1
+                for (_, node), embedding in zip(batch, embeddings):
+                    node.embedding = embedding
+            except Exception as e:
+                self._put(write_q, e)
+                return
+            self._put(write_q, batch)
+
+    def _write_stage(self, write_q, on_file_done, on_nodes_written):
+        chunk_ids = defaultdict(list)
+        duplicates = defaultdict(list)
+        finished_workers = 0
+        while finished_workers < self.concurrency:
+            item = write_q.get()
+            if item is _DONE:
+                finished_workers += 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+
+            with self._lock:
+                canonical = {node.node_id: self._duplicates.pop(node.node_id) for _, node in item
+                             if node is not None and node.node_id in self._duplicates}
+            nodes = [node for _, node in item if node is not None and node.node_id not in canonical]
+            if nodes:
+                start = time.perf_counter()
+                self.vector_store.add(nodes)
+                self.stats.write_seconds += time.perf_counter() - start
+                self.stats.chunks += len(nodes)
+                if on_nodes_written:
+                    on_nodes_written(nodes)
+
+            for name, node in item:
+                if node is not None and node.node_id in canonical:
+                    duplicates[name].append((node, canonical[node.node_id]))
+                elif node is not None:
+                    chunk_ids[name].append(node.node_id)
+                with self._lock:
+                    expected, pages, parse_seconds = self._expected[name]
+                if len(chunk_ids[name]) + len(duplicates[name]) == expected:
+                    self.stats.files += 1
+                    self.stats.pages += pages
+                    if on_file_done:
+                        on_file_done(name, chunk_ids.pop(name), pages, parse_seconds, duplicates.pop(name, []))
@@ -0,0 +1,238 @@
+"""On-disk BM25 inverted index over the indexed chunks.
+
+The index is a list of immutable segments under ./chroma_db/lexical, plus
+a manifest naming the live segments and the chunk IDs deleted since they
+were written. Each segment stores its postings as a memory-mapped
+``(doc, tf)`` int32 array with a term -> (start, count) table, so loading
+is a JSON read plus an mmap regardless of corpus size.
+
+Each indexing run appends one segment; deletions are tombstones until
+the segments are compacted.
+"""
+import json
+import math
+import os
+import re
+import shutil
+from collections import Counter, defaultdict
+
+import numpy as np
+
+LEXICAL_DIR = "./chroma_db/lexical"
+MAX_SEGMENTS = 8
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class Segment:
+    def __init__(self, path):
+        with open(os.path.join(path, "segment.json"), 'r') as f:
+            meta = json.load(f)
+        self.path = path
+        self.chunk_ids = meta["chunk_ids"]
+        self.terms = meta["terms"]
+        self.postings = np.load(os.path.join(path, "postings.npy"), mmap_mode="r")
+        self.doc_lens = np.load(os.path.join(path, "doc_lens.npy"), mmap_mode="r")
+
+    @staticmethod
+    def write(path, chunk_ids, term_postings, doc_lens):
+        """Write a segment from {term: [(doc, tf), ...]} into path"""
+        terms = {}
+        rows = []
+        for term in sorted(term_postings):
+            postings = term_postings[term]
+            if not postings:
+                continue
+            terms[term] = [len(rows), len(postings)]
+            rows.extend(postings)
+
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, "postings.npy"), np.asarray(rows, dtype=np.int32).reshape(-1, 2))
+        np.save(os.path.join(tmp_path, "doc_lens.npy"), np.asarray(doc_lens, dtype=np.int32))
+        with open(os.path.join(tmp_path, "segment.json"), 'w') as f:
+            json.dump({"chunk_ids": chunk_ids, "terms": terms}, f)
+        os.replace(tmp_path, path)
+
+
+class LexicalIndex:
+    def __init__(self, path=LEXICAL_DIR):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self._pending = []
+        self._manifest_mtime_ns = None
+        self._load()
+
+    # -- loading ---------------------------------------------------------
+
+    def _load(self):
+        if os.path.exists(self.manifest_path):
+            self._manifest_mtime_ns = os.stat(self.manifest_path).st_mtime_ns
+            with open(self.manifest_path, 'r') as f:
+                self.manifest = json.load(f)
+        else:
+            self._manifest_mtime_ns = None
+            self.manifest = {"segments": [], "next_segment": 1, "deleted": []}
+
+        self.segments = [Segment(os.path.join(self.path, name)) for name in self.manifest["segments"]]
+        self.deleted = set(self.manifest["deleted"])
+
+        self.doc_freq = defaultdict(int)
+        self.num_docs = 0
+        total_len = 0
+        for segment in self.segments:
+            for term, (_, count) in segment.terms.items():
+                self.doc_freq[term] += count
+            live = self._live_mask(segment)
+            if not live.all():
+                # Tombstoned chunks no longer count towards document frequency, as they don't towards num_docs
+                terms = list(segment.terms)
+                starts = np.array([segment.terms[term][0] for term in terms], dtype=np.int64)
+                dead_rows = np.flatnonzero(~live[np.asarray(segment.postings[:, 0])])
+                term_rows, dead = np.unique(np.searchsorted(starts, dead_rows, side="right") - 1, return_counts=True)
+                for row, count in zip(term_rows.tolist(), dead.tolist()):
+                    self.doc_freq[terms[row]] -= count
+            self.num_docs += int(live.sum())
+            total_len += int(np.asarray(segment.doc_lens)[live].sum())
+        self.avg_doc_len = total_len / self.num_docs if self.num_docs else 0.0
+
+    def _live_mask(self, segment):
+        if not self.deleted:
+            return np.ones(len(segment.chunk_ids), dtype=bool)
+        return np.fromiter((cid not in self.deleted for cid in segment.chunk_ids),
+                           dtype=bool, count=len(segment.chunk_ids))
+
+    def refresh(self):
+        """Reload if another process (the indexer) has published changes"""
+        mtime = os.stat(self.manifest_path).st_mtime_ns if os.path.exists(self.manifest_path) else None
+        if mtime != self._manifest_mtime_ns:
+            self._load()
+
+    def _save_manifest(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.manifest["deleted"] = sorted(self.deleted)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        self._load()
+
+    # -- writing ---------------------------------------------------------
+
+    def add(self, chunks):
+        """Queue (chunk_id, text) pairs for the next flush()"""
+        self._pending.extend(chunks)
+
+    def delete(self, chunk_ids):
+        chunk_ids = set(chunk_ids)
+        self._pending = [(cid, text) for cid, text in self._pending if cid not in chunk_ids]
+        self.deleted.update(chunk_ids)
+        self._save_manifest()
+
+    def flush(self):
+        """Write queued chunks as a new segment, compacting if there are too many"""
+        if not self._pending:
+            return
+        term_postings = defaultdict(list)
+        chunk_ids, doc_lens = [], []
+        for doc, (chunk_id, text) in enumerate(self._pending):
+            counts = Counter(tokenize(text))
+            chunk_ids.append(chunk_id)
+            doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_postings[term].append((doc, tf))
+
+        name = f"seg-{self.manifest['next_segment']:06d}"
+        Segment.write(os.path.join(self.path, name), chunk_ids, term_postings, doc_lens)
+        self.manifest["segments"].append(name)
+        self.manifest["next_segment"] += 1
+        self._pending = []
+        self._save_manifest()
+
+        if len(self.segments) > MAX_SEGMENTS:
+            self.compact()
+
+    def compact(self):
+        """Merge all segments into one, dropping deleted chunks"""
+        if len(self.segments) <= 1 and not self.deleted:
+            return
+        chunk_ids, doc_lens = [], []
+        term_postings = defaultdict(list)
+        for segment in self.segments:
+            live = self._live_mask(segment)
+            remap = np.full(len(segment.chunk_ids), -1, dtype=np.int64)
+            remap[live] = np.arange(len(chunk_ids), len(chunk_ids) + int(live.sum()))
+            chunk_ids.extend(cid for cid, keep in zip(segment.chunk_ids, live) if keep)
+            doc_lens.extend(np.asarray(segment.doc_lens)[live].tolist())
+            for term, (start, count) in segment.terms.items():
+                block = np.asarray(segment.postings[start:start + count])
+                docs = remap[block[:, 0]]
+                keep = docs >= 0
+                term_postings[term].extend(zip(docs[keep].tolist(), block[keep, 1].tolist()))
+
+        old_segments = list(self.manifest["segments"])
+        name = f"seg-{self.manifest['next_segment']:06d}"
+        Segment.write(os.path.join(self.path, name), chunk_ids, term_postings, doc_lens)
+        self.manifest["segments"] = [name]
+        self.manifest["next_segment"] += 1
+        self.deleted = set()
+        self._save_manifest()
+        for old in old_segments:
+            shutil.rmtree(os.path.join(self.path, old), ignore_errors=True)
+
+    def clear(self):
+        self._pending = []
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._load()
+
+    # -- querying --------------------------------------------------------
+
+    def search(self, query, top_k=10):
+        """Return up to top_k (chunk_id, bm25_score) pairs, best first"""
+        self.refresh()
+        terms = set(tokenize(query))
+        if not terms or not self.num_docs:
+            return []
+
+        results = []
+        for segment in self.segments:
+            scores = None
+            for term in terms:
+                entry = segment.terms.get(term)
+                if not entry:
+                    continue
+                start, count = entry
+                df = self.doc_freq[term]
+                idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+                block = np.asarray(segment.postings[start:start + count])
+                docs = block[:, 0]
+                tf = block[:, 1].astype(np.float32)
+                dl = np.asarray(segment.doc_lens)[docs]
+                term_scores = idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * dl / self.avg_doc_len))
+                if scores is None:
+                    scores = np.zeros(len(segment.chunk_ids), dtype=np.float32)
+                np.add.at(scores, docs, term_scores)
+            if scores is None:
+                continue
+
+            candidates = np.flatnonzero(scores)
+            # Over-fetch by the tombstone count so deleted hits can't crowd out live ones
+            keep = min(len(candidates), top_k + len(self.deleted))
+            if keep < len(candidates):
+                candidates = candidates[np.argpartition(-scores[candidates], keep - 1)[:keep]]
+            for doc in candidates:
+                chunk_id = segment.chunk_ids[doc]
+                if chunk_id not in self.deleted:
+                    results.append((chunk_id, float(scores[doc])))
+
+        results.sort(key=lambda hit: hit[1], reverse=True)
+        return results[:top_k]
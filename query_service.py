@@ -0,0 +1,611 @@
+"""Query service: answers questions as a stream of events.
+
+QueryService owns the index, the Ollama clients, the router and the
+answer cache, and turns one question into events:
+
+    {"type": "meta", "mode": "RAG" | "LLM", "cached": bool, "question": "..."}
+    {"type": "queue", "position": int, "waited": seconds}   (while waiting for the LLM)
+    {"type": "token", "text": "..."}            (repeated)
+    {"type": "sources", "sources": [...]}
+    {"type": "done", "answer": "..."}
+    {"type": "error", "message": "...", "mode": ...}
+    {"type": "conversation", "conversation": {...}}   (after "done", when a conversation was passed)
+    {"type": "timings", "total_ms": ..., "stages_ms": {...}}   (last, when asked for)
+
+With a conversation (see conversation.py) a follow-up is first condensed
+into a standalone question, which "meta" reports and everything after
+it uses.
+
+In Auto mode, questions the router is unsure about are answered
+speculatively: retrieval and the chat answer start together and the
+retrieved passages decide which one is kept (see _speculate).
+
+The Streamlit app can use it in-process, or several UI replicas can share
+one warm backend started with
+
+    python query_service.py --port 8765          (or --unix /tmp/rag.sock)
+
+and RAG_QUERY_SERVICE_URL=http://127.0.0.1:8765 (or unix:///tmp/rag.sock).
+The backend serves requests from a bounded thread pool behind asyncio, so
+all sessions share one set of keep-alive connections to Ollama.
+"""
+# Disable telemetry and warnings FIRST
+import os
+import warnings
+os.environ['ANONYMIZED_TELEMETRY'] = 'False'
+os.environ['POSTHOG_DISABLED'] = 'True'
+warnings.filterwarnings('ignore')
+
+import argparse
+import asyncio
+import contextvars
+import functools
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import httpx
+from llama_index.core import Settings
+from llama_index.core.schema import QueryBundle
+
+from admission import Coalescer, get_admission_controller, PRIORITY_CHAT, PRIORITY_RAG
+from answer_cache import AnswerCache, normalize_question
+from compact_store import open_vector_client
+from conversation import condense_question, remember
+from hybrid_retriever import restrict_to_documents
+from index_version import read_index_version
+from lexical_index import LexicalIndex
+from rag_engine import (configure_models, build_sharded_query_engine, is_document_related,
+                        get_llm_response, stream_llm_response, get_sources, warm_up_models)
+from rerank import retrieval_relevance
+from router import EmbeddingRouter
+from sharding import DEFAULT_SHARD, Shard, indexed_shards
+from snapshots import current_index_dir
+from telemetry import get_trace_log, percentile, start_trace, timed_stream
+
+
+SERVICE_URL = os.environ.get("RAG_QUERY_SERVICE_URL") or None
+SERVICE_WORKERS = int(os.environ.get("RAG_QUERY_SERVICE_WORKERS", "8"))
+# How often a queued request reports its position
+QUEUE_POLL_SECONDS = 0.5
+# Race retrieval against the chat answer when the router is unsure
+SPECULATE = os.environ.get("RAG_SPECULATE", "1") != "0"
+# Retrieved passages at least this relevant (rerank.retrieval_relevance) win over the chat answer
+SPECULATE_MIN_RELEVANCE = float(os.environ.get("RAG_SPECULATE_MIN_RELEVANCE", "0.5"))
+# Retrieval still running after this long loses to the chat answer
+SPECULATE_TIMEOUT = float(os.environ.get("RAG_SPECULATE_TIMEOUT", "5"))
+
+_speculation_executor = None
+
+
+def _get_speculation_executor():
+    global _speculation_executor
+    if _speculation_executor is None:
+        _speculation_executor = ThreadPoolExecutor(max_workers=SERVICE_WORKERS, thread_name_prefix="speculation")
+    return _speculation_executor
+
+
+def speculation_stats(entries):
+    """Outcome rates of speculative answers, for tuning RAG_SPECULATE_MIN_RELEVANCE"""
+    runs = [entry["speculation"] for entry in entries if entry.get("speculation")]
+    if not runs:
+        return {"count": 0}
+    wasted_ms = [run["wasted_ms"] for run in runs]
+    return {
+        "count": len(runs),
+        "rag_rate": sum(run["winner"] == "RAG" for run in runs) / len(runs),
+        "cancel_rate": sum(run["cancelled"] is not None for run in runs) / len(runs),
+        "wasted_ms_p50": percentile(wasted_ms, 50),
+        "wasted_ms_p95": percentile(wasted_ms, 95),
+        "wasted_tokens": sum(run["wasted_tokens"] for run in runs),
+    }
+
+
+class QueryService:
+    def __init__(self, admission=None):
+        self.llm = configure_models()
+        # Resolved once: this service keeps reading the snapshot that was live when it opened
+        self.index_dir = current_index_dir()
+        chroma_client = open_vector_client(self.index_dir)
+        self.shards = indexed_shards(self.index_dir) or [Shard(DEFAULT_SHARD, root=self.index_dir)]
+        self.chroma_collections = [chroma_client.get_or_create_collection(shard.collection_name)
+                                   for shard in self.shards]
+        self.query_engine = build_sharded_query_engine([
+            (chroma_collection, LexicalIndex(shard.lexical_dir),
+             chroma_client.get_or_create_collection(shard.profile_collection_name))
+            for shard, chroma_collection in zip(self.shards, self.chroma_collections)
+        ])
+        self.router = EmbeddingRouter(Settings.embed_model, self.chroma_collections)
+        self.answer_cache = AnswerCache()
+        self.admission = admission or get_admission_controller()
+        self.coalescer = Coalescer()
+
+    def health(self):
+        chunks = {shard.name: collection.count() for shard, collection in zip(self.shards, self.chroma_collections)}
+        return {"status": "ok", "chunks": sum(chunks.values()), "shards": chunks, "index_version": read_index_version()}
+
+    def warm_up(self):
+        """Preload both Ollama models and the lazy local state; returns {step: seconds}"""
+        timings = warm_up_models()
+        start = time.perf_counter()
+        # Router centroids and the tokenizer are otherwise built on the first question
+        self.router._get_centroids()
+        Settings.tokenizer("warm-up")
+        timings["router"] = time.perf_counter() - start
+        return timings
+
+    def latency_stats(self):
+        trace_log = get_trace_log()
+        stats = {mode: {"count": trace_log.count("query", mode), "stages": trace_log.percentiles("query", mode)}
+                 for mode in ("RAG", "LLM")}
+        stats["speculation"] = speculation_stats(trace_log.entries("query", "RAG") + trace_log.entries("query", "LLM"))
+        return stats
+
+    def _complete(self, prompt):
+        """A short side LLM call (condensing, summaries), admitted like a chat answer"""
+        ticket = self.admission.enqueue(PRIORITY_CHAT)
+        try:
+            ticket.wait()
+            return str(self.llm.complete(prompt))
+        finally:
+            self.admission.release(ticket)
+
+    def answer(self, question, mode_preference="auto", stream=True, documents=None, conversation=None,
+               timings=False):
+        """Yield the events for one question (see module docstring); documents limits the search to those files"""
+        answer = None
+        with start_trace("query") as trace:
+            for event in self._answer(question, mode_preference, stream, documents, conversation, trace):
+                if event["type"] == "done":
+                    answer = event["answer"]
+                elif event["type"] == "meta":
+                    question = event["question"]
+                yield event
+        # Sent after "done" so the answer is on screen while the memory is updated
+        if conversation is not None and answer is not None:
+            try:
+                conversation = remember(self._complete, conversation, question, answer)
+            except Exception as e:
+                print(f"⚠️  Could not update the conversation summary: {e}")
+            yield {"type": "conversation", "conversation": conversation}
+        if timings:
+            entry = trace.to_dict()
+            yield {"type": "timings", "total_ms": entry["total_ms"], "stages_ms": entry["stages_ms"]}
+
+    def _answer(self, question, mode_preference, stream, documents, conversation, trace):
+        if conversation:
+            with trace.stage("condense"):
+                try:
+                    standalone = condense_question(self._complete, conversation, question)
+                except Exception:
+                    # Answering the follow-up as asked beats not answering it
+                    standalone = question
+            trace.fields["condensed"] = standalone != question
+            question = standalone
+
+        # Embed the question at most once; routing, the answer cache and retrieval all reuse it
+        @functools.cache
+        def embed_query():
+            with trace.stage("embed_query"):
+                return Settings.embed_model.get_query_embedding(question)
+
+        # Determine mode; picking documents to search in implies document search
+        speculate = False
+        query_embedding = None
+        if documents and mode_preference != "llm":
+            use_rag = True
+        elif mode_preference == "auto":
+            try:
+                query_embedding = embed_query()
+                with trace.stage("route"):
+                    use_rag, route_details = self.router.route(query_embedding)
+                trace.fields["route"] = route_details
+                # The final mode is only known once retrieval scores arrive, so "meta" comes later
+                speculate = SPECULATE and stream and route_details["uncertain"]
+            except Exception:
+                with trace.stage("route"):
+                    use_rag = is_document_related(question)
+        elif mode_preference == "llm":
+            use_rag = False
+        else:
+            use_rag = True
+
+        mode = "RAG" if use_rag else "LLM"
+        trace.fields["mode"] = mode
+        index_version = read_index_version()
+        # Answers restricted to some documents are cached and shared separately
+        documents = sorted(documents) if use_rag and documents else None
+        cache_mode = f"{mode}:{','.join(documents)}" if documents else mode
+
+        try:
+            # Embedding on a miss is timed as embed_query, so it is kept out of cache_lookup
+            start = time.perf_counter()
+            embedded = trace.stages.get("embed_query", 0.0)
+            # Chat answers are matched semantically only if routing already paid for the embedding
+            embed = embed_query if use_rag or query_embedding is not None else None
+            cached, query_embedding = self.answer_cache.lookup(question, cache_mode, index_version, embed=embed)
+            if speculate and not cached:
+                # Speculation caches its answer under whichever mode won, which may not be the routed one
+                other_mode = "LLM" if mode == "RAG" else "RAG"
+                cached, _ = self.answer_cache.lookup(question, other_mode, index_version, embed=embed_query)
+                if cached:
+                    mode = cache_mode = other_mode
+                    trace.fields["mode"] = mode
+            trace.add("cache_lookup", time.perf_counter() - start - (trace.stages.get("embed_query", 0.0) - embedded))
+            trace.fields["cached"] = bool(cached)
+            if cached or not speculate:
+                yield {"type": "meta", "mode": mode, "cached": bool(cached), "question": question}
+
+            if cached:
+                yield {"type": "token", "text": cached["answer"]}
+                yield {"type": "sources", "sources": cached["sources"]}
+                yield {"type": "done", "answer": cached["answer"]}
+                return
+
+            # An identical question already being answered: share its generation
+            inflight_key = ("auto" if speculate else cache_mode, normalize_question(question), index_version)
+            inflight, leader = self.coalescer.join(inflight_key)
+            if not leader:
+                trace.fields["coalesced"] = True
+                shared = {"type": "queue", "position": 0, "waited": 0.0, "coalesced": True}
+                if not speculate:
+                    yield shared
+                last = None
+                for last in inflight.subscribe():
+                    yield last
+                    if last["type"] == "meta":
+                        # A speculative leader publishes "meta" itself once it has picked the mode
+                        trace.fields["mode"] = last["mode"]
+                        yield shared
+                if last is None or last["type"] not in ("done", "error"):
+                    yield {"type": "error", "message": "The shared answer was interrupted, please ask again.",
+                           "mode": mode}
+                return
+
+            try:
+                if speculate:
+                    yield from self._speculate(question, index_version, query_embedding, embed_query, trace,
+                                               inflight)
+                else:
+                    yield from self._generate(question, use_rag, mode, cache_mode, documents, index_version,
+                                              stream, query_embedding, embed_query, trace, inflight)
+            finally:
+                self.coalescer.finish(inflight_key, inflight)
+
+        except Exception as e:
+            trace.fields["error"] = str(e)
+            yield {"type": "error", "message": str(e), "mode": mode}
+
+    def _generate(self, question, use_rag, mode, cache_mode, documents, index_version, stream, query_embedding,
+                  embed_query, trace, inflight):
+        """Run retrieval and generation as the coalescing leader, publishing every event"""
+        try:
+            if use_rag:
+                # Document search mode: retrieval runs before the first token arrives
+                query_bundle = QueryBundle(question, embedding=embed_query())
+                with restrict_to_documents(documents):
+                    nodes = self.query_engine.retrieve(query_bundle)
+                with trace.stage("prompt_assembly"):
+                    response = self.query_engine.synthesize(query_bundle, nodes)
+
+            # Nothing has been sent to the LLM yet; wait here for a generation slot
+            ticket = self.admission.enqueue(PRIORITY_RAG if use_rag else PRIORITY_CHAT)
+            try:
+                with trace.stage("queue_wait"):
+                    while not ticket.wait(timeout=QUEUE_POLL_SECONDS):
+                        yield inflight.publish({"type": "queue", "position": ticket.position(),
+                                                "waited": round(ticket.waited(), 1)})
+
+                if use_rag:
+                    if stream:
+                        tokens = timed_stream(response.response_gen, trace)
+                    else:
+                        with trace.stage("generation"):
+                            tokens = [response.get_response().response or ""]
+                else:
+                    # Chat mode
+                    if stream:
+                        tokens = timed_stream(stream_llm_response(self.llm, question), trace)
+                    else:
+                        with trace.stage("generation"):
+                            tokens = [get_llm_response(self.llm, question)]
+
+                parts = []
+                for text in tokens:
+                    parts.append(text)
+                    yield inflight.publish({"type": "token", "text": text})
+                answer = "".join(parts)
+            finally:
+                self.admission.release(ticket)
+
+            sources = get_sources(response) if use_rag else []
+            if use_rag:
+                trace.count("context_tokens", sum(
+                    len(Settings.tokenizer(n.node.get_content())) for n in response.source_nodes
+                ))
+
+            self.answer_cache.store(question, cache_mode, index_version, answer, sources, query_embedding)
+            yield inflight.publish({"type": "sources", "sources": sources})
+            yield inflight.publish({"type": "done", "answer": answer})
+
+        except Exception as e:
+            trace.fields["error"] = str(e)
+            yield inflight.publish({"type": "error", "message": str(e), "mode": mode})
+
+    def _speculate(self, question, index_version, query_embedding, embed_query, trace, inflight):
+        """Answer a question the router is unsure about by racing retrieval against the chat answer.
+
+        Retrieval runs in the background while the chat answer waits for a
+        generation slot and starts streaming, with its tokens held back. Once
+        the retrieved passages arrive, relevant ones (SPECULATE_MIN_RELEVANCE)
+        cancel the chat stream and are synthesized into a grounded answer on
+        the same slot; otherwise the held tokens are released and chat goes
+        on. The outcome and the wasted work go into the trace.
+        """
+        speculation = {"relevance": None, "winner": None, "cancelled": None, "retrieval_ms": None,
+                       "wasted_ms": 0.0, "wasted_tokens": 0}
+        trace.fields["speculation"] = speculation
+        query_bundle = QueryBundle(question, embedding=embed_query())
+        start = time.perf_counter()
+        retrieval = _get_speculation_executor().submit(contextvars.copy_context().run, self.query_engine.retrieve,
+                                                       query_bundle)
+        mode = None
+        nodes = []
+        chat, llm_stream, held = None, None, []
+        chat_start = None
+
+        def decide():
+            nonlocal mode, nodes
+            if retrieval.done() and retrieval.exception() is None:
+                nodes = retrieval.result()
+                speculation["retrieval_ms"] = round(1000 * (time.perf_counter() - start), 2)
+                speculation["relevance"] = round(retrieval_relevance(question, nodes), 4)
+                mode = "RAG" if speculation["relevance"] >= SPECULATE_MIN_RELEVANCE else "LLM"
+            else:
+                # Failed, or still running past the timeout: the chat answer wins, the retrieval is abandoned
+                mode = "LLM"
+                if retrieval.cancel():
+                    # Still queued for a worker, so it never ran
+                    speculation["cancelled"] = "retrieval"
+                elif not retrieval.done():
+                    # Already running: it can't be stopped, only ignored. Its full runtime is wasted; the trace
+                    # entry kept for the stats shares this dict, so the callback still lands there
+                    speculation["cancelled"] = "abandoned"
+                    speculation["wasted_ms"] = round(1000 * (time.perf_counter() - start), 2)
+                    retrieval.add_done_callback(lambda _: speculation.update(
+                        wasted_ms=round(1000 * (time.perf_counter() - start), 2)))
+                else:
+                    speculation["error"] = str(retrieval.exception())
+            speculation["winner"] = mode
+            trace.fields["mode"] = mode
+            return inflight.publish({"type": "meta", "mode": mode, "cached": False, "question": question})
+
+        try:
+            ticket = self.admission.enqueue(PRIORITY_CHAT)
+            try:
+                with trace.stage("queue_wait"):
+                    while not ticket.wait(timeout=QUEUE_POLL_SECONDS):
+                        # Queue positions can only be reported once "meta" is out
+                        if mode is None and retrieval.done():
+                            yield decide()
+                        if mode is not None:
+                            yield inflight.publish({"type": "queue", "position": ticket.position(),
+                                                    "waited": round(ticket.waited(), 1)})
+
+                if mode is None and not retrieval.done():
+                    # Admitted before retrieval finished: start the chat answer meanwhile
+                    chat_start = time.perf_counter()
+                    llm_stream = stream_llm_response(self.llm, question)
+                    chat = timed_stream(llm_stream, trace)
+                    for text in chat:
+                        held.append(text)
+                        if retrieval.done() or time.perf_counter() - start > SPECULATE_TIMEOUT:
+                            break
+                    else:
+                        # The whole chat answer is in; wait out the rest of the retrieval budget
+                        wait([retrieval], timeout=max(0.0, SPECULATE_TIMEOUT - (time.perf_counter() - start)))
+                if mode is None:
+                    yield decide()
+
+                if mode == "RAG":
+                    if chat is not None:
+                        # Closing the stream drops the connection, which stops Ollama generating
+                        chat.close()
+                        llm_stream.close()
+                        speculation["cancelled"] = "LLM"
+                        speculation["wasted_ms"] = round(1000 * (time.perf_counter() - chat_start), 2)
+                        speculation["wasted_tokens"] = len(held)
+                    with trace.stage("prompt_assembly"):
+                        response = self.query_engine.synthesize(query_bundle, nodes)
+                    tokens = timed_stream(response.response_gen, trace)
+                else:
+                    if speculation["retrieval_ms"] is not None:
+                        speculation["wasted_ms"] = speculation["retrieval_ms"]
+                    if chat is None:
+                        chat = timed_stream(stream_llm_response(self.llm, question), trace)
+                    tokens = itertools.chain(held, chat)
+
+                parts = []
+                for text in tokens:
+                    parts.append(text)
+                    yield inflight.publish({"type": "token", "text": text})
+                answer = "".join(parts)
+            finally:
+                self.admission.release(ticket)
+
+            sources = get_sources(response) if mode == "RAG" else []
+            if mode == "RAG":
+                trace.count("context_tokens", sum(
+                    len(Settings.tokenizer(n.node.get_content())) for n in response.source_nodes
+                ))
+
+            self.answer_cache.store(question, mode, index_version, answer, sources, query_embedding)
+            yield inflight.publish({"type": "sources", "sources": sources})
+            yield inflight.publish({"type": "done", "answer": answer})
+
+        except Exception as e:
+            trace.fields["error"] = str(e)
+            if mode is None:
+                yield inflight.publish({"type": "meta", "mode": "LLM", "cached": False, "question": question})
+            yield inflight.publish({"type": "error", "message": str(e), "mode": mode or "LLM"})
+
+
+class RemoteQueryService:
+    """Client for a query service started with `python query_service.py`"""
+
+    def __init__(self, url=SERVICE_URL):
+        if url.startswith("unix://"):
+            transport = httpx.HTTPTransport(uds=url[len("unix://"):])
+            base_url = "http://query-service"
+        else:
+            transport = None
+            base_url = url
+        self._client = httpx.Client(base_url=base_url, transport=transport,
+                                    timeout=httpx.Timeout(180.0, connect=5.0))
+
+    def health(self):
+        response = self._client.get("/health")
+        response.raise_for_status()
+        return response.json()
+
+    def warm_up(self):
+        # The backend warms its own models when it starts
+        return {}
+
+    def latency_stats(self):
+        response = self._client.get("/stats")
+        response.raise_for_status()
+        return response.json()
+
+    def answer(self, question, mode_preference="auto", stream=True, documents=None, conversation=None,
+               timings=False):
+        payload = {"question": question, "mode": mode_preference, "stream": stream, "documents": documents,
+                   "conversation": conversation, "timings": timings}
+        with self._client.stream("POST", "/query", json=payload) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+
+# -- asyncio HTTP backend ----------------------------------------------------
+
+class ServiceHolder:
+    """Keeps one warm QueryService, swapping in a new one when the index version moves.
+
+    The new service is opened on a background thread; questions keep going
+    to the current one until it is ready, so a re-index never stalls them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = read_index_version()
+        self._service = QueryService()
+        self._loading = None
+        self._failed = None
+
+    @property
+    def reloading(self):
+        return self._loading is not None
+
+    def get(self):
+        version = read_index_version()
+        if version != self._version and version != self._failed:
+            with self._lock:
+                if version != self._version and self._loading is None:
+                    self._loading = version
+                    threading.Thread(target=self._reload, args=(version,), name="index-reload", daemon=True).start()
+        return self._service
+
+    def _reload(self, version):
+        try:
+            service = QueryService()
+            try:
+                # Embed the router examples now rather than on the first question after the swap
+                service.router._get_centroids()
+            except Exception:
+                pass
+            self._service, self._version = service, version
+            print(f"🔄 Switched to index version {version} ({service.index_dir})")
+        except Exception as e:
+            # Keep serving the old index; the next version retries
+            self._failed = version
+            print(f"⚠️  Could not load index version {version}, still serving {self._version}: {e}")
+        finally:
+            self._loading = None
+
+
+def create_app(holder, executor):
+    from aiohttp import web
+
+    async def health(request):
+        return web.json_response(holder.get().health())
+
+    async def stats(request):
+        return web.json_response(holder.get().latency_stats())
+
+    async def query(request):
+        body = await request.json()
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        # The whole answer runs on one worker thread so its trace context stays put
+        def produce():
+            try:
+                for event in holder.get().answer(body["question"], body.get("mode", "auto"),
+                                                 body.get("stream", True), body.get("documents"),
+                                                 body.get("conversation"), body.get("timings", False)):
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            except Exception as e:
+                loop.call_soon_threadsafe(events.put_nowait, {"type": "error", "message": str(e)})
+            finally:
+                loop.call_soon_threadsafe(events.put_nowait, None)
+
+        producer = loop.run_in_executor(executor, produce)
+        while (event := await events.get()) is not None:
+            await response.write((json.dumps(event) + "\n").encode("utf-8"))
+        await producer
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/health", health)
+    app.router.add_get("/stats", stats)
+    app.router.add_post("/query", query)
+    return app
+
+
+def main():
+    from aiohttp import web
+
+    parser = argparse.ArgumentParser(description="Shared query backend for the HR assistant")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="questions answered concurrently")
+    args = parser.parse_args()
+
+    print("🔄 Loading index and models...")
+    holder = ServiceHolder()
+    try:
+        timings = holder.get().warm_up()
+        print("🔥 Models warmed up: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in timings.items()))
+    except Exception as e:
+        print(f"⚠️  Warm-up failed, the first question will load the models: {e}")
+    executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="query")
+    app = create_app(holder, executor)
+    where = f"unix://{args.unix}" if args.unix else f"http://{args.host}:{args.port}"
+    print(f"✅ Query service listening on {where} ({args.workers} workers)")
+    if args.unix:
+        web.run_app(app, path=args.unix, print=None)
+    else:
+        web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,28 @@ os.environ['ANONYMIZED_TELEMETRY'] = 'False'
 os.environ['POSTHOG_DISABLED'] = 'True'
 warnings.filterwarnings('ignore')
 
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Settings
+from llama_index.core import Settings
 from llama_index.llms.ollama import Ollama
 from llama_index.embeddings.ollama import OllamaEmbedding
 from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.core.storage.storage_context import StorageContext
-from llama_index.core.node_parser import SimpleNodeParser
-import chromadb
+from llama_index.core.schema import MetadataMode
+import argparse
+import shutil
+import sys
+from compact_store import open_vector_client
+from dedup import DEDUP, NearDuplicateIndex, link_duplicates, savings_summary, unlink_duplicates
+from document_profiles import ProfileBuilder, rebuild_profiles
+from chunking import CHUNKERS, CHUNKER, CHUNK_SIZE, CHUNK_OVERLAP, build_node_parser, chunker_config
+from pdf_loader import PARSE_WORKERS
+from ingest_pipeline import IngestPipeline, OllamaEmbedClient, EMBED_CONCURRENCY
+from embedding_cache import EmbeddingCache, CachedEmbedClient
+from index_version import write_index_version
+from lexical_index import LexicalIndex
+from sharding import DATA_DIR, MANIFEST_PATH, DEFAULT_SHARD, Shard, all_shards, data_shards, select_shard_names
+from snapshots import (CURRENT_PATH, INDEX_ROOT, SNAPSHOTS_DIR, create_snapshot_dir, current_index_dir,
+                       publish_snapshot, retire_snapshots, SNAPSHOT_KEEP)
+from telemetry import start_trace
+import hashlib
 import time
 import json
 
@@ -19,196 +34,580 @@ import json
 Settings.llm = Ollama(model="qwen2.5:latest", request_timeout=180.0)
 Settings.embed_model = OllamaEmbedding(model_name="nomic-embed-text")
 
-Settings.node_parser = SimpleNodeParser.from_defaults(
-    chunk_size=1024,
-    chunk_overlap=200
-)
+Settings.node_parser = build_node_parser()
 
-print("=" * 80)
-print("HR Document RAG System - Smart Indexing")
-print("=" * 80)
+# Track indexed files: content hash + chunk IDs per PDF, one manifest per shard
+LEGACY_INDEXED_FILES_PATH = "./chroma_db/indexed_files.json"
+MANIFEST_VERSION = 1
 
-# Initialize ChromaDB
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
-chroma_collection = chroma_client.get_or_create_collection("hr_documents")
-vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-storage_context = StorageContext.from_defaults(vector_store=vector_store)
+# sync_shard() result asking for the shard to be rebuilt in a new snapshot
+REBUILD = "rebuild"
 
-# Track indexed files
-INDEXED_FILES_PATH = "./chroma_db/indexed_files.json"
+# Chroma rejects very large delete batches
+DELETE_BATCH_SIZE = 1000
 
-def load_indexed_files():
-    if os.path.exists(INDEXED_FILES_PATH):
-        with open(INDEXED_FILES_PATH, 'r') as f:
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def empty_manifest():
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Load the manifest, migrating the old filename-only list if present"""
+    if os.path.exists(path):
+        with open(path, 'r') as f:
             return json.load(f)
-    return []
-
-def save_indexed_files(files):
-    with open(INDEXED_FILES_PATH, 'w') as f:
-        json.dump(files, f)
-
-# Get current files
-if not os.path.exists("./data"):
-    os.makedirs("./data")
-    print("\n⚠️  Created ./data folder. Please add your HR PDF files there and run again.\n")
-    exit()
-
-current_files = [f for f in os.listdir("./data") if f.lower().endswith('.pdf')]
-indexed_files = load_indexed_files()
-
-new_files = [f for f in current_files if f not in indexed_files]
-removed_files = [f for f in indexed_files if f not in current_files]
-
-if not current_files:
-    print("\n⚠️  No PDF files found in ./data folder!\n")
-    exit()
-
-# Show status
-print(f"\n📊 Status:")
-print(f"   Total PDFs in folder: {len(current_files)}")
-print(f"   Already indexed: {len(indexed_files)}")
-print(f"   New PDFs to add: {len(new_files)}")
-if removed_files:
-    print(f"   Removed PDFs: {len(removed_files)}")
-
-# Ask what to do
-if new_files:
-    print(f"\n📄 New files detected:")
-    for f in new_files:
-        print(f"   + {f}")
-    
-    choice = input("\n🔄 [1] Add new files only  [2] Rebuild all  [3] Cancel: ").strip()
-    
-    if choice == "3":
-        print("Cancelled.")
-        exit()
-    elif choice == "2":
-        print("\n🗑️  Rebuilding entire index...")
-        if os.path.exists("./chroma_db"):
-            import shutil
-            shutil.rmtree("./chroma_db", ignore_errors=True)
-            time.sleep(1)
-        
-        chroma_client = chromadb.PersistentClient(path="./chroma_db")
-        chroma_collection = chroma_client.get_or_create_collection("hr_documents")
-        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        
-        print("📄 Loading all PDF documents...")
-        documents = SimpleDirectoryReader("./data", required_exts=[".pdf"]).load_data()
-        
-        print(f"✅ Loaded {len(documents)} document sections")
-        print("🔨 Building vector index...")
-        
-        index = VectorStoreIndex.from_documents(
-            documents,
-            storage_context=storage_context,
-            show_progress=True
-        )
-        
-        print(f"✅ Index created with {chroma_collection.count()} chunks!")
-        save_indexed_files(current_files)
-        
-    else:  # Add new files only
-        print("\n➕ Adding new files to existing index...")
-        
-        # Load existing index
-        if chroma_collection.count() > 0:
-            index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
-            
-            # Load only new files
-            new_documents = []
-            for new_file in new_files:
-                file_path = os.path.join("./data", new_file)
-                print(f"   Processing: {new_file}")
-                docs = SimpleDirectoryReader(input_files=[file_path]).load_data()
-                new_documents.extend(docs)
-            
-            print(f"✅ Loaded {len(new_documents)} new document sections")
-            print("🔨 Adding to index...")
-            
-            # Add new documents to existing index
-            for doc in new_documents:
-                index.insert(doc)
-            
-            print(f"✅ Index updated! Total chunks: {chroma_collection.count()}")
-            
-            # Update tracked files
-            indexed_files.extend(new_files)
-            save_indexed_files(indexed_files)
+
+    manifest = empty_manifest()
+    if path == MANIFEST_PATH and os.path.exists(LEGACY_INDEXED_FILES_PATH):
+        # No hash or chunk IDs were recorded, so these get re-indexed once
+        with open(LEGACY_INDEXED_FILES_PATH, 'r') as f:
+            for name in json.load(f):
+                manifest["files"][name] = {"sha256": None, "size": None, "mtime": None, "chunk_ids": []}
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def scan_data_dir(manifest, data_dir=DATA_DIR):
+    """Fingerprint every PDF in data_dir, only hashing files whose size/mtime changed"""
+    current = {}
+    if not os.path.isdir(data_dir):
+        # The shard's folder was removed: everything in it gets pruned
+        return current
+    for name in sorted(os.listdir(data_dir)):
+        if not name.lower().endswith('.pdf'):
+            continue
+        path = os.path.join(data_dir, name)
+        stat = os.stat(path)
+        known = manifest["files"].get(name)
+        if known and known.get("sha256") and known.get("size") == stat.st_size and known.get("mtime") == stat.st_mtime:
+            sha256 = known["sha256"]
         else:
-            # No existing index, create new
-            print("No existing index found. Creating new index...")
-            documents = SimpleDirectoryReader("./data", required_exts=[".pdf"]).load_data()
-            index = VectorStoreIndex.from_documents(
-                documents,
-                storage_context=storage_context,
-                show_progress=True
-            )
-            print(f"✅ Index created with {chroma_collection.count()} chunks!")
-            save_indexed_files(current_files)
-
-elif removed_files:
-    print(f"\n⚠️  Some previously indexed files are missing:")
-    for f in removed_files:
-        print(f"   - {f}")
-    
-    choice = input("\n🔄 Rebuild index to remove them? (y/n): ").strip().lower()
-    if choice == 'y':
-        print("\n🗑️  Rebuilding index...")
-        if os.path.exists("./chroma_db"):
-            import shutil
-            shutil.rmtree("./chroma_db", ignore_errors=True)
-            time.sleep(1)
-        
-        chroma_client = chromadb.PersistentClient(path="./chroma_db")
-        chroma_collection = chroma_client.get_or_create_collection("hr_documents")
-        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        
-        documents = SimpleDirectoryReader("./data", required_exts=[".pdf"]).load_data()
-        index = VectorStoreIndex.from_documents(
-            documents,
-            storage_context=storage_context,
-            show_progress=True
-        )
-        
-        print(f"✅ Index rebuilt with {chroma_collection.count()} chunks!")
-        save_indexed_files(current_files)
+            sha256 = file_sha256(path)
+        current[name] = {"sha256": sha256, "size": stat.st_size, "mtime": stat.st_mtime}
+    return current
+
+
+def plan_changes(current, manifest):
+    """Split files into added / changed / removed / unchanged against the manifest"""
+    indexed = manifest["files"]
+    added = [f for f in current if f not in indexed]
+    changed = [f for f in current if f in indexed and indexed[f].get("sha256") != current[f]["sha256"]]
+    removed = [f for f in indexed if f not in current]
+    unchanged = [f for f in current if f in indexed and f not in changed]
+    return added, changed, removed, unchanged
+
+
+def delete_file_chunks(chroma_collection, lexical_index, name, entry, dedup=None):
+    """Remove every chunk a file produced from the collection and lexical index"""
+    # Its near-duplicates are only references on other files' chunks
+    unlink_duplicates(chroma_collection, name, entry.get("duplicate_of"))
+    chunk_ids = entry.get("chunk_ids") or []
+    if dedup is not None:
+        dedup.remove(chunk_ids)
+    if chunk_ids:
+        for start in range(0, len(chunk_ids), DELETE_BATCH_SIZE):
+            chroma_collection.delete(ids=chunk_ids[start:start + DELETE_BATCH_SIZE])
+        lexical_index.delete(chunk_ids)
     else:
-        print("Index unchanged.")
-        exit()
-
-else:
-    print("\n✅ All files already indexed!")
-    print(f"   Total: {len(current_files)} PDFs, {chroma_collection.count()} chunks")
-    
-    choice = input("\n🔄 Rebuild anyway? (y/n): ").strip().lower()
-    if choice != 'y':
-        print("Exiting.")
-        exit()
-    
-    print("\n🗑️  Rebuilding entire index...")
-    if os.path.exists("./chroma_db"):
-        import shutil
-        shutil.rmtree("./chroma_db", ignore_errors=True)
-        time.sleep(1)
-    
-    chroma_client = chromadb.PersistentClient(path="./chroma_db")
-    chroma_collection = chroma_client.get_or_create_collection("hr_documents")
+        # Legacy entries have no recorded IDs; fall back to the metadata filter
+        chroma_collection.delete(where={"file_name": name})
+
+
+def dependent_files(manifest, current, to_index, to_remove):
+    """Kept files with near-duplicates folded into chunks that are about to be deleted"""
+    affected = set(to_index) | set(to_remove)
+    pending = list(affected)
+    deleted = set()
+    dependents = []
+    while pending:
+        deleted.update(manifest["files"].get(pending.pop(), {}).get("chunk_ids") or [])
+        for name, entry in manifest["files"].items():
+            if name not in affected and name in current and deleted.intersection(entry.get("duplicate_of") or {}):
+                # Re-indexing it deletes its own chunks in turn
+                affected.add(name)
+                dependents.append(name)
+                pending.append(name)
+    return dependents
+
+
+def sync_lexical_index(chroma_collection, lexical_index):
+    """Rebuild the BM25 index from Chroma if an interrupted run left it out of step"""
+    if lexical_index.num_docs == chroma_collection.count():
+        return
+    print("🔤 Lexical index out of sync, rebuilding from the vector store...")
+    lexical_index.clear()
+    offset = 0
+    while True:
+        batch = chroma_collection.get(include=["documents"], limit=DELETE_BATCH_SIZE, offset=offset)
+        if not batch["ids"]:
+            break
+        lexical_index.add(zip(batch["ids"], batch["documents"]))
+        offset += len(batch["ids"])
+    lexical_index.flush()
+
+
+def sync_document_profiles(chroma_collection, profile_collection, manifest):
+    """Add missing document profiles (e.g. on an index built before they existed) and drop stale ones"""
+    profiled = set(profile_collection.get(include=[])["ids"])
+    indexed = {name: entry for name, entry in manifest["files"].items() if entry.get("sha256")}
+    stale = [name for name in profiled if name not in indexed]
+    if stale:
+        profile_collection.delete(ids=stale)
+    missing = {name: entry for name, entry in indexed.items() if name not in profiled}
+    if missing:
+        print(f"🗂️  Building document profiles for {len(missing)} PDFs...")
+        rebuild_profiles(chroma_collection, profile_collection, missing)
+
+
+def apply_changes(chroma_collection, lexical_index, manifest, current, to_index, to_remove, workers=None,
+                  profile_collection=None, shard=None):
+    """Delete stale chunks and stream new ones through the ingest pipeline"""
+    shard = shard or Shard(DEFAULT_SHARD)
     vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
-    
-    documents = SimpleDirectoryReader("./data", required_exts=[".pdf"]).load_data()
-    index = VectorStoreIndex.from_documents(
-        documents,
-        storage_context=storage_context,
-        show_progress=True
+    dedup = NearDuplicateIndex(shard.dedup_path) if DEDUP else None
+    if dedup is not None:
+        dedup.retain(chroma_collection)
+
+    # Their near-duplicates would lose the chunks they were folded into
+    to_index = list(to_index)
+    for name in dependent_files(manifest, current, to_index, to_remove):
+        print(f"   ~ Re-indexing: {name} (shares passages with a changed file)")
+        to_index.append(name)
+
+    for name in to_remove:
+        print(f"   - Removing: {name}")
+        delete_file_chunks(chroma_collection, lexical_index, name, manifest["files"][name], dedup)
+        if profile_collection is not None:
+            profile_collection.delete(ids=[name])
+        del manifest["files"][name]
+        save_manifest(manifest, shard.manifest_path)
+
+    # Changed files lose their old chunks up front; the manifest keeps the old
+    # hash until the new chunks land, so an interrupted run retries them
+    for name in to_index:
+        if name in manifest["files"]:
+            delete_file_chunks(chroma_collection, lexical_index, name, manifest["files"][name], dedup)
+    if dedup is not None:
+        dedup.save()
+
+    if not to_index:
+        return
+
+    profiles = ProfileBuilder(profile_collection) if profile_collection is not None else None
+
+    def on_nodes_written(nodes):
+        lexical_index.add((node.node_id, node.get_content(metadata_mode=MetadataMode.NONE)) for node in nodes)
+        if profiles is not None:
+            profiles.add_nodes(nodes)
+
+    def finish_file(name, chunk_ids, pages, parse_time, duplicate_of=None):
+        if profiles is not None:
+            profiles.finish(name, pages)
+        manifest["files"][name] = dict(current[name], chunk_ids=chunk_ids)
+        if duplicate_of:
+            manifest["files"][name]["duplicate_of"] = duplicate_of
+        save_manifest(manifest, shard.manifest_path)
+        folded = f", {sum(len(p) for p in duplicate_of.values())} near-duplicates" if duplicate_of else ""
+        print(f"   + {name}: {pages} pages parsed in {parse_time:.1f}s, {len(chunk_ids)} chunks{folded}")
+
+    # Files with near-duplicates are finished once their canonical chunks, possibly still in flight, list them
+    with_duplicates = {}
+
+    def on_file_done(name, chunk_ids, pages, parse_time, duplicates):
+        if duplicates:
+            with_duplicates[name] = (chunk_ids, pages, parse_time, duplicates)
+        else:
+            finish_file(name, chunk_ids, pages, parse_time)
+
+    def finish_files_with_duplicates():
+        """Add the near-duplicates' file/page references to their canonical chunks, then finish those files"""
+        refs = {}
+        for name, (_, _, _, duplicates) in with_duplicates.items():
+            for node, canonical_id in duplicates:
+                ref = {"file": name, "page": node.metadata.get('page_label', 'N/A')}
+                if ref not in refs.setdefault(canonical_id, []):
+                    refs[canonical_id].append(ref)
+        embeddings = link_duplicates(chroma_collection, refs)
+        for name, (chunk_ids, pages, parse_time, duplicates) in with_duplicates.items():
+            duplicate_of = {}
+            for node, canonical_id in duplicates:
+                duplicate_of.setdefault(canonical_id, []).append(node.metadata.get('page_label', 'N/A'))
+                # The document profile still counts the passage, with the canonical vector
+                node.embedding = embeddings.get(canonical_id)
+            if profiles is not None:
+                profiles.add_nodes([node for node, _ in duplicates if node.embedding is not None])
+            finish_file(name, chunk_ids, pages, parse_time, duplicate_of)
+        return len(next(iter(embeddings.values()), []))
+
+    paths = [os.path.join(shard.data_dir, name) for name in to_index]
+    print(f"📄 Parsing {len(paths)} PDFs with up to {min(workers or PARSE_WORKERS, len(paths))} workers...")
+    cache = EmbeddingCache()
+    embed_client = CachedEmbedClient(OllamaEmbedClient(max_connections=EMBED_CONCURRENCY), cache)
+    try:
+        with start_trace("index") as trace:
+            pipeline = IngestPipeline(vector_store, embed_client=embed_client, parse_workers=workers,
+                                      deduplicator=dedup)
+            stats = pipeline.run(paths, on_file_done=on_file_done, on_nodes_written=on_nodes_written)
+            dim = 0
+            if with_duplicates:
+                with trace.stage("link_duplicates"):
+                    dim = finish_files_with_duplicates()
+            if dedup is not None:
+                dedup.save()
+            with trace.stage("lexical_flush"):
+                lexical_index.flush()
+            # Pipeline stages overlap, so these are summed busy times rather than slices of the total
+            trace.add("parse", stats.parse_seconds)
+            trace.add("embed", stats.embed_seconds)
+            trace.add("write", stats.write_seconds)
+            trace.count("files", stats.files)
+            trace.count("pages", stats.pages)
+            trace.count("chunks", stats.chunks)
+            trace.count("duplicates", stats.duplicates)
+        print(f"⏱️  {stats.summary()}")
+        if stats.duplicates:
+            print(f"🧬 {savings_summary(stats, dim)}")
+    finally:
+        cache.evict()
+        print(f"💾 {cache.summary()}")
+        embed_client.close()
+        cache.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Index the HR PDFs in ./data. Without an action flag, asks what to do."
     )
-    
-    print(f"✅ Index created with {chroma_collection.count()} chunks!")
-    save_indexed_files(current_files)
+    parser.add_argument("--add", action="store_true", help="index new and changed PDFs")
+    parser.add_argument("--prune", action="store_true", help="remove chunks of PDFs no longer in ./data")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="re-index every PDF (with --shard: those shards) into a new index snapshot, "
+                             "published when complete")
+    parser.add_argument("--dry-run", action="store_true", help="show what would change without touching the index")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and index changes in ./data as they appear (implies --add --prune)")
+    parser.add_argument("--interval", type=float, default=5.0, help="watch poll interval in seconds (default: 5)")
+    parser.add_argument("--debounce", type=float, default=10.0,
+                        help="seconds ./data must stay unchanged before indexing in watch mode (default: 10)")
+    parser.add_argument("--workers", type=int, default=None, help="PDF parsing processes (default: one per core)")
+    parser.add_argument("--shard", action="append", default=None, metavar="NAME",
+                        help=f"only sync this shard: a subfolder of {DATA_DIR}, or '{DEFAULT_SHARD}' for the PDFs "
+                             "directly in it (repeatable; default: all shards)")
+    parser.add_argument("--chunker", choices=CHUNKERS, default=CHUNKER,
+                        help=f"chunking strategy (default: {CHUNKER}); changing it needs --rebuild")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help=f"tokens per chunk (default: {CHUNK_SIZE})")
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP,
+                        help=f"token overlap for split text (default: {CHUNK_OVERLAP})")
+    args = parser.parse_args(argv)
+    if args.rebuild and (args.add or args.prune or args.watch):
+        parser.error("--rebuild cannot be combined with --add, --prune or --watch")
+    if args.watch:
+        args.add = args.prune = True
+    return args
+
+
+def print_changes(added, changed, removed):
+    print(f"\n📄 Changes detected:")
+    for f in added:
+        print(f"   + {f}")
+    for f in changed:
+        print(f"   ~ {f}")
+    for f in removed:
+        print(f"   - {f}")
+
+
+def selected_shards(args, root):
+    shards = all_shards(root)
+    if args.shard:
+        wanted = select_shard_names(args.shard, root)
+        shards = [shard for shard in shards if shard.name in wanted]
+    return shards
+
+
+def sync(args, interactive=False):
+    """Reconcile ./data with the index once, shard by shard; returns True if the index changed"""
+    if args.rebuild and not args.dry_run:
+        return rebuild_snapshot(args, select_shard_names(args.shard) if args.shard else None)
+
+    # Incremental changes go into the live index, whichever snapshot that is
+    root = current_index_dir()
+    chroma_client = open_vector_client(root)
+    shards = selected_shards(args, root)
+    if not shards:
+        print("\n⚠️  No PDF files found in ./data folder!\n")
+        return False
+
+    changed = False
+    to_rebuild = []
+    for shard in shards:
+        if len(shards) > 1 or shard.name != DEFAULT_SHARD:
+            print(f"\n📁 Shard '{shard.name}' ({shard.data_dir})")
+        result = sync_shard(chroma_client, shard, args, interactive)
+        if result == REBUILD:
+            to_rebuild.append(shard.name)
+        else:
+            changed |= result
+
+    if to_rebuild:
+        # Rebuilt in a copy of the live index, never in place under the running app
+        all_names = {shard.name for shard in all_shards(root)}
+        return rebuild_snapshot(args, None if all_names <= set(to_rebuild) else to_rebuild) or changed
+    if changed:
+        # Lets the app drop answers cached against the previous corpus and reopen the shards
+        write_index_version()
+    return changed
+
+
+def sync_shard(chroma_client, shard, args, interactive=False):
+    """Reconcile one shard's folder with its collections; other shards are not touched.
+
+    Returns whether the index changed, or REBUILD when the shard should be rebuilt (see rebuild_snapshot).
+    """
+    chroma_collection = chroma_client.get_or_create_collection(shard.collection_name)
+    profile_collection = chroma_client.get_or_create_collection(shard.profile_collection_name)
+    lexical_index = LexicalIndex(shard.lexical_dir)
+    sync_lexical_index(chroma_collection, lexical_index)
+    manifest = load_manifest(shard.manifest_path)
+    sync_document_profiles(chroma_collection, profile_collection, manifest)
+    current = scan_data_dir(manifest, shard.data_dir)
+
+    if not current and not manifest["files"]:
+        print(f"\n⚠️  No PDF files found in {shard.data_dir}!\n")
+        return False
+
+    added, changed, removed, unchanged = plan_changes(current, manifest)
+    chunking = chunker_config(args.chunker, args.chunk_size, args.chunk_overlap)
+    if manifest["files"] and manifest.get("chunking", chunking) != chunking and not args.rebuild:
+        print(f"\n⚠️  Index was chunked with {manifest['chunking']}, now using {chunking}. "
+              "Run with --rebuild to re-chunk existing PDFs.")
+
+    # Show status
+    print(f"\n📊 Status:")
+    print(f"   Total PDFs in folder: {len(current)}")
+    print(f"   Already indexed: {len(unchanged)}")
+    print(f"   New PDFs to add: {len(added)}")
+    if changed:
+        print(f"   Changed PDFs: {len(changed)}")
+    if removed:
+        print(f"   Removed PDFs: {len(removed)}")
+    if added or changed or removed:
+        print_changes(added, changed, removed)
+
+    if args.dry_run:
+        print("\n🔎 Dry run - index unchanged.")
+        return False
+
+    start = time.time()
+    to_index = added + changed if args.add else []
+    to_remove = removed if args.prune else []
+    rebuild = args.rebuild
+
+    # Ask what to do
+    if interactive:
+        if added or changed or removed:
+            choice = input("\n🔄 [1] Apply changes only  [2] Rebuild all  [3] Cancel: ").strip()
+
+            if choice == "3":
+                print("Cancelled.")
+                return False
+            rebuild = choice == "2"
+            to_index, to_remove = added + changed, removed
+        else:
+            print("\n✅ All files already indexed!")
+            print(f"   Total: {len(current)} PDFs, {chroma_collection.count()} chunks")
+
+            choice = input("\n🔄 Rebuild anyway? (y/n): ").strip().lower()
+            if choice != 'y':
+                print("Exiting.")
+                return False
+            rebuild = True
+
+    if rebuild:
+        return REBUILD
+    if to_index or to_remove:
+        print("\n🔄 Applying changes to existing index...")
+        if not manifest["files"]:
+            manifest["chunking"] = chunking
+        apply_changes(chroma_collection, lexical_index, manifest, current, to_index, to_remove, args.workers,
+                      profile_collection, shard)
+    else:
+        print("\n✅ Nothing to do.")
+        return False
+
+    if shard.name == DEFAULT_SHARD and os.path.exists(LEGACY_INDEXED_FILES_PATH):
+        os.remove(LEGACY_INDEXED_FILES_PATH)
+
+    print(f"✅ Index updated in {time.time() - start:.1f}s! Total chunks: {chroma_collection.count()}")
+    return True
+
+
+def build_shard(chroma_client, shard, current, chunking, workers=None):
+    """Index every PDF of a shard into empty collections"""
+    chroma_collection = chroma_client.get_or_create_collection(shard.collection_name)
+    profile_collection = chroma_client.get_or_create_collection(shard.profile_collection_name)
+    manifest = empty_manifest()
+    manifest["chunking"] = chunking
+    save_manifest(manifest, shard.manifest_path)
+    apply_changes(chroma_collection, LexicalIndex(shard.lexical_dir), manifest, current, list(current), [], workers,
+                  profile_collection, shard)
+    return chroma_collection
+
+
+def copy_index(source, target):
+    """Copy an index directory (snapshots and the CURRENT pointer aside) into a new snapshot"""
+    skipped = {os.path.basename(SNAPSHOTS_DIR), os.path.basename(CURRENT_PATH), os.path.basename(CURRENT_PATH) + ".tmp"}
+    shutil.copytree(source, target, dirs_exist_ok=True,
+                    ignore=lambda path, names: skipped & set(names) if os.path.samefile(path, source) else [])
+
+
+def reset_shard(chroma_client, shard):
+    """Drop a shard's collections, BM25 index and near-duplicate signatures"""
+    for name in (shard.collection_name, shard.profile_collection_name):
+        chroma_client.get_or_create_collection(name)
+        chroma_client.delete_collection(name)
+    LexicalIndex(shard.lexical_dir).clear()
+    if os.path.exists(shard.dedup_path):
+        os.remove(shard.dedup_path)
+
+
+def rebuild_snapshot(args, shard_names=None):
+    """Re-index into a new snapshot and publish it; the live index keeps serving until then.
+
+    With shard_names the snapshot starts as a copy of the live index and
+    only those shards are rebuilt in it.
+    """
+    start = time.time()
+    snapshot_dir = create_snapshot_dir()
+    try:
+        if shard_names:
+            live = current_index_dir()
+            print(f"\n🏗️  Copying the live index to a new snapshot in {snapshot_dir}...")
+            copy_index(live, snapshot_dir)
+        else:
+            print(f"\n🏗️  Building a new index snapshot in {snapshot_dir}...")
+        chroma_client = open_vector_client(snapshot_dir)
+        chunking = chunker_config(args.chunker, args.chunk_size, args.chunk_overlap)
+        shards = [shard for shard in data_shards(snapshot_dir) if not shard_names or shard.name in shard_names]
+        if not shards:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            print("\n⚠️  No PDF files found in ./data folder!\n")
+            return False
+
+        chunks = 0
+        for shard in shards:
+            if len(shards) > 1 or shard.name != DEFAULT_SHARD:
+                print(f"\n📁 Rebuilding shard '{shard.name}' ({shard.data_dir})")
+            if shard_names:
+                reset_shard(chroma_client, shard)
+            current = scan_data_dir(empty_manifest(), shard.data_dir)
+            chunks += build_shard(chroma_client, shard, current, chunking, args.workers).count()
+    except BaseException:
+        # Nothing was published, so the app never saw the partial snapshot
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        print("\n❌ Rebuild failed; the live index is unchanged.")
+        raise
+
+    publish_snapshot(snapshot_dir)
+    write_index_version()
+    retired = retire_snapshots()
+    print(f"\n✅ Snapshot {os.path.basename(snapshot_dir)} published in {time.time() - start:.1f}s! "
+          f"Chunks rebuilt: {chunks}")
+    if retired:
+        print(f"🧹 Retired {len(retired)} old snapshot(s), keeping the newest {SNAPSHOT_KEEP}")
+    if os.path.exists(MANIFEST_PATH) and not shard_names:
+        print(f"💡 The pre-snapshot index files directly in {INDEX_ROOT} are no longer used and can be deleted "
+              "once no app runs on them.")
+    return True
+
+
+def data_dir_signature():
+    """Cheap snapshot of ./data and its shard subfolders (names, sizes, mtimes) used to spot changes"""
+    signature = []
+    for folder in [DATA_DIR] + [os.path.join(DATA_DIR, name) for name in sorted(os.listdir(DATA_DIR))]:
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith('.pdf'):
+                stat = os.stat(os.path.join(folder, name))
+                signature.append((folder, name, stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+def watch(args):
+    """Poll ./data and sync once a burst of changes has settled"""
+    print(f"\n👀 Watching {DATA_DIR} (poll {args.interval:.0f}s, debounce {args.debounce:.0f}s). Ctrl+C to stop.")
+    sync(args)
+    last_synced = data_dir_signature()
+    pending_since = None
+    seen = last_synced
+
+    try:
+        while True:
+            time.sleep(args.interval)
+            signature = data_dir_signature()
+            if signature != seen:
+                # Still changing (e.g. a copy in progress): restart the debounce timer
+                seen = signature
+                pending_since = time.time()
+                continue
+            if signature != last_synced and pending_since and time.time() - pending_since >= args.debounce:
+                print(f"\n🔔 {time.strftime('%H:%M:%S')} Change in {DATA_DIR} settled, indexing...")
+                try:
+                    sync(args)
+                    last_synced = signature
+                except Exception as e:
+                    # Keep watching; the next change (or poll) retries
+                    print(f"❌ Indexing failed: {e}")
+                    pending_since = time.time()
+                else:
+                    pending_since = None
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 80)
+    print("HR Document RAG System - Smart Indexing")
+    print("=" * 80)
+
+    # Get current files
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
+        print("\n⚠️  Created ./data folder. Please add your HR PDF files there and run again.\n")
+        if not args.watch:
+            return 1
+
+    Settings.node_parser = build_node_parser(args.chunker, args.chunk_size, args.chunk_overlap)
+
+    if args.watch:
+        watch(args)
+        return 0
+
+    interactive = not (args.add or args.prune or args.rebuild or args.dry_run)
+    sync(args, interactive=interactive)
+
+    print("\n" + "=" * 80)
+    print("✅ Done! Run 'streamlit run streamlit_app.py' to use the updated index.")
+    print("=" * 80)
+    return 0
+
 
-print("\n" + "=" * 80)
-print("✅ Done! Run 'streamlit run streamlit_app.py' to use the updated index.")
-print("=" * 80)
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
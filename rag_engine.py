@@ -0,0 +1,168 @@
+"""Query-side model/engine setup and answering helpers.
+
+Keeping this out of streamlit_app.py lets the query service, the
+benchmark and anything else that answers questions headlessly run
+exactly the same retrieval and synthesis configuration as the UI.
+"""
+import time
+
+import httpx
+from llama_index.core import VectorStoreIndex, Settings
+from llama_index.llms.ollama import Ollama
+from llama_index.embeddings.ollama import OllamaEmbedding
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from llama_index.core.query_engine import RetrieverQueryEngine
+
+from hybrid_retriever import HybridRetriever, ShardedRetriever
+from ingest_pipeline import OLLAMA_BASE_URL, EMBED_MODEL, KEEP_ALIVE
+from context_packer import ContextPacker
+from dedup import duplicate_refs
+from lexical_index import LexicalIndex
+from rerank import LexicalReranker
+
+LLM_MODEL = "llama3.2:3b"  # Much faster!
+LLM_OPTIONS = {
+    "num_predict": 256,  # Shorter responses
+    "temperature": 0.7,
+    "num_ctx": 2048  # Smaller context
+}
+
+# Retrieve wide (hybrid vector + BM25), rerank down to TOP_K chunks, then pack
+# those into the context budget with overlaps between neighbouring chunks removed
+CANDIDATES = 20
+TOP_K = 4
+
+
+def configure_models(base_url=OLLAMA_BASE_URL):
+    Settings.llm = Ollama(
+        model=LLM_MODEL,
+        base_url=base_url,
+        request_timeout=120.0,  # Reduced timeout
+        context_window=LLM_OPTIONS["num_ctx"],
+        keep_alive=KEEP_ALIVE,
+        additional_kwargs=LLM_OPTIONS
+    )
+    Settings.embed_model = OllamaEmbedding(model_name=EMBED_MODEL, base_url=base_url, keep_alive=KEEP_ALIVE)
+    return Settings.llm
+
+
+def warm_up_models(base_url=OLLAMA_BASE_URL, keep_alive=KEEP_ALIVE):
+    """Load the chat and embedding models into Ollama now; returns {model: seconds}"""
+    timings = {}
+    with httpx.Client(base_url=base_url, timeout=300.0) as client:
+        # A generate call without a prompt only loads the model. num_ctx must match the
+        # real requests, otherwise Ollama reloads the model on the first question.
+        start = time.perf_counter()
+        client.post("/api/generate", json={"model": LLM_MODEL, "keep_alive": keep_alive,
+                                           "options": {"num_ctx": LLM_OPTIONS["num_ctx"]}}).raise_for_status()
+        timings[LLM_MODEL] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        client.post("/api/embed", json={"model": EMBED_MODEL, "input": "warm-up",
+                                        "keep_alive": keep_alive}).raise_for_status()
+        timings[EMBED_MODEL] = time.perf_counter() - start
+    return timings
+
+
+def build_retriever(chroma_collection, lexical_index=None, profile_collection=None):
+    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+    index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
+
+    return HybridRetriever(
+        index.as_retriever(similarity_top_k=CANDIDATES),
+        lexical_index or LexicalIndex(),
+        chroma_collection,
+        top_k=CANDIDATES,
+        lexical_top_k=CANDIDATES,
+        profile_collection=profile_collection
+    )
+
+
+def build_query_engine(chroma_collection, lexical_index=None, streaming=True, profile_collection=None):
+    return _query_engine(build_retriever(chroma_collection, lexical_index, profile_collection), streaming)
+
+
+def build_sharded_query_engine(shards, streaming=True):
+    """Query engine over several shards, given as (chroma_collection, lexical_index, profile_collection) tuples"""
+    if len(shards) == 1:
+        return build_query_engine(shards[0][0], shards[0][1], streaming, shards[0][2])
+    retriever = ShardedRetriever([build_retriever(*shard) for shard in shards],
+                                 top_k=CANDIDATES, lexical_top_k=CANDIDATES)
+    return _query_engine(retriever, streaming)
+
+
+def _query_engine(retriever, streaming):
+    return RetrieverQueryEngine.from_args(
+        retriever,
+        node_postprocessors=[
+            LexicalReranker(top_n=TOP_K),
+            ContextPacker(context_window=LLM_OPTIONS["num_ctx"], num_output=LLM_OPTIONS["num_predict"]),
+        ],
+        response_mode="compact",
+        streaming=streaming
+    )
+
+
+def is_document_related(question):
+    """Keyword fallback for when the embedding router is unavailable"""
+
+    question_lower = question.lower().strip()
+
+    # Strong generic indicators - use LLM
+    generic_patterns = [
+        'hello', 'hi ', 'hey', 'good morning', 'good afternoon', 'good evening',
+        'how are you', 'what can you do', 'who are you', 'help',
+        'can you help', 'can you act', 'act as', 'introduce yourself',
+        'what are you', 'tell me about yourself', 'your name', 'your purpose',
+        'thank you', 'thanks', 'bye', 'goodbye', 'what is cgi', 'about cgi'
+    ]
+
+    for pattern in generic_patterns:
+        if pattern in question_lower:
+            return False
+
+    # Strong document indicators - use RAG
+    doc_keywords = [
+        'transition cost', 'contract cost', 'time report', 'timesheet',
+        'according to', 'in the document', 'in the policy', 'page ',
+        'what does the document', 'find in', 'search for', 'procedure for',
+        'how to submit', 'approval process', 'guideline for', 'form for'
+    ]
+
+    for keyword in doc_keywords:
+        if keyword in question_lower:
+            return True
+
+    # Default: short questions use LLM, longer ones use RAG
+    return len(question_lower.split()) > 8
+
+
+CHAT_PROMPT = "You are a helpful HR assistant at CGI. Answer concisely in 2-3 sentences.\n\nQuestion: {question}\n\nAnswer:"
+
+
+def get_llm_response(llm, question):
+    """Get direct response from LLM"""
+    response = llm.complete(CHAT_PROMPT.format(question=question))
+    return str(response)
+
+
+def stream_llm_response(llm, question):
+    """Yield the direct LLM response token by token"""
+    for chunk in llm.stream_complete(CHAT_PROMPT.format(question=question)):
+        yield chunk.delta or ""
+
+
+def get_sources(response):
+    sources = []
+    if hasattr(response, 'source_nodes') and response.source_nodes:
+        for node in response.source_nodes:
+            score = node.score if hasattr(node, 'score') else 0
+            sources.append({
+                "file": node.node.metadata.get('file_name', 'Unknown'),
+                "page": node.node.metadata.get('page_label', 'N/A'),
+                "score": score
+            })
+            # The same passage in other documents was indexed once, with this chunk
+            sources.extend({"file": ref["file"], "page": ref["page"], "score": score}
+                           for ref in duplicate_refs(node.node.metadata))
+    return sources
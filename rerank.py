@@ -0,0 +1,134 @@
+"""Second-stage reranking of retrieved chunks on CPU.
+
+Retrieval fetches a wide candidate list; LexicalReranker rescores it by
+query-term coverage and proximity (or with an optional local
+cross-encoder) and keeps only the best few for synthesis. If scoring
+runs past its time budget the first-stage order is used unchanged.
+"""
+import logging
+import os
+import time
+from typing import Optional
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode
+
+from lexical_index import tokenize
+from telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+RERANK_BUDGET_MS = float(os.environ.get("RAG_RERANK_BUDGET_MS", "50"))
+# e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"; needs sentence-transformers
+CROSS_ENCODER_MODEL = os.environ.get("RAG_RERANK_CROSS_ENCODER") or None
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "to", "what",
+    "when", "where", "which", "who", "why", "with", "you", "your",
+}
+
+
+def query_terms(query):
+    return {term for term in tokenize(query) if term not in STOPWORDS}
+
+
+def lexical_score(terms, text):
+    """Blend of query-term coverage and how tightly the matched terms cluster"""
+    if not terms:
+        return 0.0
+    positions = [(pos, token) for pos, token in enumerate(tokenize(text)) if token in terms]
+    matched = {token for _, token in positions}
+    if not matched:
+        return 0.0
+    coverage = len(matched) / len(terms)
+
+    # Smallest window of tokens containing every matched term
+    window = float("inf")
+    counts = {}
+    left = 0
+    for pos, token in positions:
+        counts[token] = counts.get(token, 0) + 1
+        while len(counts) == len(matched):
+            window = min(window, pos - positions[left][0] + 1)
+            left_token = positions[left][1]
+            counts[left_token] -= 1
+            if not counts[left_token]:
+                del counts[left_token]
+            left += 1
+    proximity = len(matched) / window
+    return 0.6 * coverage + 0.4 * proximity
+
+
+def retrieval_relevance(query, nodes):
+    """Best lexical_score of the retrieved passages: does any of them actually answer the query?"""
+    terms = query_terms(query)
+    return max((lexical_score(terms, n.node.get_content(metadata_mode=MetadataMode.NONE)) for n in nodes),
+               default=0.0)
+
+
+class LexicalReranker(BaseNodePostprocessor):
+    top_n: int = 2
+    time_budget_ms: float = RERANK_BUDGET_MS
+    first_stage_weight: float = 0.2
+    cross_encoder_model: Optional[str] = CROSS_ENCODER_MODEL
+
+    _cross_encoder = PrivateAttr(default=None)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Loading the model takes seconds; doing it on the first query would blow that query's budget
+        self._get_cross_encoder()
+
+    @classmethod
+    def class_name(cls):
+        return "LexicalReranker"
+
+    def _get_cross_encoder(self):
+        if self._cross_encoder is None and self.cross_encoder_model:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError:
+                logger.warning("sentence-transformers not installed, using the lexical reranker")
+                self.cross_encoder_model = None
+                return None
+            self._cross_encoder = CrossEncoder(self.cross_encoder_model, device="cpu")
+        return self._cross_encoder
+
+    def _postprocess_nodes(self, nodes, query_bundle=None):
+        if query_bundle is None or len(nodes) <= self.top_n:
+            return nodes[:self.top_n]
+        with stage("rerank"):
+            return self._rerank(nodes, query_bundle)
+
+    def _rerank(self, nodes, query_bundle):
+        cross_encoder = self._get_cross_encoder()
+        deadline = time.perf_counter() + self.time_budget_ms / 1000
+        texts = [n.node.get_content(metadata_mode=MetadataMode.NONE) for n in nodes]
+
+        scores = []
+        if cross_encoder is not None:
+            for start in range(0, len(texts), 4):
+                batch = texts[start:start + 4]
+                scores.extend(float(s) for s in cross_encoder.predict([(query_bundle.query_str, t) for t in batch]))
+                if time.perf_counter() > deadline:
+                    break
+        else:
+            terms = query_terms(query_bundle.query_str)
+            for n, text in zip(nodes, texts):
+                first_stage = n.score or 0.0
+                scores.append((1 - self.first_stage_weight) * lexical_score(terms, text)
+                              + self.first_stage_weight * first_stage)
+                if time.perf_counter() > deadline:
+                    break
+
+        if len(scores) < len(nodes):
+            logger.info("Rerank exceeded %.0f ms budget, keeping first-stage order", self.time_budget_ms)
+            return nodes[:self.top_n]
+
+        ranked = sorted(zip(nodes, scores), key=lambda pair: pair[1], reverse=True)[:self.top_n]
+        # The sources panel shows the score that put each chunk in this order
+        for n, score in ranked:
+            n.score = score
+        return [n for n, _ in ranked]
@@ -0,0 +1,119 @@
+"""Embedding-based routing between document search (RAG) and chat.
+
+The question is embedded once by the caller; routing compares it with
+the centroids of labeled chat and document example questions and with
+its nearest chunk in the index. The same embedding is then reused for
+retrieval, so routing costs a few dot products and one top-1 lookup per
+shard, run in parallel.
+"""
+import os
+import threading
+
+import numpy as np
+
+from hybrid_retriever import _get_shard_executor
+
+CHAT_EXAMPLES = [
+    "Hello!", "Hi there", "Hey", "Good morning", "Good afternoon", "How are you?",
+    "What can you do?", "Who are you?", "Can you help me?", "Introduce yourself",
+    "Tell me about yourself", "What is your name?", "What is your purpose?",
+    "Thank you!", "Thanks, that helps", "Bye", "Goodbye", "What is CGI?",
+    "Tell me about CGI", "Can you act as an HR advisor?",
+]
+DOC_EXAMPLES = [
+    "What are transition costs?", "How do I submit time reports?",
+    "What is the approval process for contract costs?",
+    "According to the policy, how many days of annual leave do I get?",
+    "Which form do I need for travel expenses?", "What does the document say about overtime?",
+    "What is the procedure for reporting sick leave?", "When is the timesheet deadline?",
+    "What are the guidelines for remote work equipment?", "How do I request parental leave?",
+    "Which page covers expense reimbursement?", "What is the notice period in the contract?",
+    "Who approves training budget requests?", "How are public holidays handled in the policy?",
+]
+
+# The nearest chunk is close enough that the corpus clearly covers the question
+INDEX_STRONG_SIMILARITY = float(os.environ.get("RAG_ROUTER_INDEX_STRONG", "0.75"))
+# Below this the corpus has nothing relevant, whatever the question looks like
+INDEX_MIN_SIMILARITY = float(os.environ.get("RAG_ROUTER_INDEX_MIN", "0.5"))
+# How much closer to the chat centroid a question must be to count as chat
+CHAT_MARGIN = float(os.environ.get("RAG_ROUTER_CHAT_MARGIN", "0.02"))
+# Decisions this close to a threshold are reported as uncertain (see QueryService._speculate)
+UNCERTAIN_MARGIN = float(os.environ.get("RAG_ROUTER_UNCERTAIN_MARGIN", "0.05"))
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class EmbeddingRouter:
+    def __init__(self, embed_model, chroma_collections=()):
+        self.embed_model = embed_model
+        # One collection per index shard
+        self.chroma_collections = list(chroma_collections)
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    def _get_centroids(self):
+        # Embedded once per process, on first use, as queries: that is how incoming questions are embedded,
+        # and models like nomic-embed-text prefix queries and documents differently
+        with self._lock:
+            if self._centroids is None:
+                chat = [self.embed_model.get_query_embedding(example) for example in CHAT_EXAMPLES]
+                doc = [self.embed_model.get_query_embedding(example) for example in DOC_EXAMPLES]
+                self._centroids = (
+                    _unit(np.mean([_unit(v) for v in chat], axis=0)),
+                    _unit(np.mean([_unit(v) for v in doc], axis=0)),
+                )
+            return self._centroids
+
+    def nearest_chunk_similarity(self, embedding):
+        if len(self.chroma_collections) == 1:
+            similarities = [self._nearest_in(self.chroma_collections[0], embedding)]
+        else:
+            # One top-1 lookup per shard, in parallel on the pool the shard searches use
+            futures = [_get_shard_executor().submit(self._nearest_in, c, embedding) for c in self.chroma_collections]
+            similarities = [future.result() for future in futures]
+        similarities = [similarity for similarity in similarities if similarity is not None]
+        return max(similarities) if similarities else None
+
+    def _nearest_in(self, chroma_collection, embedding):
+        if not chroma_collection.count():
+            return None
+        result = chroma_collection.query(query_embeddings=[np.asarray(embedding, dtype=np.float32).tolist()], n_results=1,
+                                         include=["embeddings"])
+        embeddings = result.get("embeddings")
+        if embeddings is None or not len(embeddings) or not len(embeddings[0]):
+            return None
+        nearest = _unit(embeddings[0][0])
+        # The compact store may keep only the leading (Matryoshka) dimensions
+        return float(nearest @ _unit(np.asarray(embedding, dtype=np.float32)[:len(nearest)]))
+
+    def route(self, embedding):
+        """Return (use_rag, details) for a question embedding; details["uncertain"] flags close calls"""
+        chat_centroid, doc_centroid = self._get_centroids()
+        query = _unit(embedding)
+        chat_similarity = float(query @ chat_centroid)
+        doc_similarity = float(query @ doc_centroid)
+        index_similarity = self.nearest_chunk_similarity(query)
+
+        if index_similarity is not None and index_similarity >= INDEX_STRONG_SIMILARITY:
+            use_rag = True
+            uncertain = False
+        elif chat_similarity - doc_similarity > CHAT_MARGIN:
+            use_rag = False
+            # Only just chat-like, while the corpus has something close
+            uncertain = (chat_similarity - doc_similarity <= CHAT_MARGIN + UNCERTAIN_MARGIN
+                         and index_similarity is not None
+                         and index_similarity >= INDEX_MIN_SIMILARITY - UNCERTAIN_MARGIN)
+        else:
+            use_rag = index_similarity is not None and index_similarity >= INDEX_MIN_SIMILARITY
+            uncertain = index_similarity is not None and abs(index_similarity - INDEX_MIN_SIMILARITY) < UNCERTAIN_MARGIN
+
+        return use_rag, {
+            "chat_similarity": round(chat_similarity, 4),
+            "doc_similarity": round(doc_similarity, 4),
+            "index_similarity": None if index_similarity is None else round(index_similarity, 4),
+            "uncertain": uncertain,
+        }
@@ -0,0 +1,133 @@
+"""Named index shards: one per subfolder of ./data.
+
+PDFs directly in ./data form the "default" shard, which keeps the
+original collection, manifest and BM25 paths, so existing indexes carry
+on working. Each subfolder (e.g. ./data/finance) is its own shard with
+its own chunk and profile collections, manifest, BM25 index and
+near-duplicate signatures under <index>/shards/<name>. The indexer
+syncs shards independently; the query side searches all of them in
+parallel (see ShardedRetriever).
+
+<index> is the live snapshot directory (see snapshots.py) unless a root
+is passed, e.g. while building a new snapshot.
+
+A subfolder whose name would clash with the default shard (or is empty
+once normalized), or with another subfolder's shard name, gets a suffix
+derived from its folder name instead, with a warning.
+"""
+import hashlib
+import logging
+import os
+import re
+
+from document_profiles import PROFILE_COLLECTION_NAME
+from snapshots import INDEX_ROOT, current_index_dir
+
+logger = logging.getLogger(__name__)
+# (folder, shard name) pairs already warned about, so watch mode doesn't repeat them every poll
+_warned = set()
+
+DATA_DIR = "./data"
+COLLECTION_NAME = "hr_documents"
+# Where the default shard's manifest lived before snapshots
+MANIFEST_PATH = os.path.join(INDEX_ROOT, "manifest.json")
+DEFAULT_SHARD = "default"
+
+SHARD_NAME_RE = re.compile(r"[^a-z0-9_-]+")
+# Keeps "hr_document_profiles__<name>" within Chroma's 63-character collection names
+MAX_SHARD_NAME = 36
+
+
+def shard_name(folder):
+    """Collection-safe shard name for a subfolder ("HR Policies" -> "hr_policies")"""
+    name = _normalize(folder)
+    # The default shard is the PDFs directly in ./data
+    return _suffixed(name or "shard", folder) if name in ("", DEFAULT_SHARD) else name
+
+
+def _normalize(folder):
+    return SHARD_NAME_RE.sub("_", folder.lower())[:MAX_SHARD_NAME].strip("_")
+
+
+def _suffixed(name, folder):
+    """name made unique to folder with a hash of the folder name"""
+    digest = hashlib.sha1(folder.encode("utf-8")).hexdigest()[:8]
+    return f"{name[:MAX_SHARD_NAME - len(digest) - 1]}-{digest}"
+
+
+def select_shard_names(names, root=None):
+    """Shard names for --shard values: the default shard, a subfolder of ./data or a shard name"""
+    folders = {shard.folder: shard.name for shard in data_shards(root) if shard.folder}
+    return {name if name == DEFAULT_SHARD else folders.get(name) or shard_name(name) for name in names}
+
+
+class Shard:
+    def __init__(self, name, folder=None, root=None):
+        self.name = name
+        self.folder = folder
+        root = root or current_index_dir()
+        if name == DEFAULT_SHARD:
+            self.data_dir = DATA_DIR
+            self.collection_name = COLLECTION_NAME
+            self.profile_collection_name = PROFILE_COLLECTION_NAME
+            self.manifest_path = os.path.join(root, "manifest.json")
+            self.lexical_dir = os.path.join(root, "lexical")
+            self.dedup_path = os.path.join(root, "dedup.npz")
+        else:
+            self.data_dir = os.path.join(DATA_DIR, folder or name)
+            self.collection_name = f"{COLLECTION_NAME}__{name}"
+            self.profile_collection_name = f"{PROFILE_COLLECTION_NAME}__{name}"
+            self.manifest_path = os.path.join(root, "shards", name, "manifest.json")
+            self.lexical_dir = os.path.join(root, "shards", name, "lexical")
+            self.dedup_path = os.path.join(root, "shards", name, "dedup.npz")
+
+    def __repr__(self):
+        return f"Shard({self.name!r})"
+
+
+def _has_pdfs(path):
+    return any(name.lower().endswith(".pdf") for name in os.listdir(path))
+
+
+def data_shards(root=None):
+    """Shards with PDFs in ./data right now"""
+    root = root or current_index_dir()
+    shards = []
+    if not os.path.isdir(DATA_DIR):
+        return shards
+    if _has_pdfs(DATA_DIR):
+        shards.append(Shard(DEFAULT_SHARD, root=root))
+    folders = [folder for folder in sorted(os.listdir(DATA_DIR))
+               if os.path.isdir(os.path.join(DATA_DIR, folder)) and _has_pdfs(os.path.join(DATA_DIR, folder))]
+    names = {folder: shard_name(folder) for folder in folders}
+    clashing = {name for name in names.values() if list(names.values()).count(name) > 1}
+    for folder in folders:
+        name = names[folder]
+        # Folders that normalize to the same name would otherwise be merged into one shard
+        if name in clashing and folder != name:
+            name = _suffixed(name, folder)
+        if name != _normalize(folder) and (folder, name) not in _warned:
+            _warned.add((folder, name))
+            logger.warning("Folder %r clashes with another shard name, indexing it as shard %r", folder, name)
+        shards.append(Shard(name, folder, root))
+    return shards
+
+
+def indexed_shards(root=None):
+    """Shards that have a manifest, i.e. were indexed at least once"""
+    root = root or current_index_dir()
+    shards = [Shard(DEFAULT_SHARD, root=root)] if os.path.exists(os.path.join(root, "manifest.json")) else []
+    shards_dir = os.path.join(root, "shards")
+    if os.path.isdir(shards_dir):
+        for name in sorted(os.listdir(shards_dir)):
+            if os.path.exists(os.path.join(shards_dir, name, "manifest.json")):
+                shards.append(Shard(name, root=root))
+    return shards
+
+
+def all_shards(root=None):
+    """Shards in ./data plus indexed shards whose folder has since gone (so they can be pruned)"""
+    root = root or current_index_dir()
+    shards = {shard.name: shard for shard in indexed_shards(root)}
+    shards.update((shard.name, shard) for shard in data_shards(root))
+    return sorted(shards.values(), key=lambda shard: (shard.name != DEFAULT_SHARD, shard.name))
@@ -0,0 +1,73 @@
+"""Versioned index snapshots published through a pointer file.
+
+A full rebuild writes a complete index (vector store, manifests, BM25
+indexes, all shards) into ./chroma_db/snapshots/<version> while the app
+keeps serving the current one. The new snapshot goes live by atomically
+replacing ./chroma_db/CURRENT, which holds the snapshot name; readers
+resolve it once when they open the index and reload in the background
+when the index version moves. Older snapshots are then retired, keeping
+the newest RAG_SNAPSHOT_KEEP so sessions still on one can finish.
+
+Without a CURRENT file the index lives directly in ./chroma_db, the
+layout before snapshots, and incremental updates keep working there.
+"""
+import os
+import shutil
+import time
+import uuid
+
+INDEX_ROOT = "./chroma_db"
+SNAPSHOTS_DIR = "./chroma_db/snapshots"
+CURRENT_PATH = "./chroma_db/CURRENT"
+SNAPSHOT_KEEP = int(os.environ.get("RAG_SNAPSHOT_KEEP", "3"))
+
+
+def current_snapshot():
+    """Name of the live snapshot, or None for the in-place layout"""
+    try:
+        with open(CURRENT_PATH, 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def current_index_dir():
+    name = current_snapshot()
+    if name and os.path.isdir(os.path.join(SNAPSHOTS_DIR, name)):
+        return os.path.join(SNAPSHOTS_DIR, name)
+    return INDEX_ROOT
+
+
+def create_snapshot_dir():
+    """Empty directory for a new snapshot; names sort by creation time"""
+    now = time.time()
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.localtime(now))
+    name = f"{stamp}.{int(now * 1e6) % 1000000:06d}-{uuid.uuid4().hex[:6]}"
+    path = os.path.join(SNAPSHOTS_DIR, name)
+    os.makedirs(path)
+    return path
+
+
+def publish_snapshot(path):
+    """Make the snapshot at path the live index"""
+    tmp_path = CURRENT_PATH + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(os.path.basename(path))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, CURRENT_PATH)
+
+
+def retire_snapshots(keep=SNAPSHOT_KEEP):
+    """Delete snapshots older than the newest `keep` up to the live one; returns the names removed.
+
+    Snapshots newer than the live one may still be building and are left alone.
+    """
+    live = current_snapshot()
+    if not live or not os.path.isdir(SNAPSHOTS_DIR):
+        return []
+    older = sorted(name for name in os.listdir(SNAPSHOTS_DIR) if name < live)
+    retired = older[:max(0, len(older) - (keep - 1))]
+    for name in retired:
+        shutil.rmtree(os.path.join(SNAPSHOTS_DIR, name), ignore_errors=True)
+    return retired
@@ -0,0 +1,98 @@
+"""Background start-up of the query service for the Streamlit app.
+
+Importing llama_index/chromadb, opening the index and loading both
+Ollama models into memory takes tens of seconds on a cold start. The
+starter does all of that on a background thread, so the page renders
+at once and the sidebar can show progress. It also records how long
+each phase took, plus the time to first token of the first answer.
+
+Only the standard library is imported here; the heavy modules are
+imported by the thread. An in-process service lives in a ServiceHolder,
+which swaps in a freshly published index in the background.
+"""
+import threading
+import time
+
+STATUS_IMPORTING = "importing libraries"
+STATUS_LOADING = "loading index"
+STATUS_WARMING = "loading models"
+STATUS_READY = "ready"
+STATUS_ERROR = "error"
+
+
+class ServiceStarter:
+    def __init__(self):
+        self.status = STATUS_IMPORTING
+        self._service = None
+        self._holder = None
+        self._chunks = 0
+        self.backend = None
+        self.error = None
+        self.warm_up_error = None
+        self.timings = {}
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="rag-startup", daemon=True)
+        self._thread.start()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @property
+    def service(self):
+        """The current service (None until loaded); in-process ones follow the live index version"""
+        return self._holder.get() if self._holder is not None else self._service
+
+    @property
+    def chunks(self):
+        if self._holder is not None and self.ready:
+            # Counted on the service currently answering, which changes when a new index goes live
+            return self._holder.get().health()["chunks"]
+        return self._chunks
+
+    @property
+    def reloading(self):
+        return self._holder is not None and self._holder.reloading
+
+    def wait(self, timeout=None):
+        """Block until start-up finished (successfully or not); returns whether it did"""
+        return self._ready.wait(timeout)
+
+    def _run(self):
+        try:
+            start = time.perf_counter()
+            from query_service import RemoteQueryService, ServiceHolder, SERVICE_URL
+            self.timings["import"] = time.perf_counter() - start
+
+            self.status = STATUS_LOADING
+            start = time.perf_counter()
+            # Thin client of a shared backend if one is configured, otherwise answer in-process
+            if SERVICE_URL:
+                self._service = RemoteQueryService(SERVICE_URL)
+            else:
+                self._holder = ServiceHolder()
+            service = self.service
+            self._chunks = service.health()["chunks"]
+            self.backend = SERVICE_URL or "in-process"
+            self.timings["init"] = time.perf_counter() - start
+
+            self.status = STATUS_WARMING
+            start = time.perf_counter()
+            try:
+                self.timings.update({f"warm_up {name}": seconds for name, seconds in service.warm_up().items()})
+            except Exception as e:
+                # Not fatal: the models then load on the first question instead
+                self.warm_up_error = str(e)
+            self.timings["warm_up"] = time.perf_counter() - start
+            self.status = STATUS_READY
+        except Exception as e:
+            self.error = str(e)
+            self.status = STATUS_ERROR
+        finally:
+            self._ready.set()
+
+    def record_first_token(self, seconds):
+        """Keep the time to first token of the first answer after start-up"""
+        with self._lock:
+            self.timings.setdefault("first_token", seconds)
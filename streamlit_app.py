@@ -4,12 +4,14 @@ os.environ['ANONYMIZED_TELEMETRY'] = 'False'
 os.environ['POSTHOG_DISABLED'] = 'True'
 warnings.filterwarnings('ignore')
 
+import itertools
+import time
 import streamlit as st
-from llama_index.core import VectorStoreIndex, Settings
-from llama_index.llms.ollama import Ollama
-from llama_index.embeddings.ollama import OllamaEmbedding
-from llama_index.vector_stores.chroma import ChromaVectorStore
-import chromadb
+from startup import ServiceStarter
+
+# Messages rendered per page of chat history, and the most kept per session
+CHAT_WINDOW = 20
+MAX_MESSAGES = 200
 
 st.set_page_config(
     page_title="CGI HR Assistant",
@@ -161,6 +163,13 @@ st.markdown("""
         border: 1px solid #f57c00;
     }
     
+    .cached-mode {
+        background-color: #e8f5e9;
+        color: #388e3c;
+        border: 1px solid #388e3c;
+        margin-left: 0.4rem;
+    }
+    
     /* Info boxes */
     .info-box {
         background: #e8f5e9;
@@ -182,84 +191,45 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 @st.cache_resource
-def init_rag():
-    try:
-        # Initialize LLM with faster model
-        Settings.llm = Ollama(
-            model="llama3.2:3b",  # Much faster!
-            request_timeout=120.0,  # Reduced timeout
-            additional_kwargs={
-                "num_predict": 256,  # Shorter responses
-                "temperature": 0.7,
-                "num_ctx": 2048  # Smaller context
-            }
-        )
-        Settings.embed_model = OllamaEmbedding(model_name="nomic-embed-text")
-        
-        chroma_client = chromadb.PersistentClient(path="./chroma_db")
-        chroma_collection = chroma_client.get_or_create_collection("hr_documents")
-        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-        
-        index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
-        
-        # Optimized query engine
-        query_engine = index.as_query_engine(
-            similarity_top_k=2,
-            response_mode="compact"
-        )
-        
-        return query_engine, chroma_collection.count(), Settings.llm, None
-    except Exception as e:
-        return None, 0, None, str(e)
+def get_starter():
+    # Imports, index loading and model warm-up run in the background while the page renders.
+    # A re-index (e.g. by `rag_app.py --watch` or a snapshot rebuild) is swapped in without a restart.
+    return ServiceStarter()
 
-def is_document_related(question):
-    """Improved detection for document vs generic questions"""
-    
-    question_lower = question.lower().strip()
-    
-    # Strong generic indicators - use LLM
-    generic_patterns = [
-        'hello', 'hi ', 'hey', 'good morning', 'good afternoon', 'good evening',
-        'how are you', 'what can you do', 'who are you', 'help',
-        'can you help', 'can you act', 'act as', 'introduce yourself',
-        'what are you', 'tell me about yourself', 'your name', 'your purpose',
-        'thank you', 'thanks', 'bye', 'goodbye', 'what is cgi', 'about cgi'
-    ]
-    
-    for pattern in generic_patterns:
-        if pattern in question_lower:
-            return False
-    
-    # Strong document indicators - use RAG
-    doc_keywords = [
-        'transition cost', 'contract cost', 'time report', 'timesheet',
-        'according to', 'in the document', 'in the policy', 'page ',
-        'what does the document', 'find in', 'search for', 'procedure for',
-        'how to submit', 'approval process', 'guideline for', 'form for'
-    ]
-    
-    for keyword in doc_keywords:
-        if keyword in question_lower:
-            return True
-    
-    # Default: short questions use LLM, longer ones use RAG
-    return len(question_lower.split()) > 8
+def list_pdfs(data_dir="./data"):
+    """(folder, file name) of every PDF in ./data and its shard subfolders; folder is None at the top level"""
+    if not os.path.exists(data_dir):
+        return []
+    pdfs = [(None, f) for f in sorted(os.listdir(data_dir)) if f.lower().endswith('.pdf')]
+    for folder in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, folder)
+        if os.path.isdir(path):
+            pdfs.extend((folder, f) for f in sorted(os.listdir(path)) if f.lower().endswith('.pdf'))
+    return pdfs
 
-def get_llm_response(llm, question):
-    """Get direct response from LLM"""
-    response = llm.complete(
-        f"You are a helpful HR assistant at CGI. Answer concisely in 2-3 sentences.\n\nQuestion: {question}\n\nAnswer:"
-    )
-    return str(response)
+def render_sources(sources):
+    with st.expander("📚 **Source Documents**"):
+        for i, source in enumerate(sources, 1):
+            st.markdown(f"**{i}.** 📄 `{source['file']}` - Page **{source['page']}** ({(source['score'] or 0):.1%})")
 
 # Initialize system
-query_engine, doc_count, llm, error = init_rag()
+starter = get_starter()
+service, doc_count, error = starter.service, starter.chunks, starter.error
 
 # Initialize session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "mode_preference" not in st.session_state:
     st.session_state.mode_preference = "auto"
+if "streaming" not in st.session_state:
+    st.session_state.streaming = True
+if "remember_conversation" not in st.session_state:
+    st.session_state.remember_conversation = True
+if "conversation" not in st.session_state:
+    # Rolling summary + recent turns, see conversation.py
+    st.session_state.conversation = {"summary": "", "turns": []}
+if "chat_window" not in st.session_state:
+    st.session_state.chat_window = CHAT_WINDOW
 
 # Sidebar
 with st.sidebar:
@@ -272,12 +242,18 @@ with st.sidebar:
         st.error("❌ **System Offline**")
         st.caption(f"Error: {error}")
         st.info("💡 Run `python rag_app.py` first")
+    elif not starter.ready:
+        st.warning(f"⏳ **Starting up** – {starter.status}...")
     else:
         st.success("✅ **System Online**")
+        if starter.reloading:
+            st.caption("🔄 Loading the updated index in the background, answers use the current one meanwhile")
+        if starter.warm_up_error:
+            st.caption(f"⚠️ Model warm-up failed, the first answer will be slower: {starter.warm_up_error}")
         
         col1, col2 = st.columns(2)
         with col1:
-            num_docs = len([f for f in os.listdir("./data") if f.endswith('.pdf')]) if os.path.exists("./data") else 0
+            num_docs = len(list_pdfs())
             st.metric("📄 Docs", num_docs)
         with col2:
             st.metric("📦 Chunks", doc_count)
@@ -307,16 +283,41 @@ with st.sidebar:
         st.session_state.mode_preference = "rag"
         st.markdown('<div class="info-box">📚 Document search mode - searches all indexed files</div>', unsafe_allow_html=True)
     
+    st.session_state.streaming = st.toggle(
+        "⚡ Stream answers",
+        value=st.session_state.streaming,
+        help="Show the answer word by word as it is generated"
+    )
+    
+    st.session_state.remember_conversation = st.toggle(
+        "🧠 Remember conversation",
+        value=st.session_state.remember_conversation,
+        help="Understand follow-up questions like \"and for contractors?\" using the earlier messages"
+    )
+    
     st.markdown("---")
     
     # Documents
     st.markdown('<div class="sidebar-header">📚 Indexed Documents</div>', unsafe_allow_html=True)
     if os.path.exists("./data"):
-        pdf_files = [f for f in os.listdir("./data") if f.lower().endswith('.pdf')]
+        pdfs = list_pdfs()
+        pdf_files = sorted({pdf for _, pdf in pdfs})
         if pdf_files:
-            for pdf in pdf_files:
+            for folder, pdf in pdfs:
                 display_name = pdf if len(pdf) <= 35 else pdf[:32] + "..."
-                st.markdown(f'<div class="doc-item">📄 {display_name}</div>', unsafe_allow_html=True)
+                prefix = f"📁 {folder} / " if folder else ""
+                st.markdown(f'<div class="doc-item">{prefix}📄 {display_name}</div>', unsafe_allow_html=True)
+            # Forget selections of PDFs that have since been removed
+            st.session_state.document_filter = [
+                f for f in st.session_state.get("document_filter", []) if f in pdf_files
+            ]
+            st.multiselect(
+                "🔎 Search only in:",
+                pdf_files,
+                key="document_filter",
+                placeholder="All documents",
+                help="Restrict document search to these PDFs. Leave empty to search everything."
+            )
         else:
             st.info("No documents indexed yet")
     
@@ -342,10 +343,36 @@ with st.sidebar:
     st.caption("⚡ Status: Optimized")
     st.caption("🏢 CGI Inc.")
     
+    # Cold-start timings: library imports, index loading, model warm-up and the first answer
+    if starter.timings:
+        with st.expander("🚀 Startup (s)"):
+            st.markdown("| Phase | Seconds |\n|---|---|\n" + "\n".join(
+                f"| {name} | {seconds:.2f} |" for name, seconds in starter.timings.items()))
+    
+    # Rolling per-stage latency from the query service's traces
+    if service and starter.ready:
+        with st.expander("⏱️ Latency (p50 / p95 ms)"):
+            latency = service.latency_stats()
+            for trace_mode, label in (("RAG", "📚 Document Search"), ("LLM", "💬 Chat")):
+                stage_stats = latency[trace_mode]["stages"]
+                if not stage_stats:
+                    continue
+                rows = "\n".join(f"| {name} | {p50:.0f} | {p95:.0f} |" for name, (p50, p95) in stage_stats.items())
+                st.markdown(f"**{label}** ({latency[trace_mode]['count']} queries)\n\n"
+                            f"| Stage | p50 | p95 |\n|---|---|---|\n{rows}")
+            speculation = latency.get("speculation", {})
+            if speculation.get("count"):
+                st.caption(f"🔀 Speculative: {speculation['count']} answers, {speculation['rag_rate']:.0%} kept "
+                           f"document search, {speculation['cancel_rate']:.0%} cancelled a branch, wasted p50 "
+                           f"{speculation['wasted_ms_p50']:.0f} ms / p95 {speculation['wasted_ms_p95']:.0f} ms")
+            st.caption(f"Backend: `{starter.backend}`")
+    
     st.markdown("---")
     
     if st.button("🗑️ Clear Chat", use_container_width=True):
         st.session_state.messages = []
+        st.session_state.conversation = {"summary": "", "turns": []}
+        st.session_state.chat_window = CHAT_WINDOW
         st.rerun()
 
 # Main area
@@ -367,7 +394,7 @@ else:
 
 st.markdown(f'<p style="color: #666; font-size: 1rem; margin-bottom: 2rem;">{mode_text}</p>', unsafe_allow_html=True)
 
-if not query_engine:
+if error:
     st.error("⚠️ System not initialized. Run `python rag_app.py` first.")
     st.stop()
 
@@ -389,8 +416,13 @@ if len(st.session_state.messages) == 0:
         Change the mode anytime in the sidebar! Ask me anything 👇
         """)
 
-# Display chat history
-for msg in st.session_state.messages:
+# Display chat history, newest CHAT_WINDOW messages first so long sessions rerun quickly
+hidden = max(0, len(st.session_state.messages) - st.session_state.chat_window)
+if hidden:
+    if st.button(f"⬆️ Show earlier messages ({hidden} hidden)"):
+        st.session_state.chat_window += CHAT_WINDOW
+        st.rerun()
+for msg in st.session_state.messages[hidden:]:
     avatar = "👤" if msg["role"] == "user" else "🔴"
     with st.chat_message(msg["role"], avatar=avatar):
         if msg["role"] == "assistant" and "mode" in msg:
@@ -398,13 +430,15 @@ for msg in st.session_state.messages:
                 st.markdown('<span class="mode-badge rag-mode">📚 DOCUMENT SEARCH</span>', unsafe_allow_html=True)
             else:
                 st.markdown('<span class="mode-badge llm-mode">💬 CHAT MODE</span>', unsafe_allow_html=True)
+            if msg.get("cached"):
+                st.markdown('<span class="mode-badge cached-mode">⚡ CACHED</span>', unsafe_allow_html=True)
         
+        if msg.get("standalone"):
+            st.caption(f"🔎 Understood as: {msg['standalone']}")
         st.markdown(msg["content"])
         
         if msg["role"] == "assistant" and "sources" in msg and msg["sources"]:
-            with st.expander("📚 **Source Documents**"):
-                for i, source in enumerate(msg["sources"], 1):
-                    st.markdown(f"**{i}.** 📄 `{source['file']}` - Page **{source['page']}** ({source['score']:.1%})")
+            render_sources(msg["sources"])
 
 # Chat input
 if prompt := st.chat_input("💬 Type your question here...", key="chat_input"):
@@ -414,79 +448,112 @@ if prompt := st.chat_input("💬 Type your question here...", key="chat_input"):
         st.markdown(prompt)
     
     with st.chat_message("assistant", avatar="🔴"):
-        # Determine mode
-        if st.session_state.mode_preference == "auto":
-            use_rag = is_document_related(prompt)
-        elif st.session_state.mode_preference == "llm":
-            use_rag = False
-        else:
-            use_rag = True
+        asked = time.perf_counter()
+        if not starter.ready:
+            with st.spinner("⏳ Still starting up, your question will be answered in a moment..."):
+                starter.wait()
+        if starter.error:
+            st.error(f"⚠️ System not initialized: {starter.error}")
+            st.stop()
+        service = starter.service
+        conversation = st.session_state.conversation if st.session_state.remember_conversation else None
+        events = service.answer(prompt, st.session_state.mode_preference, stream=st.session_state.streaming,
+                                documents=st.session_state.get("document_filter") or None,
+                                conversation=conversation)
+        result = {"sources": [], "error": None}
+        mode = "RAG" if st.session_state.mode_preference == "rag" else "LLM"
         
-        mode = "RAG" if use_rag else "LLM"
+        def answer_tokens(first_event):
+            for event in itertools.chain([first_event], events):
+                if event["type"] == "token":
+                    yield event["text"]
+                elif event["type"] == "sources":
+                    result["sources"] = event["sources"]
+                elif event["type"] == "error":
+                    result["error"] = event["message"]
+                elif event["type"] == "done":
+                    # Whatever follows (the conversation update) must not hold up the rendered answer
+                    return
         
-        # Show badge
-        if mode == "RAG":
-            st.markdown('<span class="mode-badge rag-mode">📚 DOCUMENT SEARCH</span>', unsafe_allow_html=True)
-            spinner_text = "🔍 Searching documents..."
-        else:
-            st.markdown('<span class="mode-badge llm-mode">💬 CHAT MODE</span>', unsafe_allow_html=True)
-            spinner_text = "💭 Thinking..."
+        try:
+            # Routing (and the answer-cache check) happen before the first event
+            with st.spinner("🤔 Thinking..."):
+                meta = next(events)
+            if meta["type"] == "error":
+                raise RuntimeError(meta["message"])
+            mode = meta["mode"]
+            
+            # Show badge
+            if mode == "RAG":
+                st.markdown('<span class="mode-badge rag-mode">📚 DOCUMENT SEARCH</span>', unsafe_allow_html=True)
+                spinner_text = "🔍 Searching documents..."
+            else:
+                st.markdown('<span class="mode-badge llm-mode">💬 CHAT MODE</span>', unsafe_allow_html=True)
+                spinner_text = "💭 Thinking..."
+            if meta["cached"]:
+                st.markdown('<span class="mode-badge cached-mode">⚡ CACHED</span>', unsafe_allow_html=True)
+            standalone = meta.get("question") if meta.get("question", prompt) != prompt else None
+            if standalone:
+                st.caption(f"🔎 Understood as: {standalone}")
+            
+            # Document search mode: retrieval runs before the first token arrives
+            with st.spinner(spinner_text):
+                status = st.empty()
+                first_event = next(events)
+                # The model is busy: show where we are in line instead of a silent spinner
+                while first_event["type"] == "queue":
+                    if first_event.get("coalesced"):
+                        status.info("🔗 The same question is already being answered, sharing that answer...")
+                    else:
+                        status.info(f"⏳ Waiting for the model: position {first_event['position']} in queue "
+                                    f"({first_event['waited']:.0f}s)")
+                    first_event = next(events)
+                status.empty()
+            starter.record_first_token(time.perf_counter() - asked)
+            
+            if st.session_state.streaming:
+                answer = st.write_stream(answer_tokens(first_event))
+            else:
+                answer = "".join(answer_tokens(first_event))
+                st.markdown(answer)
+            
+            if result["error"]:
+                raise RuntimeError(result["error"])
+            
+            if result["sources"]:
+                render_sources(result["sources"])
+            
+            # The service folds this exchange into the conversation memory after "done"
+            for event in events:
+                if event["type"] == "conversation":
+                    st.session_state.conversation = event["conversation"]
+            
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": answer,
+                "sources": result["sources"],
+                "mode": mode,
+                "cached": meta["cached"],
+                "standalone": standalone
+            })
         
-        with st.spinner(spinner_text):
-            try:
-                if use_rag:
-                    # Document search mode
-                    response = query_engine.query(prompt)
-                    answer = str(response)
-                    
-                    sources = []
-                    if hasattr(response, 'source_nodes') and response.source_nodes:
-                        for node in response.source_nodes:
-                            sources.append({
-                                "file": node.node.metadata.get('file_name', 'Unknown'),
-                                "page": node.node.metadata.get('page_label', 'N/A'),
-                                "score": node.score if hasattr(node, 'score') else 0
-                            })
-                    
-                    st.markdown(answer)
-                    
-                    if sources:
-                        with st.expander("📚 **Source Documents**"):
-                            for i, source in enumerate(sources, 1):
-                                st.markdown(f"**{i}.** 📄 `{source['file']}` - Page **{source['page']}** ({source['score']:.1%})")
-                    
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": answer,
-                        "sources": sources,
-                        "mode": "RAG"
-                    })
-                    
-                else:
-                    # Chat mode
-                    answer = get_llm_response(llm, prompt)
-                    st.markdown(answer)
-                    
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": answer,
-                        "sources": [],
-                        "mode": "LLM"
-                    })
-                
-            except Exception as e:
-                error_msg = f"❌ **Error:** {str(e)}"
-                st.error(error_msg)
-                
-                if "timed out" in str(e).lower():
-                    st.warning("⏱️ Timeout. Try Chat Mode for faster responses or ask a shorter question.")
-                
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": error_msg,
-                    "sources": [],
-                    "mode": mode
-                })
+        except Exception as e:
+            error_msg = f"❌ **Error:** {str(e)}"
+            st.error(error_msg)
+            
+            if "timed out" in str(e).lower():
+                st.warning("⏱️ Timeout. Try Chat Mode for faster responses or ask a shorter question.")
+            
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": error_msg,
+                "sources": [],
+                "mode": mode
+            })
+
+# Old messages are only scrollback; drop them so session state stays bounded
+if len(st.session_state.messages) > MAX_MESSAGES:
+    del st.session_state.messages[:-MAX_MESSAGES]
 
 # Footer
 st.markdown("---")
@@ -498,4 +565,9 @@ st.markdown(
     '<em>Insights you can act on</em>'
     '</div>',
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+# Refresh the page until background start-up finishes, so the status and chat unlock by themselves
+if not starter.ready:
+    time.sleep(0.5)
+    st.rerun()
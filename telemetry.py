@@ -0,0 +1,182 @@
+"""Per-stage latency tracing for queries and indexing runs.
+
+A trace is opened around one unit of work (a question, an indexing run)
+and code anywhere underneath records stages into it with ``stage(name)``
+without the trace being passed around. Finished traces are appended to
+a rotating JSONL file and kept in a rolling window per (kind, mode) for
+p50/p95 reporting.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+TRACE_PATH = os.environ.get("RAG_TRACE_PATH", "./logs/traces.jsonl")
+TRACE_MAX_BYTES = 10 * 1024 * 1024
+TRACE_BACKUPS = 5
+WINDOW = 200
+
+_current = contextvars.ContextVar("rag_trace", default=None)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class Trace:
+    def __init__(self, kind, **fields):
+        self.kind = kind
+        self.fields = fields
+        self.stages = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._start = time.perf_counter()
+        self.total = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def add(self, name, seconds):
+        self.stages[name] += seconds
+
+    def count(self, name, value=1):
+        self.counts[name] += value
+
+    def finish(self):
+        self.total = time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            "ts": time.time(),
+            "kind": self.kind,
+            **self.fields,
+            "total_ms": round(1000 * (self.total or 0.0), 2),
+            "stages_ms": {name: round(1000 * seconds, 2) for name, seconds in self.stages.items()},
+            "counts": dict(self.counts),
+        }
+
+
+class TraceLog:
+    def __init__(self, path=TRACE_PATH, window=WINDOW):
+        self.path = path
+        self._lock = threading.Lock()
+        self._recent = defaultdict(lambda: deque(maxlen=window))
+        self._logger = logging.getLogger("rag.traces")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        if not self._logger.handlers:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger.addHandler(handler)
+
+    def record(self, trace):
+        entry = trace.to_dict()
+        self._logger.info(json.dumps(entry))
+        with self._lock:
+            self._recent[(trace.kind, trace.fields.get("mode"))].append(entry)
+
+    def percentiles(self, kind="query", mode=None):
+        """Return {stage: (p50_ms, p95_ms)} over the rolling window, plus "total" """
+        with self._lock:
+            entries = list(self._recent[(kind, mode)])
+        if not entries:
+            return {}
+        samples = defaultdict(list)
+        for entry in entries:
+            samples["total"].append(entry["total_ms"])
+            for name, ms in entry["stages_ms"].items():
+                samples[name].append(ms)
+        return {name: (percentile(values, 50), percentile(values, 95)) for name, values in samples.items()}
+
+    def entries(self, kind="query", mode=None):
+        """The logged entries in the rolling window"""
+        with self._lock:
+            return list(self._recent[(kind, mode)])
+
+    def count(self, kind="query", mode=None):
+        with self._lock:
+            return len(self._recent[(kind, mode)])
+
+
+_trace_log = None
+_trace_log_lock = threading.Lock()
+
+
+def get_trace_log():
+    global _trace_log
+    with _trace_log_lock:
+        if _trace_log is None:
+            _trace_log = TraceLog()
+        return _trace_log
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def start_trace(kind, **fields):
+    """Open a trace for the enclosed work and log it when the block exits"""
+    trace = Trace(kind, **fields)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        trace.finish()
+        get_trace_log().record(trace)
+
+
+@contextmanager
+def untraced():
+    """Run the enclosed block without recording into the current trace"""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block into the current trace, if there is one"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+
+def timed_stream(tokens, trace=None):
+    """Pass a token stream through, recording time to first token, generation time and token count"""
+    trace = trace or _current.get()
+    if trace is None:
+        yield from tokens
+        return
+    start = time.perf_counter()
+    first = True
+    for token in tokens:
+        if first:
+            trace.add("first_token", time.perf_counter() - start)
+            first = False
+        trace.count("completion_tokens")
+        yield token
+    trace.add("generation", time.perf_counter() - start)